@@ -0,0 +1,84 @@
+"""
+Tiempo de arranque en frío de la CLI: `python -m src --help` y la importación
+del módulo de cada subcomando, cada uno en un intérprete nuevo. Falla si el
+arranque de la CLI supera el presupuesto o carga dependencias pesadas.
+
+Uso (lo ejecuta también la CI):
+    python -m benchmarks.bench_cli_startup --repeat 5 --max-help-seconds 1.0
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from src.cli import COMMAND_MODULES
+
+HEAVY_MODULES = ('tensorflow', 'xgboost', 'clickhouse_driver', 'yfinance', 'seaborn', 'matplotlib', 'sklearn', 'pandas')
+
+IMPORT_PROBE = """
+import importlib, json, sys, time
+start = time.perf_counter()
+importlib.import_module(sys.argv[1])
+elapsed = time.perf_counter() - start
+heavy = [m for m in sys.argv[2].split(',') if m in sys.modules]
+print(json.dumps({'seconds': elapsed, 'heavy': heavy}))
+"""
+
+def time_help(repeat):
+    """Tiempo total del proceso `python -m src --help` (arranque del intérprete incluido)."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-m', 'src', '--help'], check=True, capture_output=True)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+def probe_import(module, repeat):
+    """Mediana del tiempo de importar el módulo y dependencias pesadas que arrastra."""
+    times, heavy = [], []
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, '-c', IMPORT_PROBE, module, ','.join(HEAVY_MODULES)],
+                                capture_output=True, text=True)
+        if result.returncode != 0:
+            return {'error': result.stderr.strip().splitlines()[-1]}
+        probe = json.loads(result.stdout)
+        times.append(probe['seconds'])
+        heavy = probe['heavy']
+    return {'seconds': round(statistics.median(times), 4), 'heavy': heavy}
+
+def main(repeat=3, max_help_seconds=None, output=None):
+    failures = []
+    cli_probe = probe_import('src.cli', repeat)
+    help_seconds = time_help(repeat)
+    print(f"{'python -m src --help':<24}{help_seconds:>10.3f} s (proceso completo)")
+    print(f"{'import src.cli':<24}{cli_probe['seconds']:>10.3f} s  pesadas: {cli_probe['heavy'] or '-'}")
+    if cli_probe['heavy']:
+        failures.append(f"src.cli importa dependencias pesadas: {cli_probe['heavy']}")
+    if max_help_seconds is not None and help_seconds > max_help_seconds:
+        failures.append(f"--help tarda {help_seconds:.3f} s (presupuesto {max_help_seconds} s)")
+
+    results = {'help_seconds': round(help_seconds, 4), 'cli_import': cli_probe, 'commands': {}}
+    print(f"\n{'Subcomando':<24}{'Importación (s)':>16}  Dependencias pesadas")
+    for command, module in COMMAND_MODULES.items():
+        probe = probe_import(module, repeat)
+        results['commands'][command] = dict(probe, module=module)
+        if 'error' in probe:
+            print(f"{command:<24}{'error':>16}  {probe['error']}")
+        else:
+            print(f"{command:<24}{probe['seconds']:>16.3f}  {', '.join(probe['heavy']) or '-'}")
+
+    if output:
+        with open(output, 'w') as f:
+            json.dump(results, f, indent=2)
+    for failure in failures:
+        print(f"❌ {failure}")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=3, help="Ejecuciones por medida (se toma la mediana).")
+    parser.add_argument('--max-help-seconds', type=float, default=None, help="Presupuesto para `python -m src --help`.")
+    parser.add_argument('--output', help="Guarda los resultados en este JSON.")
+    args = parser.parse_args()
+    sys.exit(main(args.repeat, args.max_help_seconds, args.output))
@@ -0,0 +1,103 @@
+"""
+Benchmark de lectura desde ClickHouse: compara la ruta antigua (SELECT * con
+tuplas de Python por fila) con load_data_from_clickhouse (proyección,
+parámetros y lectura por columnas en NumPy) sobre una tabla sintética.
+
+Uso (con el servidor de docker-compose levantado):
+    python -m benchmarks.bench_clickhouse_load --rows 5000000
+"""
+import argparse
+import time
+import tracemalloc
+import pandas as pd
+from src.data_pipeline import get_clickhouse_client, load_data_from_clickhouse
+
+BENCH_TABLE = 'stocks_db.bench_stock_daily'
+
+CREATE_BENCH_TABLE_SQL = f"""
+CREATE TABLE IF NOT EXISTS {BENCH_TABLE}
+(
+    `ticker` String,
+    `event_date` Date,
+    `open` Float64,
+    `high` Float64,
+    `low` Float64,
+    `close` Float64,
+    `volume` UInt64,
+    `News` UInt8,
+    `News_Type` Nullable(String)
+)
+ENGINE = MergeTree
+ORDER BY (ticker, event_date);
+"""
+
+# Cada ticker tiene 10.000 días consecutivos desde 1990; los precios son un paseo pseudoaleatorio
+FILL_BENCH_TABLE_SQL = f"""
+INSERT INTO {BENCH_TABLE}
+SELECT
+    concat('T', toString(intDiv(number, 10000))) AS ticker,
+    toDate('1990-01-01') + (number % 10000) AS event_date,
+    100 + (cityHash64(number, 1) % 1000) / 100 AS open,
+    open + (cityHash64(number, 2) % 100) / 100 AS high,
+    open - (cityHash64(number, 3) % 100) / 100 AS low,
+    open + ((cityHash64(number, 4) % 200) - 100) / 100 AS close,
+    cityHash64(number, 5) % 10000000 AS volume,
+    toUInt8(cityHash64(number, 6) % 50 = 0) AS News,
+    if(News = 1, 'World Premiere', NULL) AS News_Type
+FROM numbers(%(rows)s)
+"""
+
+def prepare_table(client, rows):
+    """(Re)crea la tabla sintética con el número de filas pedido."""
+    client.execute(f"DROP TABLE IF EXISTS {BENCH_TABLE}")
+    client.execute(CREATE_BENCH_TABLE_SQL)
+    client.execute(FILL_BENCH_TABLE_SQL, {'rows': rows})
+
+def legacy_load(client, start_date):
+    """Réplica de la versión anterior: SELECT * y una tupla de Python por fila."""
+    query = f"SELECT * FROM {BENCH_TABLE} WHERE event_date >= '{start_date}' ORDER BY event_date"
+    data = client.execute(query, with_column_types=True)
+    df = pd.DataFrame(data[0], columns=[col[0] for col in data[1]])
+    df['event_date'] = pd.to_datetime(df['event_date'])
+    df.set_index('event_date', inplace=True)
+    return df
+
+def measure(func):
+    """Devuelve (segundos, pico de memoria en MiB, filas) de una llamada."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    df = func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 2**20, len(df)
+
+def main(rows=5_000_000, start_date='1990-01-01'):
+    row_client = get_clickhouse_client(use_numpy=False)
+    numpy_client = get_clickhouse_client(use_numpy=True)
+    try:
+        print(f">> Preparando {BENCH_TABLE} con {rows} filas...")
+        prepare_table(row_client, rows)
+
+        results = {
+            'antes (tuplas por fila)': measure(lambda: legacy_load(row_client, start_date)),
+            'después (columnar NumPy)': measure(lambda: load_data_from_clickhouse(
+                start_date, client=numpy_client, table=BENCH_TABLE)),
+            'después (4 columnas)': measure(lambda: load_data_from_clickhouse(
+                start_date, columns=['ticker', 'close', 'volume', 'News'],
+                client=numpy_client, table=BENCH_TABLE)),
+        }
+    finally:
+        row_client.execute(f"DROP TABLE IF EXISTS {BENCH_TABLE}")
+        row_client.disconnect()
+        numpy_client.disconnect()
+
+    print(f"\n{'Ruta':<28}{'Tiempo (s)':>12}{'Pico (MiB)':>14}{'Filas':>12}")
+    for name, (elapsed, peak, n_rows) in results.items():
+        print(f"{name:<28}{elapsed:>12.2f}{peak:>14.1f}{n_rows:>12}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=5_000_000, help="Filas de la tabla sintética.")
+    args = parser.parse_args()
+    main(rows=args.rows)
@@ -0,0 +1,39 @@
+"""
+Escalado de feature_engineering sobre paneles sintéticos de 1 a 500 tickers,
+en serie y repartiendo los tickers entre procesos.
+
+Uso:
+    python -m benchmarks.bench_feature_engineering --days 1250 --jobs 8
+"""
+import argparse
+import os
+import time
+import numpy as np
+from benchmarks.synthetic import make_ohlcv, NEWS_TYPES
+from src.data_pipeline import feature_engineering
+
+TICKER_COUNTS = (1, 10, 50, 100, 500)
+
+def time_feature_engineering(df, n_jobs):
+    start = time.perf_counter()
+    result = feature_engineering(df, n_jobs=n_jobs, news_types=NEWS_TYPES, keep_ticker=True)
+    return time.perf_counter() - start, result
+
+def main(days=1250, jobs=None, ticker_counts=TICKER_COUNTS):
+    jobs = jobs or os.cpu_count()
+    print(f"\n{'Tickers':>8}{'Filas':>12}{'Serie (s)':>12}{f'{jobs} procesos (s)':>18}{'Iguales':>10}")
+    for n_tickers in ticker_counts:
+        df = make_ohlcv(n_days=days, n_tickers=n_tickers)
+        serial_time, serial = time_feature_engineering(df, 1)
+        parallel_time, parallel = time_feature_engineering(df, jobs)
+        same = serial.columns.equals(parallel.columns) and np.allclose(
+            serial.drop(columns='ticker').to_numpy(dtype=np.float64),
+            parallel.drop(columns='ticker').to_numpy(dtype=np.float64))
+        print(f"{n_tickers:>8}{len(df):>12}{serial_time:>12.2f}{parallel_time:>18.2f}{str(same):>10}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--days', type=int, default=1250, help="Días por ticker.")
+    parser.add_argument('--jobs', type=int, default=None, help="Procesos para la versión paralela (por defecto, todos los núcleos).")
+    args = parser.parse_args()
+    main(days=args.days, jobs=args.jobs)
@@ -0,0 +1,88 @@
+"""
+Memoria pico (RSS) del pipeline completo carga → feature_engineering →
+split_and_scale sobre un panel sintético grande de varios tickers, con los
+tipos por defecto y con compact=True. Cada modo se ejecuta en un proceso
+nuevo para que el pico de uno no contamine al otro.
+
+Uso:
+    python -m benchmarks.bench_memory --tickers 500 --days 2500
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from benchmarks.synthetic import make_ohlcv, InMemoryClickHouse, NEWS_TYPES
+from src.data_pipeline import load_data_from_clickhouse, feature_engineering, split_and_scale
+
+TRAIN_FRACTION = 0.8 # Parte de los días del panel que va a train
+
+def _current_rss_mb():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+
+def _peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 # Linux: KiB
+
+def run_pipeline(n_tickers, n_days, compact):
+    """Ejecuta el pipeline en este proceso y devuelve memoria, tiempo y tamaño del resultado."""
+    client = InMemoryClickHouse(make_ohlcv(n_days=n_days, n_tickers=n_tickers))
+    dates = client.df['event_date'].drop_duplicates().sort_values()
+    split_date = dates.iloc[int(len(dates) * TRAIN_FRACTION)]
+    before = _current_rss_mb()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()): # Silencia los print del pipeline
+        df = load_data_from_clickhouse('1900-01-01', client=client, compact=compact)
+        df = feature_engineering(df, news_types=NEWS_TYPES, compact=compact)
+        X_train, X_test, y_train, y_test, _ = split_and_scale(df, split_date, compact=compact)
+        del df
+    seconds = time.perf_counter() - start
+    X = X_train.to_numpy()
+    return {
+        'compact': compact,
+        'rows': len(client.df),
+        'seconds': round(seconds, 3),
+        'baseline_mb': round(before, 1),
+        'peak_mb': round(_peak_rss_mb(), 1),
+        'peak_increase_mb': round(_peak_rss_mb() - before, 1),
+        'result_mb': round((X_train.memory_usage().sum() + X_test.memory_usage().sum()
+                            + y_train.nbytes + y_test.nbytes) / 2**20, 1),
+        'dtype': str(X.dtype),
+        'c_contiguous': bool(X.flags['C_CONTIGUOUS']),
+    }
+
+def measure(n_tickers, n_days, compact):
+    """Ejecuta run_pipeline en un intérprete nuevo."""
+    command = [sys.executable, '-m', 'benchmarks.bench_memory', '--child',
+               '--tickers', str(n_tickers), '--days', str(n_days)] + (['--compact'] if compact else [])
+    result = subprocess.run(command, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main(n_tickers=500, n_days=2500):
+    print(f"Panel sintético: {n_tickers} tickers x {n_days} días ({n_tickers * n_days:,} filas)")
+    results = [measure(n_tickers, n_days, compact) for compact in (False, True)]
+    print(f"\n{'Modo':<12}{'Tiempo (s)':>12}{'Pico RSS (MB)':>15}{'Δ pico (MB)':>14}{'Resultado (MB)':>16}{'dtype X':>10}{'C-contig.':>11}")
+    for r in results:
+        mode = 'compacto' if r['compact'] else 'por defecto'
+        print(f"{mode:<12}{r['seconds']:>12.2f}{r['peak_mb']:>15.1f}{r['peak_increase_mb']:>14.1f}"
+              f"{r['result_mb']:>16.1f}{r['dtype']:>10}{str(r['c_contiguous']):>11}")
+    default, compact = results
+    print(f"\nReducción del pico de RSS del pipeline: {1 - compact['peak_increase_mb'] / default['peak_increase_mb']:.0%}")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tickers', type=int, default=500)
+    parser.add_argument('--days', type=int, default=2500, help="Días por ticker.")
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--compact', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_pipeline(args.tickers, args.days, args.compact)))
+    else:
+        main(args.tickers, args.days)
@@ -0,0 +1,213 @@
+"""
+Suite de benchmarks de los puntos calientes del pipeline con datos sintéticos
+(sin ClickHouse ni Alpha Vantage). Mide tiempo y memoria pico de cada etapa
+para varios tamaños y añade el resultado a un histórico JSON junto con el
+commit, de modo que las regresiones se ven comparando con la ejecución anterior.
+
+Los tamaños grandes se generan y procesan por trozos de tickers completos;
+el tiempo es la suma de los trozos y la memoria, el pico del mayor de ellos.
+
+Uso:
+    python -m benchmarks.run_all --sizes 1k 100k 1m
+    python -m benchmarks.run_all --sizes 50m --cases feature_engineering --no-memory
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+from benchmarks.synthetic import (
+    NEWS_TYPES, InMemoryClickHouse, iter_ohlcv_chunks, make_alpha_vantage_json, make_market_index, with_market_index
+)
+from src.analysis.event_study import market_model_by_event, abnormal_return_matrix, car_standard_deviation, caar_tests
+from src.data_bbdd_pipeline.load_to_clickhouse import iter_alpha_vantage_blocks
+from src.data_pipeline import load_data_from_clickhouse, feature_engineering
+from src.modeling.sequences import create_sequences, sequence_batches
+
+SIZES = {'1k': 1_000, '10k': 10_000, '100k': 100_000, '1m': 1_000_000, '10m': 10_000_000, '50m': 50_000_000}
+DEFAULT_SIZES = ('1k', '100k', '1m')
+CHUNK_ROWS = 2_000_000
+HISTORY_PATH = 'benchmarks/history.json'
+REGRESSION_THRESHOLD = 1.2  # Más de un 20% más lento que la ejecución anterior se marca como regresión
+N_FEATURES = 25
+TIME_STEPS = 30
+AV_DAYS = 5000              # Días por fichero JSON de Alpha Vantage
+EVENT_DATES_FRACTION = 0.05 # Parte de los días que se vuelven a pedir (fechas invalidadas en la caché)
+MARKET_INDEX = '^GSPC'
+
+# Cada caso genera, trozo a trozo, la función a medir; la preparación de los datos no se cronometra
+
+def case_alpha_vantage_blocks(n_rows):
+    """Lo mismo que insert_symbol_file sin ClickHouse: lectura en streaming del fichero y bloques columnares."""
+    n_days = min(AV_DAYS, n_rows)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for seed in range(max(1, n_rows // n_days)):
+            path = os.path.join(tmp_dir, f"T{seed:04d}_daily.json")
+            with open(path, 'w') as f:
+                json.dump(make_alpha_vantage_json(n_days, seed=seed), f)
+            def run(path=path):
+                with open(path, 'rb') as f:
+                    for _ in iter_alpha_vantage_blocks(f, 'T0000'):
+                        pass
+            yield run
+
+def case_load_clickhouse(n_rows):
+    for chunk in iter_ohlcv_chunks(n_rows, chunk_rows=CHUNK_ROWS):
+        client = InMemoryClickHouse(chunk)
+        yield lambda: load_data_from_clickhouse('1900-01-01', client=client)
+
+def case_load_event_dates(n_rows):
+    """Recarga de las fechas invalidadas (event_date IN ...), como hace la caché local."""
+    for chunk in iter_ohlcv_chunks(n_rows, chunk_rows=CHUNK_ROWS):
+        client = InMemoryClickHouse(chunk)
+        dates = chunk.index.unique()
+        event_dates = dates[::max(1, int(1 / EVENT_DATES_FRACTION))]
+        yield lambda: load_data_from_clickhouse('1900-01-01', event_dates=event_dates, client=client)
+
+def case_load_market_index(n_rows):
+    """Carga con el índice de referencia unido en la misma consulta (event study)."""
+    for chunk in iter_ohlcv_chunks(n_rows, chunk_rows=CHUNK_ROWS):
+        market = make_market_index(chunk.index.nunique(), start_date=chunk.index.min())
+        client = InMemoryClickHouse(chunk, {MARKET_INDEX: market})
+        yield lambda: load_data_from_clickhouse('1900-01-01', market_index=MARKET_INDEX, client=client)
+
+def case_feature_engineering(n_rows):
+    for chunk in iter_ohlcv_chunks(n_rows, chunk_rows=CHUNK_ROWS):
+        yield lambda: feature_engineering(chunk, news_types=NEWS_TYPES, keep_ticker=True)
+
+def case_create_sequences(n_rows):
+    rng = np.random.default_rng(0)
+    for start in range(0, n_rows, CHUNK_ROWS):
+        rows = min(CHUNK_ROWS, n_rows - start)
+        X, y = rng.standard_normal((rows, N_FEATURES)), rng.integers(0, 2, rows)
+        yield lambda: create_sequences(X, y, TIME_STEPS)
+
+def case_sequence_epoch(n_rows):
+    """Una época completa de lotes de 32 ventanas (lo que consume model.fit)."""
+    rng = np.random.default_rng(0)
+    for start in range(0, n_rows, CHUNK_ROWS):
+        rows = min(CHUNK_ROWS, n_rows - start)
+        X, y = rng.standard_normal((rows, N_FEATURES)), rng.integers(0, 2, rows)
+        yield lambda: sum(1 for _ in sequence_batches(X, y, TIME_STEPS, batch_size=32))
+
+def case_event_windows(n_rows, window_size=5, estimation_window=(-250, -30)):
+    """Retornos, modelo de mercado por evento, ventanas de evento y contrastes del CAAR."""
+    for chunk in iter_ohlcv_chunks(n_rows, chunk_rows=CHUNK_ROWS):
+        n_days = chunk.index.nunique()
+        df = with_market_index(chunk, make_market_index(n_days, start_date=chunk.index.min()))
+        def run(df=df):
+            by_ticker = df.groupby('ticker', sort=False)
+            stock_returns = by_ticker['close'].pct_change().fillna(0).to_numpy()
+            market_returns = by_ticker['market_close'].pct_change().fillna(0).to_numpy()
+            news = df['News'].to_numpy() == 1
+            ticker_codes = pd.factorize(df['ticker'])[0]
+            alpha, beta, sigma, positions, moments = market_model_by_event(
+                stock_returns, market_returns, np.flatnonzero(news), ticker_codes,
+                estimation_window, window_size, exclude_mask=news, return_moments=True)
+            if len(positions) > 1:
+                ar = abnormal_return_matrix(stock_returns, market_returns, positions, alpha, beta, window_size)
+                car_std = car_standard_deviation(market_returns, positions, sigma, moments, window_size)
+                caar_tests(ar, car_std=car_std, window_size=window_size, n_resamples=1000)
+        yield run
+
+CASES = {
+    'alpha_vantage_blocks': case_alpha_vantage_blocks,
+    'load_data_from_clickhouse': case_load_clickhouse,
+    'load_event_dates': case_load_event_dates,
+    'load_market_index': case_load_market_index,
+    'feature_engineering': case_feature_engineering,
+    'create_sequences': case_create_sequences,
+    'sequence_batches_epoch': case_sequence_epoch,
+    'event_windows': case_event_windows,
+}
+
+def measure(case, n_rows, memory=True):
+    """
+    Cronometra cada trozo sin instrumentar y, si memory=True, lo repite con
+    tracemalloc para la memoria pico (tracemalloc ralentiza el código Python,
+    así que no se mezcla con el tiempo).
+    """
+    seconds, peak = 0.0, 0
+    for run in case(n_rows):
+        with contextlib.redirect_stdout(io.StringIO()): # Silencia los print del pipeline
+            start = time.perf_counter()
+            run()
+            seconds += time.perf_counter() - start
+            if memory:
+                tracemalloc.start()
+                run()
+                peak = max(peak, tracemalloc.get_traced_memory()[1])
+                tracemalloc.stop()
+    return {'seconds': round(seconds, 4), 'peak_mb': round(peak / 2**20, 2) if memory else None}
+
+def git_revision():
+    """Commit actual (con '-dirty' si hay cambios sin confirmar)."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], capture_output=True, text=True).stdout.strip()
+        return f"{commit}-dirty" if dirty else commit
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def load_history(path=HISTORY_PATH):
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def previous_result(history, case, size):
+    """Último resultado guardado para el mismo caso y tamaño."""
+    for run in reversed(history):
+        for result in run['results']:
+            if result['case'] == case and result['size'] == size:
+                return result
+    return None
+
+def main(sizes=DEFAULT_SIZES, cases=None, memory=True, history_path=HISTORY_PATH):
+    history = load_history(history_path)
+    results = []
+    print(f"\n{'Caso':<30}{'Tamaño':>8}{'Tiempo (s)':>12}{'Pico (MB)':>12}{'vs anterior':>14}")
+    for name in cases or CASES:
+        for size in sizes:
+            result = dict(case=name, size=size, rows=SIZES[size], **measure(CASES[name], SIZES[size], memory))
+            results.append(result)
+
+            previous = previous_result(history, name, size)
+            change = ''
+            if previous and previous['seconds'] > 0:
+                ratio = result['seconds'] / previous['seconds']
+                change = f"{ratio:.2f}x" + (' ⚠️' if ratio > REGRESSION_THRESHOLD else '')
+            peak = '-' if result['peak_mb'] is None else f"{result['peak_mb']:.1f}"
+            print(f"{name:<30}{size:>8}{result['seconds']:>12.3f}{peak:>12}{change:>14}")
+
+    history.append({
+        'commit': git_revision(),
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'cpu_count': os.cpu_count(),
+        'results': results,
+    })
+    os.makedirs(os.path.dirname(history_path) or '.', exist_ok=True)
+    with open(history_path, 'w') as f:
+        json.dump(history, f, indent=2)
+    print(f"\nResultados añadidos a {history_path} ({len(history)} ejecuciones).")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', nargs='+', choices=list(SIZES), default=list(DEFAULT_SIZES))
+    parser.add_argument('--cases', nargs='+', choices=list(CASES), default=None)
+    parser.add_argument('--no-memory', action='store_true', help="Solo tiempos (sin la segunda pasada con tracemalloc).")
+    parser.add_argument('--history', default=HISTORY_PATH)
+    args = parser.parse_args()
+    main(args.sizes, args.cases, memory=not args.no_memory, history_path=args.history)
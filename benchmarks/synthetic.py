@@ -0,0 +1,107 @@
+"""
+Generadores de datos sintéticos con la misma forma que la salida de
+load_data_from_clickhouse (índice event_date; columnas ticker, OHLCV, News
+y News_Type), para poder medir el pipeline sin ClickHouse ni Alpha Vantage.
+"""
+import numpy as np
+import pandas as pd
+
+NEWS_TYPES = ('World Premiere', 'Sales Today', 'Sales Expansion', 'Corporate')
+
+def make_ohlcv(n_days=2000, n_tickers=1, news_rate=0.02, start_date='2010-01-01', seed=0, ticker_offset=0):
+    """Panel de n_tickers × n_days barras diarias (días hábiles), ordenado por (ticker, fecha)."""
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(start_date, periods=n_days, name='event_date')
+    n_rows = n_days * n_tickers
+
+    # Paseo aleatorio geométrico por ticker
+    log_returns = rng.normal(0.0003, 0.015, size=(n_tickers, n_days))
+    close = 100 * np.exp(np.cumsum(log_returns, axis=1)).ravel()
+    spread = np.abs(rng.normal(0, 0.01, size=n_rows)) * close
+    open_ = close * (1 + rng.normal(0, 0.005, size=n_rows))
+    news = rng.random(n_rows) < news_rate
+    news_type = np.where(news, rng.choice(np.array(NEWS_TYPES, dtype=object), size=n_rows), None)
+
+    return pd.DataFrame({
+        'ticker': np.repeat([f'T{i:04d}' for i in range(ticker_offset, ticker_offset + n_tickers)], n_days),
+        'open': open_,
+        'high': np.maximum(open_, close) + spread,
+        'low': np.minimum(open_, close) - spread,
+        'close': close,
+        'volume': rng.integers(100_000, 10_000_000, size=n_rows).astype(np.uint64),
+        'News': news.astype(np.uint8),
+        'News_Type': news_type,
+    }, index=pd.DatetimeIndex(np.tile(dates, n_tickers), name='event_date'))
+
+def make_market_index(n_days=2000, start_date='2010-01-01', seed=1):
+    """Cierres sintéticos de un índice de referencia (como la tabla market_index)."""
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(start_date, periods=n_days, name='event_date')
+    close = 3000 * np.exp(np.cumsum(rng.normal(0.0003, 0.01, size=n_days)))
+    return pd.Series(close, index=dates, name='market_close')
+
+def with_market_index(df, market_close):
+    """Une el panel con el índice igual que load_data_from_clickhouse(market_index=...)."""
+    return df.join(market_close, how='inner')
+
+def iter_ohlcv_chunks(n_rows, n_days=2500, chunk_rows=2_000_000, **kwargs):
+    """
+    Genera un panel de n_rows filas por trozos de tickers completos (como mucho
+    chunk_rows filas cada uno), para escalar hasta decenas de millones de filas
+    sin tenerlas todas en memoria. Con n_rows < n_days sale un único ticker corto.
+    """
+    n_days = min(n_days, n_rows)
+    n_tickers = max(1, n_rows // n_days)
+    tickers_per_chunk = max(1, chunk_rows // n_days)
+    for first in range(0, n_tickers, tickers_per_chunk):
+        count = min(tickers_per_chunk, n_tickers - first)
+        yield make_ohlcv(n_days, count, seed=first, ticker_offset=first, **kwargs)
+
+def make_alpha_vantage_json(n_days=5000, start_date='2000-01-03', seed=0):
+    """Respuesta sintética de TIME_SERIES_DAILY (fechas de más reciente a más antigua, como la API)."""
+    df = make_ohlcv(n_days, start_date=start_date, seed=seed).iloc[::-1]
+    series = {
+        event_date.strftime('%Y-%m-%d'): {
+            '1. open': f'{o:.4f}', '2. high': f'{h:.4f}', '3. low': f'{l:.4f}',
+            '4. close': f'{c:.4f}', '5. volume': str(v),
+        }
+        for event_date, o, h, l, c, v in zip(df.index, df['open'], df['high'], df['low'], df['close'], df['volume'])
+    }
+    return {'Meta Data': {'2. Symbol': 'T0000'}, 'Time Series (Daily)': series}
+
+class InMemoryClickHouse:
+    """
+    Sustituto en memoria de clickhouse_driver.Client para load_data_from_clickhouse:
+    responde a execute(columnar=True, with_column_types=True) con las columnas
+    pedidas del DataFrame, aplicando los filtros de fecha, ticker y event_dates.
+    market_indices ({símbolo: cierres}, p. ej. de make_market_index) atiende
+    las consultas con market_index: une market_close por fecha (solo días con ambos datos).
+    """
+    COLUMN_TYPES = {'ticker': 'String', 'event_date': 'Date', 'volume': 'UInt64', 'News': 'UInt8',
+                    'News_Type': 'Nullable(String)'}
+
+    def __init__(self, df, market_indices=None):
+        self.df = df.reset_index()
+        self.market_indices = market_indices or {}
+
+    def execute(self, query, params=None, with_column_types=False, columnar=False):
+        params = params or {}
+        columns = [col.strip() for col in query.split('SELECT', 1)[1].split('FROM', 1)[0].split(',')]
+        dates = self.df['event_date']
+        mask = dates >= pd.Timestamp(params['start_date'])
+        if 'end_date' in params:
+            mask &= dates <= pd.Timestamp(params['end_date'])
+        if 'tickers' in params:
+            mask &= self.df['ticker'].isin(params['tickers'])
+        if 'event_dates' in params:
+            mask &= dates.isin(pd.to_datetime(list(params['event_dates'])))
+        selected = self.df.loc[mask.to_numpy()]
+        if 'market_index' in params:
+            market_close = self.market_indices[params['market_index']].rename('market_close')
+            selected = selected.join(market_close, on='event_date', how='inner')
+        data = [selected[col].to_numpy() for col in columns]
+        column_types = [(col, self.COLUMN_TYPES.get(col, 'Float64')) for col in columns]
+        return (data, column_types) if with_column_types else data
+
+    def disconnect(self):
+        pass
@@ -1,64 +1,214 @@
 import requests
 import os
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
 from dotenv import load_dotenv
 import json
+from src.telemetry import stage
 
 load_dotenv('credenciales.env')  # Cargamos las credenciales necesarias
 API_KEY = os.getenv('ALPHA_VANTAGE_API')
+API_URL = os.getenv('ALPHA_VANTAGE_URL', 'https://www.alphavantage.co/query') # Se puede apuntar a un servidor falso
 SYMBOL = 'TM'   # Símbolo de Toyota Motors : NYSE
-DATA_FILE_PATH = 'toyota_daily_data.json' # Fichero para guardar/leer los datos
+# Universo de fabricantes y proveedores que seguimos
+SYMBOLS = ['TM', 'HMC', 'GM', 'F', 'STLA', 'TSLA', 'MGA', 'BWA', 'APTV', 'LEA']
+DATA_DIR = 'data/raw'   # Un fichero JSON por símbolo, que consume load_to_clickhouse
+QUOTA_FILE_PATH = os.path.join(DATA_DIR, '.quota.json') # Llamadas hechas hoy
+CALLS_PER_MINUTE = 5
+CALLS_PER_DAY = 25
+MAX_WORKERS = 4
+MAX_RETRIES = 4
+BACKOFF_SECONDS = 15    # Espera base ante un aviso de límite (se duplica en cada reintento)
 
-def fetch_and_save_data():
-    """Realiza la llamada a la API y guarda los datos si tiene éxito."""
-    url = f'https://www.alphavantage.co/query?function=TIME_SERIES_DAILY&symbol={SYMBOL}&outputsize=full&apikey={API_KEY}'
-    
-    try:
-        r = requests.get(url)
-        r.raise_for_status() # Lanza un error para códigos HTTP 4xx/5xx
-        data = r.json()
+def symbol_data_path(symbol, outputsize='full'):
+    """Fichero de caché del símbolo (histórico completo o ventana 'compact')."""
+    suffix = '' if outputsize == 'full' else f'_{outputsize}'
+    return os.path.join(DATA_DIR, f"{symbol}_daily{suffix}.json")
+
+class QuotaLimiter:
+    """
+    Reparte las llamadas a la API respetando un presupuesto por minuto
+    (ventana deslizante) y por día (persistido en disco entre ejecuciones).
+    """
+    def __init__(self, calls_per_minute=CALLS_PER_MINUTE, calls_per_day=CALLS_PER_DAY, quota_path=QUOTA_FILE_PATH):
+        self.calls_per_minute = calls_per_minute
+        self.calls_per_day = calls_per_day
+        self.quota_path = quota_path
+        self._recent_calls = deque()
+        self._lock = threading.Lock()
+        self._today, self._calls_today = self._load_daily_count()
+
+    def _load_daily_count(self):
+        today = date.today().isoformat()
+        if self.quota_path and os.path.exists(self.quota_path):
+            with open(self.quota_path, 'r') as f:
+                return today, json.load(f).get(today, 0)
+        return today, 0
+
+    def _save_daily_count(self):
+        if not self.quota_path:
+            return
+        os.makedirs(os.path.dirname(self.quota_path) or '.', exist_ok=True)
+        with open(self.quota_path, 'w') as f:
+            json.dump({self._today: self._calls_today}, f)
+
+    def exhaust_daily_budget(self):
+        """La API ha indicado que se ha agotado el cupo diario."""
+        with self._lock:
+            self._calls_today = self.calls_per_day
+            self._save_daily_count()
+
+    def acquire(self):
+        """Espera a tener hueco en el minuto actual; devuelve False si no queda cupo diario."""
+        while True:
+            with self._lock:
+                if date.today().isoformat() != self._today:
+                    self._today, self._calls_today = date.today().isoformat(), 0
+                if self._calls_today >= self.calls_per_day:
+                    return False
+                now = time.monotonic()
+                while self._recent_calls and now - self._recent_calls[0] >= 60:
+                    self._recent_calls.popleft()
+                if len(self._recent_calls) < self.calls_per_minute:
+                    self._recent_calls.append(now)
+                    self._calls_today += 1
+                    self._save_daily_count()
+                    return True
+                wait = 60 - (now - self._recent_calls[0])
+            time.sleep(wait)
+
+def _save_json(data, path):
+    """Guarda el JSON de forma atómica para no dejar ficheros a medias."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(f"{path}.tmp", 'w') as f:
+        json.dump(data, f, indent=4)
+    os.replace(f"{path}.tmp", path)
+
+def classify_api_message(message):
+    """
+    Tipo de aviso de la API: 'minute' (límite de frecuencia, se reintenta),
+    'day' (cupo diario agotado) u 'other'. El aviso por minuto también
+    menciona el cupo diario ("5 calls per minute and 500 calls per day"),
+    así que se comprueba primero.
+    """
+    text = message.lower()
+    if 'per minute' in text or 'call frequency' in text:
+        return 'minute'
+    if 'per day' in text or 'daily' in text:
+        return 'day'
+    return 'other'
+
+def fetch_and_save_data(symbol=SYMBOL, outputsize='full', path=None, session=None, limiter=None):
+    """
+    Realiza la llamada a la API y guarda los datos si tiene éxito.
+    outputsize='compact' devuelve solo los últimos 100 días bursátiles.
+    Si la API avisa de límite por minuto se reintenta con espera exponencial;
+    si el límite es diario, o la respuesta es un 'Error Message', se abandona
+    sin reintentar y sin guardar nada.
+    """
+    path = path or symbol_data_path(symbol, outputsize)
+    params = {'function': 'TIME_SERIES_DAILY', 'symbol': symbol, 'outputsize': outputsize, 'apikey': API_KEY}
+    http = session or requests
+
+    for attempt in range(MAX_RETRIES + 1):
+        if limiter and not limiter.acquire():
+            print(f"[{symbol}] Cupo diario de la API agotado. Se omite la petición.")
+            return None
+        try:
+            r = http.get(API_URL, params=params, timeout=30)
+            r.raise_for_status() # Lanza un error para códigos HTTP 4xx/5xx
+            data = r.json()
+        except requests.exceptions.RequestException as e:
+            print(f"[{symbol}] Error en la petición HTTP: {e}")
+            return None
+        except json.JSONDecodeError:
+            print(f"[{symbol}] Error: La respuesta de la API no es un JSON válido.")
+            return None
 
-        # Comprobar si la API devolvió un error de límite en lugar de datos
-        if "Information" in data:
-            print(f"Error de la API: {data['Information']}")
+        # Símbolo inválido u otro error de la petición: no se reintenta ni se guarda
+        if 'Error Message' in data:
+            print(f"[{symbol}] Error de la API: {data['Error Message']}")
             return None
-        
-        # Si la llamada fue exitosa, guarda los datos
-        with open(DATA_FILE_PATH, 'w') as f:
-            json.dump(data, f, indent=4)
-        print(f"Datos guardados exitosamente en {DATA_FILE_PATH}")
-        return data
-
-    except requests.exceptions.RequestException as e:
-        print(f"Error en la petición HTTP: {e}")
-        return None
-    except json.JSONDecodeError:
-        print("Error: La respuesta de la API no es un JSON válido.")
-        return None
-
-def get_stock_data():
+
+        # Comprobar si la API devolvió un aviso de límite en lugar de datos
+        message = data.get('Information') or data.get('Note')
+        if message is None:
+            _save_json(data, path)
+            print(f"[{symbol}] Datos guardados exitosamente en {path}")
+            return data
+
+        kind = classify_api_message(message)
+        if kind != 'minute' or attempt == MAX_RETRIES:
+            print(f"[{symbol}] Error de la API: {message}")
+            if kind == 'day' and limiter:
+                limiter.exhaust_daily_budget()
+            return None
+        wait = BACKOFF_SECONDS * 2 ** attempt
+        print(f"[{symbol}] Límite de la API alcanzado. Reintentando en {wait} s...")
+        time.sleep(wait)
+
+def fetch_symbols(symbols, outputsize='full', max_workers=MAX_WORKERS, limiter=None):
+    """
+    Descarga varios símbolos en paralelo respetando el presupuesto de la API.
+    Devuelve {símbolo: ruta del fichero guardado o None si falló}.
+    """
+    limiter = limiter or QuotaLimiter()
+    session = requests.Session()
+
+    def fetch(symbol):
+        with stage('fetch_symbol', symbol=symbol, outputsize=outputsize) as s:
+            data = fetch_and_save_data(symbol, outputsize, session=session, limiter=limiter)
+            s.rows_out = len(data.get('Time Series (Daily)', {})) if data else 0
+        return symbol, (symbol_data_path(symbol, outputsize) if data else None)
+
+    try:
+        with stage('fetch_symbols', rows_in=len(symbols), outputsize=outputsize) as s:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                results = dict(executor.map(fetch, symbols))
+            s.rows_out = sum(1 for p in results.values() if p)
+    finally:
+        session.close()
+
+    print(f"Descarga completada: {sum(1 for p in results.values() if p)}/{len(symbols)} símbolos.")
+    return results
+
+def get_stock_data(symbol=SYMBOL):
     """Obtiene los datos, ya sea del fichero local o de la API."""
-    if os.path.exists(DATA_FILE_PATH):
-        print(f"Cargando datos desde el fichero local: {DATA_FILE_PATH}")
-        with open(DATA_FILE_PATH, 'r') as f:
+    path = symbol_data_path(symbol)
+    if os.path.exists(path):
+        print(f"Cargando datos desde el fichero local: {path}")
+        with open(path, 'r') as f:
             return json.load(f)
     else:
         print("No se encontraron datos locales. Realizando llamada a la API...")
-        return fetch_and_save_data()
+        return fetch_and_save_data(symbol)
 
 
 if __name__ == "__main__":
-    stock_data = get_stock_data()
-    
-    if stock_data:
-        # Extraer la serie temporal del JSON
-        time_series = stock_data.get("Time Series (Daily)")
-        
-        if time_series:
-            # Imprimir solo los primeros 5 registros para comprobar los datos rápidamente
-            first_5_days = list(time_series.items())[:5]
-            print("\n--- Primeros 5 registros de la serie temporal ---")
-            for date, values in first_5_days:
-                print(f"{date}: {values}")
-        else:
-            print("\nLa clave 'Time Series (Daily)' no se encontró en la respuesta. Revisa el JSON completo:")
-            print(stock_data)
\ No newline at end of file
+    import argparse
+    parser = argparse.ArgumentParser(description="Descarga las series diarias de Alpha Vantage.")
+    parser.add_argument('symbols', nargs='*', help="Símbolos a descargar (por defecto, todo el universo).")
+    parser.add_argument('--compact', action='store_true', help="Pide solo los últimos 100 días bursátiles.")
+    args = parser.parse_args()
+
+    if args.symbols or args.compact:
+        fetch_symbols(args.symbols or SYMBOLS, outputsize='compact' if args.compact else 'full')
+    else:
+        stock_data = get_stock_data()
+
+        if stock_data:
+            # Extraer la serie temporal del JSON
+            time_series = stock_data.get("Time Series (Daily)")
+
+            if time_series:
+                # Imprimir solo los primeros 5 registros para comprobar los datos rápidamente
+                first_5_days = list(time_series.items())[:5]
+                print("\n--- Primeros 5 registros de la serie temporal ---")
+                for date_str, values in first_5_days:
+                    print(f"{date_str}: {values}")
+            else:
+                print("\nLa clave 'Time Series (Daily)' no se encontró en la respuesta. Revisa el JSON completo:")
+                print(stock_data)
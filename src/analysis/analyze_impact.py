@@ -2,20 +2,153 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
-from src.data_pipeline import load_data_from_clickhouse
+from src.data_cache import load_data_cached
+from src.telemetry import stage
+from src.data_pipeline import (STOCK_COLUMNS, ANALYSIS_FEATURE_COLUMNS, FEATURES_TABLE, get_clickhouse_client,
+                               load_features_from_clickhouse)
 
-def descriptive_analysis():
+IMPACT_METRICS = ('abs_return', 'volatility_range', 'volume_change_ratio')
+BOX_QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+# Agrupaciones del modo in_database (nombre → expresiones de la clave)
+SUMMARY_LEVELS = {
+    'news': ('News',),
+    'news_type': ('News', "ifNull(News_Type, 'NoNews') AS news_type"),
+    'ticker': ('News', 'ticker'),
+}
+NEWS_LABELS = ['Sin Noticia', 'Con Noticia']
+
+def summary_query(level):
+    """
+    Consulta que resume las métricas de impacto por grupo en ClickHouse:
+    filas, media, mínimo, máximo y cuantiles aproximados (t-digest) de cada
+    métrica. Los nan iniciales de la vista (sin historia) no cuentan.
+    """
+    keys = SUMMARY_LEVELS[level]
+    levels = ', '.join(str(q) for q in BOX_QUANTILES)
+    aggregates = ',\n    '.join(
+        f"avgIf({m}, isFinite({m})) AS {m}_mean, minIf({m}, isFinite({m})) AS {m}_min, "
+        f"maxIf({m}, isFinite({m})) AS {m}_max, quantilesTDigestIf({levels})({m}, isFinite({m})) AS {m}_q"
+        for m in IMPACT_METRICS
+    )
+    names = ', '.join(key.split(' AS ')[-1] for key in keys)
+    return (
+        f"SELECT {', '.join(keys)},\n    count() AS n,\n    {aggregates}\n"
+        f"FROM {FEATURES_TABLE}\nWHERE event_date >= %(start_date)s\n"
+        f"GROUP BY {names}\nORDER BY {names}"
+    )
+
+def load_impact_summary(level='news', start_date='2019-01-01', client=None):
+    """
+    Ejecuta summary_query y devuelve un DataFrame pequeño (una fila por
+    grupo) con los cuantiles desplegados en columnas {métrica}_q05, _q25...
+    """
+    own_client = client is None
+    if own_client:
+        client = get_clickhouse_client(use_numpy=False)
+    with stage('impact_summary', level=level) as s:
+        try:
+            rows, column_types = client.execute(summary_query(level), {'start_date': pd.Timestamp(start_date).date()},
+                                                with_column_types=True)
+        finally:
+            if own_client:
+                client.disconnect()
+        summary = pd.DataFrame(rows, columns=[name for name, _ in column_types])
+        for m in IMPACT_METRICS:
+            quantiles = np.array(summary.pop(f'{m}_q').tolist(), dtype=float).reshape(len(summary), len(BOX_QUANTILES))
+            for j, q in enumerate(BOX_QUANTILES):
+                summary[f'{m}_q{round(q * 100):02d}'] = quantiles[:, j]
+        s.rows_out = len(summary)
+    return summary
+
+def box_stats(row, metric, label):
+    """
+    Estadísticos para Axes.bxp a partir de una fila del resumen. Los bigotes
+    siguen la regla de 1.5 x IQR de seaborn/matplotlib, recortados al mínimo
+    y máximo del grupo (aproximación: no se conocen los puntos individuales).
+    """
+    q1, med, q3 = row[f'{metric}_q25'], row[f'{metric}_q50'], row[f'{metric}_q75']
+    iqr = q3 - q1
+    return {
+        'label': label, 'med': med, 'q1': q1, 'q3': q3, 'mean': row[f'{metric}_mean'],
+        'whislo': max(row[f'{metric}_min'], q1 - 1.5 * iqr),
+        'whishi': min(row[f'{metric}_max'], q3 + 1.5 * iqr),
+        'fliers': [],
+    }
+
+def in_database_analysis(start_date='2019-01-01', client=None):
+    """
+    Variante de descriptive_analysis que agrega en ClickHouse: solo viajan
+    los resúmenes por noticia, tipo de noticia y ticker, y las figuras se
+    dibujan con esos estadísticos (Axes.bxp) en lugar de con las filas.
+    """
+    summaries = {level: load_impact_summary(level, start_date, client) for level in SUMMARY_LEVELS}
+    for level, summary in summaries.items():
+        summary.to_csv(f'output/impact_summary_{level}.csv', index=False)
+
+    # Una fila por valor de News, también si falta algún grupo
+    by_news = summaries['news'].set_index('News').reindex([0, 1])
+    comparison = by_news[[f'{m}_mean' for m in IMPACT_METRICS]].fillna(0).T
+    comparison.index = list(IMPACT_METRICS)
+    comparison.columns = NEWS_LABELS
+    print("\n--- Comparativa de Métricas (Medias) ---")
+    print(comparison)
+
+    by_type = summaries['news_type'].set_index('news_type')
+    print("\n--- Medias por Tipo de Noticia ---")
+    print(by_type[['n'] + [f'{m}_mean' for m in IMPACT_METRICS]].to_string())
+
+    # Visualización: mismas figuras que el modo por filas, con estadísticos precalculados
+    sns.set(style="whitegrid")
+    fig, axes = plt.subplots(1, 3, figsize=(18, 6))
+    fig.suptitle('Análisis de Impacto de Noticias', fontsize=16)
+
+    comparison.T.plot(kind='bar', y='abs_return', ax=axes[0], legend=False, rot=0)
+    axes[0].set_title('Retorno Absoluto Medio')
+    axes[0].set_xlabel('Tipo de Día')
+
+    present = by_news.dropna(subset=['n'])
+    for ax, metric, title in ((axes[1], 'volatility_range', 'Distribución de la Volatilidad'),
+                              (axes[2], 'volume_change_ratio', 'Distribución del Volumen Relativo')):
+        ax.bxp([box_stats(row, metric, NEWS_LABELS[int(news)]) for news, row in present.iterrows()],
+               showfliers=False, patch_artist=True)
+        ax.set_title(title)
+        ax.set_ylabel(metric)
+    axes[2].set_ylim(0, present['volume_change_ratio_q95'].max())
+
+    plt.tight_layout(rect=[0, 0.03, 1, 0.95])
+    plt.savefig('output/impact_analysis_final.png')
+    print("\nGráfico 'impact_analysis_final.png' guardado.")
+
+    fig, ax = plt.subplots(figsize=(max(8, 1.5 * len(by_type)), 6))
+    ax.bxp([box_stats(row, 'abs_return', news_type) for news_type, row in by_type.iterrows()],
+           showfliers=False, showmeans=True, patch_artist=True)
+    ax.set_title('Retorno Absoluto por Tipo de Noticia')
+    ax.set_ylabel('abs_return')
+    plt.tight_layout()
+    plt.savefig('output/impact_by_news_type.png')
+    print("Gráfico 'impact_by_news_type.png' guardado.")
+    return summaries
+
+def descriptive_analysis(server_features=False, in_database=False):
     """
     Realiza un análisis descriptivo.
+    Con server_features=True las métricas se leen ya calculadas de la vista
+    stock_features en lugar de calcularlas aquí.
+    Con in_database=True también la agregación se hace en ClickHouse
+    (in_database_analysis) y no se descarga ninguna fila.
     """
-    # 1. Cargar datos
-    df = load_data_from_clickhouse(start_date='2019-01-01')
-    
-    # 2. Calcular métricas
-    df['daily_return'] = df['close'].pct_change()
-    df['abs_return'] = df['daily_return'].abs()
-    df['volatility_range'] = (df['high'] - df['low']) / df['low']
-    df['volume_change_ratio'] = df['volume'] / df['volume'].rolling(window=30).mean()
+    if in_database:
+        return in_database_analysis()
+
+    # 1. Cargar datos (y 2. calcular métricas)
+    if server_features:
+        df = load_features_from_clickhouse('2019-01-01', columns=STOCK_COLUMNS + ANALYSIS_FEATURE_COLUMNS)
+    else:
+        df = load_data_cached(start_date='2019-01-01')
+        df['daily_return'] = df['close'].pct_change()
+        df['abs_return'] = df['daily_return'].abs()
+        df['volatility_range'] = (df['high'] - df['low']) / df['low']
+        df['volume_change_ratio'] = df['volume'] / df['volume'].rolling(window=30).mean()
 
     # Rellenamos los NaNs iniciales usando el primer valor válido hacia atrás (back-fill)
     df.bfill(inplace=True)
@@ -23,7 +156,9 @@ def descriptive_analysis():
     df.ffill(inplace=True)
 
     print("\n--- Comparativa de Métricas (Medias) ---")
-    comparison = df.groupby('News')[['abs_return', 'volatility_range', 'volume_change_ratio']].mean().T
+    with stage('descriptive_comparison', rows_in=len(df)) as s:
+        comparison = df.groupby('News')[['abs_return', 'volatility_range', 'volume_change_ratio']].mean().T
+        s.rows_out = comparison.shape[1]
     
     # Manejo robusto en caso de que aún falte un grupo
     if 0 not in comparison.columns:
@@ -58,4 +193,10 @@ def descriptive_analysis():
     plt.savefig('output/impact_analysis_final.png')
     print("\nGráfico 'impact_analysis_final.png' guardado.")
 if __name__ == "__main__":
-    descriptive_analysis()
\ No newline at end of file
+    import argparse
+    parser = argparse.ArgumentParser(description="Análisis descriptivo del impacto de las noticias.")
+    parser.add_argument('--server-features', action='store_true', help="Lee las métricas de la vista stock_features.")
+    parser.add_argument('--in-database', action='store_true',
+                        help="Agrega medias y cuantiles en ClickHouse y dibuja desde los resúmenes.")
+    args = parser.parse_args()
+    descriptive_analysis(server_features=args.server_features, in_database=args.in_database)
\ No newline at end of file
@@ -1,67 +1,110 @@
 import pandas as pd
 import numpy as np
-import yfinance as yf
 import matplotlib.pyplot as plt
 import seaborn as sns
 from sklearn.linear_model import LinearRegression
-from src.data_pipeline import load_data_from_clickhouse
+from src.data_cache import load_data_cached
+from src.telemetry import stage
+from src.analysis.event_study import (
+    check_estimation_window, event_window_matrix, market_model_by_event, abnormal_return_matrix,
+    car_standard_deviation, caar_tests
+)
 
-def event_study_analysis():
+def global_market_model(df, event_positions, ticker_codes, window_size=5):
     """
-    Realiza un 'event study'.
+    Modelo de mercado único estimado con todos los días sin noticia.
+    Devuelve (matriz de retornos anormales, None, eventos válidos): con una
+    sola sigma para todos los eventos el test BMP repetiría el t-test, así
+    que no se devuelve desviación típica por evento.
     """
-    # 1. Cargar y unir datos (esta parte ya funciona)
-    df_toyota = load_data_from_clickhouse(start_date='2019-01-01')
-    print("Descargando datos del mercado (S&P 500)...")
-    df_market = yf.download('^GSPC', start=df_toyota.index.min(), end=df_toyota.index.max())
-    
-    market_close_series = df_market['Close']
-    df = df_toyota.join(market_close_series, how='inner')
-    df.rename(columns={'^GSPC': 'market_close'}, inplace=True)
-    
-    # 2. Calcular retornos y rellenar el único NaN con 0
-    df['toyota_return'] = df['close'].pct_change().fillna(0)
-    df['market_return'] = df['market_close'].pct_change().fillna(0)
-    
     estimation_df = df[df['News'] == 0]
     if estimation_df.empty:
         print("\nError: No hay suficientes datos 'Sin Noticia' para estimar el modelo de mercado.")
-        return
+        return None, None, np.array([], dtype=int)
         
     X = estimation_df[['market_return']]
-    y = estimation_df['toyota_return']
+    y = estimation_df['stock_return']
     
     model = LinearRegression()
     model.fit(X, y)
     beta = model.coef_[0]
     alpha = model.intercept_
     print(f"\n--- Modelo de Mercado Estimado ---")
-    print(f"Beta (β) de Toyota: {beta:.4f}")
-    print(f"Alpha (α) de Toyota: {alpha:.4f}")
+    print(f"Beta (β): {beta:.4f}")
+    print(f"Alpha (α): {alpha:.4f}")
 
     df['expected_return'] = alpha + beta * df['market_return']
-    df['abnormal_return'] = df['toyota_return'] - df['expected_return']
+    df['abnormal_return'] = df['stock_return'] - df['expected_return']
+
+    # Ventanas de evento: una sola búsqueda de posiciones y un indexado vectorizado
+    event_window_returns, valid_positions = event_window_matrix(
+        df['abnormal_return'].to_numpy(), event_positions, ticker_codes, window_size)
+    return event_window_returns, None, valid_positions
+
+def per_event_market_model(df, event_positions, ticker_codes, window_size=5, estimation_window=(-250, -30)):
+    """
+    Un modelo de mercado por evento, estimado solo con su ventana previa
+    (sin días con noticia), resuelto en bloque con MCO en forma cerrada.
+    Devuelve (matriz de retornos anormales, desviación típica del CAR de cada
+    evento y día, eventos válidos).
+    """
+    stock_returns = df['stock_return'].to_numpy()
+    market_returns = df['market_return'].to_numpy()
+    alpha, beta, sigma, valid_positions, moments = market_model_by_event(
+        stock_returns, market_returns, event_positions, ticker_codes,
+        estimation_window, window_size, exclude_mask=df['News'].to_numpy() == 1, return_moments=True)
+    if len(valid_positions):
+        print(f"\n--- Modelo de Mercado por Evento (ventana {estimation_window[0]} a {estimation_window[1]}) ---")
+        print(f"Beta (β) mediana: {np.median(beta):.4f}  [{np.percentile(beta, 5):.4f}, {np.percentile(beta, 95):.4f}]")
+        print(f"Alpha (α) mediana: {np.median(alpha):.4f}")
+    event_window_returns = abnormal_return_matrix(
+        stock_returns, market_returns, valid_positions, alpha, beta, window_size)
+    car_std = car_standard_deviation(market_returns, valid_positions, sigma, moments, window_size)
+    return event_window_returns, car_std, valid_positions
 
-    event_dates = df[df['News'] == 1].index
-    window_size = 5
-    event_window_returns = []
+def event_study_analysis(window_size=5, n_resamples=10000, n_jobs=1, per_event=False,
+                         estimation_window=(-250, -30), market_index='^GSPC'):
+    """
+    Realiza un 'event study'. Con per_event=True el alpha/beta se estima
+    para cada evento sobre su ventana de estimación previa.
+    """
+    if per_event:
+        check_estimation_window(estimation_window, window_size)
+    # 1. Cargar datos de las acciones ya unidos al índice de mercado (tabla market_index)
+    df = load_data_cached(start_date='2019-01-01', market_index=market_index)
+    if df.empty:
+        print(f"\nError: No hay datos del índice '{market_index}'. Ejecuta load_market_index para cargarlo.")
+        return
+    
+    # 2. Calcular retornos (por ticker) y rellenar el primer NaN con 0
+    by_ticker = df.groupby('ticker', sort=False)
+    df['stock_return'] = by_ticker['close'].pct_change().fillna(0)
+    df['market_return'] = by_ticker['market_close'].pct_change().fillna(0)
 
-    for date in event_dates:
-        try:
-            start_index = df.index.get_loc(date) - window_size
-            end_index = df.index.get_loc(date) + window_size + 1
-            if start_index >= 0 and end_index <= len(df):
-                event_window_returns.append(df.iloc[start_index:end_index]['abnormal_return'].values)
-        except KeyError:
-            print(f"Aviso: La fecha de evento {date.date()} no se encontró en el dataframe combinado (probablemente un festivo).")
-            continue
+    # 3. Retornos anormales en las ventanas de evento
+    event_positions = np.flatnonzero(df['News'].to_numpy() == 1)
+    ticker_codes = pd.factorize(df['ticker'])[0]
+    with stage('event_windows', rows_in=len(df), per_event=per_event) as s:
+        if per_event:
+            event_window_returns, car_std, valid_positions = per_event_market_model(
+                df, event_positions, ticker_codes, window_size, estimation_window)
+        else:
+            event_window_returns, car_std, valid_positions = global_market_model(
+                df, event_positions, ticker_codes, window_size)
+        s.rows_out = len(valid_positions)
 
-    if not event_window_returns:
-        print("\nError: No se pudieron crear ventanas de eventos. Revisa las fechas.")
+    if len(valid_positions) < 2:
+        print("\nError: No se pudieron crear suficientes ventanas de eventos. Revisa las fechas.")
         return
+    print(f"\n{len(valid_positions)} de {len(event_positions)} eventos con ventana completa.")
 
-    avg_abnormal_returns = np.mean(event_window_returns, axis=0)
-    cumulative_avg_abnormal_returns = np.cumsum(avg_abnormal_returns)
+    with stage('caar_tests', rows_in=len(valid_positions), n_resamples=n_resamples) as s:
+        results = caar_tests(event_window_returns, car_std=car_std, window_size=window_size,
+                             n_resamples=n_resamples, n_jobs=n_jobs)
+        s.rows_out = len(results)
+    print("\n--- CAAR y contrastes de significación ---")
+    print(results.round(4))
+    cumulative_avg_abnormal_returns = results['CAAR'].to_numpy()
     
     window_days = range(-window_size, window_size + 1)
     plt.figure(figsize=(12, 7))
@@ -76,4 +119,15 @@ def event_study_analysis():
     plt.savefig('output/event_study_caar.png')
     print("\nGráfico 'event_study_caar.png' guardado.")
 if __name__ == "__main__":
-    event_study_analysis()
\ No newline at end of file
+    import argparse
+    parser = argparse.ArgumentParser(description="Event study del impacto de las noticias.")
+    parser.add_argument('--per-event', action='store_true', help="Estima alpha/beta por evento con su ventana previa.")
+    parser.add_argument('--estimation-window', type=int, nargs=2, default=(-250, -30), metavar=('INICIO', 'FIN'),
+                        help="Ventana de estimación relativa al evento (por defecto -250 -30).")
+    parser.add_argument('--jobs', type=int, default=1, help="Procesos para el bootstrap.")
+    args = parser.parse_args()
+    try:
+        check_estimation_window(args.estimation_window)
+    except ValueError as e:
+        parser.error(str(e))
+    event_study_analysis(n_jobs=args.jobs, per_event=args.per_event, estimation_window=tuple(args.estimation_window))
\ No newline at end of file
@@ -0,0 +1,174 @@
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from scipy import stats
+
+BOOTSTRAP_BLOCK = 4_000_000 # Elementos (remuestreos × eventos) por lote vectorizado
+
+def event_window_matrix(values, event_positions, group_codes, window_size=5):
+    """
+    Reúne en una matriz (eventos × ventana) los valores de [-window_size, +window_size]
+    alrededor de cada evento con un único indexado vectorizado. Se descartan los
+    eventos cuya ventana se sale del panel o cruza a otro ticker (el panel debe
+    estar ordenado por ticker y fecha).
+    Devuelve (matriz, posiciones de los eventos válidos).
+    """
+    values = np.asarray(values)
+    event_positions = np.asarray(event_positions)
+    offsets = np.arange(-window_size, window_size + 1)
+    index = event_positions[:, None] + offsets
+
+    inside = (index[:, 0] >= 0) & (index[:, -1] < len(values))
+    index, event_positions = index[inside], event_positions[inside]
+    same_ticker = group_codes[index[:, 0]] == group_codes[index[:, -1]]
+    index, event_positions = index[same_ticker], event_positions[same_ticker]
+    return values[index], event_positions
+
+def check_estimation_window(estimation_window, window_size=5):
+    """
+    Comprueba que la ventana de estimación (inicio, fin), relativa al evento,
+    no esté vacía y acabe antes de que empiece la ventana de evento.
+    """
+    start, end = estimation_window
+    if start >= end:
+        raise ValueError(f"Ventana de estimación vacía: el inicio ({start}) debe ser menor que el fin ({end})")
+    if end >= -window_size:
+        raise ValueError(f"La ventana de estimación debe acabar antes de la ventana de evento "
+                         f"(fin {end} >= {-window_size})")
+
+def market_model_by_event(stock_returns, market_returns, event_positions, group_codes,
+                          estimation_window=(-250, -30), window_size=5, exclude_mask=None, return_moments=False):
+    """
+    Estima el modelo de mercado (alpha, beta) de cada evento por MCO sobre su
+    propia ventana de estimación [evento + inicio, evento + fin], sin usar
+    datos posteriores al evento. Todas las regresiones se resuelven a la vez
+    en forma cerrada con sumas acumuladas (medias, varianzas y covarianzas
+    móviles). exclude_mask marca días que no deben entrar en la estimación
+    (p. ej. otros días con noticia).
+    Devuelve (alpha, beta, sigma de los residuos, posiciones de los eventos válidos)
+    y, con return_moments=True, además los momentos del mercado en cada
+    ventana de estimación (n, market_mean, sxx) que necesita car_standard_deviation.
+    """
+    check_estimation_window(estimation_window, window_size)
+    x = np.asarray(market_returns, dtype=np.float64)
+    y = np.asarray(stock_returns, dtype=np.float64)
+    event_positions = np.asarray(event_positions)
+    weight = np.ones_like(x) if exclude_mask is None else (~np.asarray(exclude_mask, dtype=bool)).astype(np.float64)
+
+    def prefix_sum(values):
+        return np.concatenate(([0.0], np.cumsum(values)))
+
+    sums = {name: prefix_sum(values) for name, values in
+            {'n': weight, 'x': weight * x, 'y': weight * y,
+             'xx': weight * x * x, 'xy': weight * x * y, 'yy': weight * y * y}.items()}
+
+    start, end = estimation_window
+    lo, hi = event_positions + start, event_positions + end + 1 # Intervalo [lo, hi)
+    last = event_positions + window_size
+    inside = (lo >= 0) & (last < len(x))
+    lo, hi, last, event_positions = lo[inside], hi[inside], last[inside], event_positions[inside]
+    same_ticker = group_codes[lo] == group_codes[last]
+    lo, hi, event_positions = lo[same_ticker], hi[same_ticker], event_positions[same_ticker]
+
+    window_sum = {name: cumulative[hi] - cumulative[lo] for name, cumulative in sums.items()}
+    n = window_sum['n']
+    sxx = window_sum['xx'] - window_sum['x'] ** 2 / n
+    sxy = window_sum['xy'] - window_sum['x'] * window_sum['y'] / n
+    syy = window_sum['yy'] - window_sum['y'] ** 2 / n
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        beta = sxy / sxx
+        alpha = (window_sum['y'] - beta * window_sum['x']) / n
+        sigma = np.sqrt(np.maximum(syy - beta * sxy, 0.0) / (n - 2))
+    estimable = (n > 2) & (sxx > 0)
+    result = (alpha[estimable], beta[estimable], sigma[estimable], event_positions[estimable])
+    if return_moments:
+        moments = {'n': n[estimable], 'market_mean': window_sum['x'][estimable] / n[estimable], 'sxx': sxx[estimable]}
+        return result + (moments,)
+    return result
+
+def car_standard_deviation(market_returns, event_positions, sigma, moments, window_size=5):
+    """
+    Desviación típica del CAR de cada evento en cada día de la ventana
+    (eventos × ventana), con la corrección por error de predicción del modelo
+    de mercado estimado con T días: para un CAR de L días,
+    Var(CAR) = sigma² · (L + L²/T + (Σ (Rm_t − R̄m))² / Sxx).
+    """
+    index = np.asarray(event_positions)[:, None] + np.arange(-window_size, window_size + 1)
+    market = np.asarray(market_returns, dtype=np.float64)[index]
+    deviation = np.cumsum(market - moments['market_mean'][:, None], axis=1)
+    days_in_car = np.arange(1, index.shape[1] + 1)
+    variance = np.asarray(sigma)[:, None] ** 2 * (
+        days_in_car + days_in_car ** 2 / moments['n'][:, None] + deviation ** 2 / moments['sxx'][:, None])
+    return np.sqrt(variance)
+
+def abnormal_return_matrix(stock_returns, market_returns, event_positions, alpha, beta, window_size=5):
+    """Retornos anormales (eventos × ventana) con el alpha/beta propio de cada evento."""
+    index = np.asarray(event_positions)[:, None] + np.arange(-window_size, window_size + 1)
+    stock = np.asarray(stock_returns, dtype=np.float64)[index]
+    market = np.asarray(market_returns, dtype=np.float64)[index]
+    return stock - alpha[:, None] - beta[:, None] * market
+
+def _bootstrap_means(centered, n_resamples, seed):
+    """Medias de n_resamples remuestreos (con reemplazo) de las filas de centered."""
+    rng = np.random.default_rng(seed)
+    n_events = len(centered)
+    chunk = max(1, BOOTSTRAP_BLOCK // n_events)
+    means = []
+    for start in range(0, n_resamples, chunk):
+        size = min(chunk, n_resamples - start)
+        draws = rng.integers(0, n_events, size=(size, n_events))
+        # Veces que sale cada evento en cada remuestreo; la media es un producto matricial
+        flat = (draws + np.arange(size)[:, None] * n_events).ravel()
+        counts = np.bincount(flat, minlength=size * n_events).reshape(size, n_events)
+        means.append(counts @ centered / n_events)
+    return np.concatenate(means)
+
+def bootstrap_pvalues(car, n_resamples=10000, n_jobs=1, seed=0):
+    """
+    p-valor bootstrap (bilateral) de que el CAR medio sea 0 en cada día de la
+    ventana. Los CAR se centran para imponer la hipótesis nula y los
+    remuestreos se calculan por lotes en NumPy, opcionalmente en varios procesos.
+    """
+    centered = car - car.mean(axis=0)
+    seeds = np.random.SeedSequence(seed).spawn(max(n_jobs, 1))
+    if n_jobs > 1:
+        sizes = [len(chunk) for chunk in np.array_split(np.arange(n_resamples), n_jobs)]
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            boot_means = np.concatenate(list(executor.map(_bootstrap_means, [centered] * n_jobs, sizes, seeds)))
+    else:
+        boot_means = _bootstrap_means(centered, n_resamples, seeds[0])
+    observed = np.abs(car.mean(axis=0))
+    return (1 + (np.abs(boot_means) >= observed).sum(axis=0)) / (1 + len(boot_means))
+
+def caar_tests(abnormal_returns, car_std=None, window_size=5, n_resamples=10000, n_jobs=1, seed=0):
+    """
+    AAR, CAAR y contrastes de significación sobre la matriz (eventos × ventana)
+    de retornos anormales:
+      - t-test transversal sobre los CAR de cada día,
+      - test BMP (Boehmer, Musumeci y Poulsen) con cada CAR estandarizado por
+        su propia desviación típica (car_std, eventos × ventana, de
+        car_standard_deviation); sin car_std se omite, porque con una sola
+        sigma común coincidiría con el t-test,
+      - p-valor bootstrap de los CAR.
+    Devuelve un DataFrame indexado por el día relativo al evento.
+    """
+    ar = np.asarray(abnormal_returns, dtype=np.float64)
+    n_events = len(ar)
+    car = np.cumsum(ar, axis=1)
+
+    def cross_sectional_t(x):
+        t_stat = x.mean(axis=0) / (x.std(axis=0, ddof=1) / np.sqrt(n_events))
+        return t_stat, 2 * stats.t.sf(np.abs(t_stat), df=n_events - 1)
+
+    results = pd.DataFrame(index=pd.RangeIndex(-window_size, window_size + 1, name='day'))
+    results['AAR'] = ar.mean(axis=0)
+    results['CAAR'] = car.mean(axis=0)
+    results['t_stat'], results['t_pvalue'] = cross_sectional_t(car)
+
+    if car_std is not None:
+        results['bmp_stat'], results['bmp_pvalue'] = cross_sectional_t(car / np.asarray(car_std, dtype=np.float64))
+
+    if n_resamples:
+        results['bootstrap_pvalue'] = bootstrap_pvalues(car, n_resamples, n_jobs, seed)
+    return results
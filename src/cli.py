@@ -0,0 +1,219 @@
+"""
+Punto de entrada único del proyecto.
+
+    python -m src init-db
+    python -m src fetch TM GM --compact
+    python -m src load
+    python -m src enrich --workers 8
+    python -m src analyze
+    python -m src event-study --per-event
+    python -m src train xgboost
+    python -m src train lstm --fast --batch-size 512 --intra-op 16
+
+Cada subcomando importa sus dependencias (TensorFlow, XGBoost, ClickHouse,
+yfinance, seaborn...) solo al ejecutarse, así que `--help` y los comandos
+ligeros arrancan sin cargarlas.
+"""
+import argparse
+
+# Módulo que carga cada subcomando (lo usa también benchmarks.bench_cli_startup)
+COMMAND_MODULES = {
+    'init-db': 'src.data_bbdd_pipeline.initialize_database',
+    'fetch': 'data_api',
+    'load': 'src.data_bbdd_pipeline.load_to_clickhouse',
+    'load-index': 'src.data_bbdd_pipeline.load_market_index',
+    'enrich': 'src.data_bbdd_pipeline.enrich_table',
+    'analyze': 'src.analysis.analyze_impact',
+    'event-study': 'src.analysis.analyze_impact_event_study',
+    'features': 'src.feature_store',
+    'train xgboost': 'src.modeling.train_xgboost',
+    'train lstm': 'src.modeling.train_lstm',
+    'train transformer': 'src.modeling.train_transformers',
+    'backtest': 'src.modeling.backtest_xgboost',
+    'tune': 'src.modeling.tune_xgboost',
+    'export': 'src.serving.export',
+    'serve': 'src.serving.service',
+}
+
+def run_init_db(args):
+    from src.data_bbdd_pipeline.initialize_database import main
+    main()
+
+def run_fetch(args):
+    from data_api import SYMBOLS, fetch_symbols
+    fetch_symbols(args.symbols or SYMBOLS, outputsize='compact' if args.compact else 'full')
+
+def run_load(args):
+    from src.data_bbdd_pipeline.load_to_clickhouse import SYMBOLS, INSERT_BLOCK_SIZE, main
+    main(symbols=args.symbols or SYMBOLS, incremental=not args.full, block_size=args.block_size or INSERT_BLOCK_SIZE)
+
+def run_load_index(args):
+    from src.data_bbdd_pipeline.load_market_index import MARKET_SYMBOLS, main
+    main(args.symbols or MARKET_SYMBOLS)
+
+def run_enrich(args):
+    from src.data_bbdd_pipeline.enrich_table import MAX_WORKERS, main
+    main(max_workers=args.workers or MAX_WORKERS)
+
+def run_analyze(args):
+    from src.analysis.analyze_impact import descriptive_analysis
+    descriptive_analysis(server_features=args.server_features, in_database=args.in_database)
+
+def run_event_study(args):
+    from src.analysis.analyze_impact_event_study import event_study_analysis
+    event_study_analysis(n_resamples=args.resamples, n_jobs=args.jobs, per_event=args.per_event,
+                         estimation_window=tuple(args.estimation_window))
+
+def _feature_set_path(args):
+    from src.feature_store import get_feature_set_path
+    return get_feature_set_path(feature_source=args.feature_source)
+
+def run_features(args):
+    from src.feature_store import materialize_features
+    if args.force:
+        materialize_features(feature_source=args.feature_source)
+    else:
+        print(_feature_set_path(args))
+
+def run_train(args):
+    save = not args.no_save
+    if args.model == 'xgboost':
+        from src.modeling.train_xgboost import train_xgboost
+        train_xgboost(_feature_set_path(args), save=save)
+        return
+    options = dict(batch_size=args.batch_size, jit_compile=args.jit, intra_op=args.intra_op, inter_op=args.inter_op)
+    if args.compare:
+        from src.modeling.training import compare_with_baseline
+        compare_with_baseline(args.model, _feature_set_path(args), epochs=args.epochs or 5,
+                              target_accuracy=args.target_accuracy, **options)
+    elif args.model == 'lstm':
+        from src.modeling.train_lstm import train_lstm
+        train_lstm(_feature_set_path(args), epochs=args.epochs, save=save, fast=args.fast, **options)
+    else:
+        from src.modeling.train_transformers import train_transformer
+        train_transformer(_feature_set_path(args), epochs=args.epochs, save=save, fast=args.fast, **options)
+
+def run_backtest(args):
+    from src.modeling.backtest_xgboost import walk_forward_backtest
+    walk_forward_backtest(_feature_set_path(args), n_folds=args.folds, n_jobs=args.jobs, warm_start=args.warm_start)
+
+def run_tune(args):
+    from src.modeling.tune_xgboost import TRIALS_PATH, tune_xgboost
+    tune_xgboost(_feature_set_path(args), args.strategy, args.jobs, trials_path=args.trials or TRIALS_PATH)
+
+def run_export(args):
+    from src.serving.export import export_model
+    export_model(args.model, args.quantization, n_calibration=args.calibration)
+
+def run_serve(args):
+    from src.serving.service import serve
+    serve(args.host, args.port, kinds=args.models, runtime=args.runtime)
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m src', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', metavar='COMANDO', required=True)
+
+    p = commands.add_parser('init-db', help="Crea la base de datos, tablas y vistas.")
+    p.set_defaults(handler=run_init_db)
+
+    p = commands.add_parser('fetch', help="Descarga las series diarias de Alpha Vantage.")
+    p.add_argument('symbols', nargs='*', help="Símbolos a descargar (por defecto, todo el universo).")
+    p.add_argument('--compact', action='store_true', help="Pide solo los últimos 100 días bursátiles.")
+    p.set_defaults(handler=run_fetch)
+
+    p = commands.add_parser('load', help="Carga los precios diarios en stock_daily.")
+    p.add_argument('symbols', nargs='*', help="Símbolos a cargar (por defecto, todo el universo).")
+    p.add_argument('--full', action='store_true', help="Usa los ficheros locales completos en lugar de la ventana reciente.")
+    p.add_argument('--block-size', type=int, help="Filas por bloque de inserción.")
+    p.set_defaults(handler=run_load)
+
+    p = commands.add_parser('load-index', help="Carga los cierres del índice de mercado en market_index.")
+    p.add_argument('symbols', nargs='*', help="Índices a cargar (por defecto, ^GSPC).")
+    p.set_defaults(handler=run_load_index)
+
+    p = commands.add_parser('enrich', help="Añade las fechas de las noticias a news_events.")
+    p.add_argument('--workers', type=int, help="Número de descargas simultáneas.")
+    p.set_defaults(handler=run_enrich)
+
+    p = commands.add_parser('analyze', help="Análisis descriptivo del impacto de las noticias.")
+    p.add_argument('--server-features', action='store_true', help="Lee las métricas de la vista stock_features.")
+    p.add_argument('--in-database', action='store_true', help="Agrega medias y cuantiles en ClickHouse.")
+    p.set_defaults(handler=run_analyze)
+
+    p = commands.add_parser('event-study', help="Event study (CAAR y contrastes de significación).")
+    p.add_argument('--per-event', action='store_true', help="Estima alpha/beta por evento con su ventana previa.")
+    p.add_argument('--estimation-window', type=int, nargs=2, default=(-250, -30), metavar=('INICIO', 'FIN'),
+                   help="Ventana de estimación relativa al evento (por defecto -250 -30).")
+    p.add_argument('--resamples', type=int, default=10000, help="Remuestreos del bootstrap.")
+    p.add_argument('--jobs', type=int, default=1, help="Procesos para el bootstrap.")
+    p.set_defaults(handler=run_event_study)
+
+    # Los comandos de modelado leen del almacén de características
+    feature_source = argparse.ArgumentParser(add_help=False)
+    feature_source.add_argument('--feature-source', choices=['client', 'server'], default='client',
+                                help="Dónde se calculan las características (pandas o ClickHouse).")
+
+    p = commands.add_parser('features', parents=[feature_source], help="Materializa el conjunto de características versionado.")
+    p.add_argument('--force', action='store_true', help="Vuelve a calcular aunque la versión ya exista.")
+    p.set_defaults(handler=run_features)
+
+    p = commands.add_parser('train', parents=[feature_source], help="Entrena un modelo y lo guarda en el registro.")
+    p.add_argument('model', choices=['xgboost', 'lstm', 'transformer'])
+    p.add_argument('--epochs', type=int, help="Épocas (solo modelos secuenciales).")
+    p.add_argument('--no-save', action='store_true', help="No guarda el modelo en el registro.")
+    p.add_argument('--fast', action='store_true',
+                   help="Modo rápido en CPU: tf.data paralelo, lotes grandes y parada temprana (modelos secuenciales).")
+    p.add_argument('--batch-size', type=int, help="Tamaño de lote (el learning rate se escala con él en modo rápido).")
+    p.add_argument('--jit', action='store_true', help="Compila el modelo con XLA (modo rápido).")
+    p.add_argument('--intra-op', type=int, help="Hilos dentro de cada operación de TensorFlow (modo rápido).")
+    p.add_argument('--inter-op', type=int, help="Operaciones de TensorFlow en paralelo (modo rápido).")
+    p.add_argument('--compare', action='store_true',
+                   help="Compara muestras/s y tiempo hasta la accuracy objetivo con la configuración original.")
+    p.add_argument('--target-accuracy', type=float, help="Accuracy de validación objetivo para --compare.")
+    p.set_defaults(handler=run_train)
+
+    p = commands.add_parser('backtest', parents=[feature_source], help="Backtest walk-forward de XGBoost.")
+    p.add_argument('--folds', type=int, default=5)
+    p.add_argument('--jobs', type=int, default=1, help="Folds en paralelo (procesos).")
+    p.add_argument('--warm-start', action='store_true', help="Cada fold continúa el modelo del anterior.")
+    p.set_defaults(handler=run_backtest)
+
+    p = commands.add_parser('tune', parents=[feature_source], help="Búsqueda de hiperparámetros de XGBoost.")
+    p.add_argument('--strategy', choices=['halving', 'grid'], default='halving')
+    p.add_argument('--jobs', type=int, default=1, help="Pruebas en paralelo (procesos).")
+    p.add_argument('--trials', help="Fichero JSONL con las pruebas (permite reanudar).")
+    p.set_defaults(handler=run_tune)
+
+    p = commands.add_parser('export', help="Exporta un modelo secuencial a SavedModel y TFLite cuantizado.")
+    p.add_argument('model', choices=['lstm', 'transformer'])
+    p.add_argument('--quantization', choices=['none', 'float16', 'dynamic', 'int8'], default='float16')
+    p.add_argument('--calibration', type=int, default=500, help="Ventanas de calibración (int8).")
+    p.set_defaults(handler=run_export)
+
+    p = commands.add_parser('serve', help="Servicio HTTP de predicción.")
+    p.add_argument('--host', default='127.0.0.1')
+    p.add_argument('--port', type=int, default=8080)
+    p.add_argument('--models', nargs='*', help="Modelos a cargar (por defecto, todos los del registro).")
+    p.add_argument('--runtime', choices=['keras', 'tflite'], default='keras', help="Motor de los modelos secuenciales.")
+    p.set_defaults(handler=run_serve)
+    return parser
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == 'event-study':
+        from src.analysis.event_study import check_estimation_window
+        try:
+            check_estimation_window(args.estimation_window)
+        except ValueError as e:
+            parser.error(str(e))
+    if args.command == 'train' and not (args.fast or args.compare):
+        ignored = [flag for flag, value in (('--jit', args.jit), ('--intra-op', args.intra_op),
+                                            ('--inter-op', args.inter_op)) if value]
+        if ignored:
+            parser.error(f"{', '.join(ignored)} solo se aplica con --fast o --compare")
+    args.handler(args)
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,17 @@
 import os
-from datetime import datetime
+import json
+import time
+import threading
+from datetime import datetime, date
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
 from clickhouse_driver import Client
 import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
 from dotenv import load_dotenv
+from src.data_cache import invalidate_cache
+from src.telemetry import stage
 
 load_dotenv('credenciales.env')
 # --- Configuración ---
@@ -12,96 +20,256 @@ CLICKHOUSE_PORT = 9000
 CLICKHOUSE_USER = os.getenv('CH_USER')      
 CLICKHOUSE_PASSWORD = os.getenv('CH_PASSWORD') 
 DB_NAME = 'stocks_db'
+NEWS_TICKER = 'TM' # Las noticias del fichero son de Toyota Motor (NYSE)
 NEWS_FILE_PATH = 'data/noticias.txt' 
+NEWS_CACHE_PATH = 'data/news_cache.json' # URL -> (ETag/Last-Modified, fecha parseada)
+MAX_WORKERS = 8                          # Descargas simultáneas
+REQUESTS_PER_SECOND_PER_DOMAIN = 2.0     # Límite de peticiones por dominio
+REQUEST_TIMEOUT = 15
+HEADERS = {'User-Agent': 'Mozilla/5.0'} # Simulamos ser un navegador
 
-def scrape_news_date(url):
+class DomainRateLimiter:
     """
-    Visita una URL, parsea su HTML y extrae la fecha de publicación.
-    Versión actualizada para manejar múltiples formatos de fecha.
+    Limita el ritmo de peticiones por dominio, repartiendo los huecos
+    temporales entre todos los hilos que comparten el limitador.
     """
+    def __init__(self, requests_per_second):
+        self.min_interval = 1.0 / requests_per_second if requests_per_second else 0.0
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url):
+        if not self.min_interval:
+            return
+        host = urlparse(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.min_interval
+        if slot > now:
+            time.sleep(slot - now)
+
+def create_session(pool_size=MAX_WORKERS):
+    """Crea una sesión HTTP con un pool de conexiones reutilizables por host."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, pool_block=True)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers.update(HEADERS)
+    return session
+
+def load_news_cache(path=NEWS_CACHE_PATH):
+    """Carga la caché de noticias ya descargadas (vacía si no existe)."""
+    if not os.path.exists(path):
+        return {}
     try:
-        headers = {'User-Agent': 'Mozilla/5.0'} # Simulamos ser un navegador
-        response = requests.get(url, headers=headers, timeout=15)
-        response.raise_for_status() # Lanza un error si la descarga falla
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"   Aviso: No se pudo leer la caché '{path}', se ignorará: {e}")
+        return {}
+
+def save_news_cache(cache, path=NEWS_CACHE_PATH):
+    """Guarda la caché de forma atómica para no corromperla si el proceso se interrumpe."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(cache, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
 
-        soup = BeautifulSoup(response.content, 'html.parser')
+def parse_news_date(content, url):
+    """
+    Parsea el HTML de una noticia y extrae la fecha de publicación.
+    Versión actualizada para manejar múltiples formatos de fecha.
+    """
+    soup = BeautifulSoup(content, 'html.parser')
 
-        # --- LÓGICA DE BÚSQUEDA ---
-        # Buscamos en orden de prioridad los selectores que hemos identificado.
-        date_element = soup.select_one('p.date, time, .p-news-head__date, .news-detail-date-wrap')
+    # --- LÓGICA DE BÚSQUEDA ---
+    # Buscamos en orden de prioridad los selectores que hemos identificado.
+    date_element = soup.select_one('p.date, time, .p-news-head__date, .news-detail-date-wrap')
+    
+    if date_element:
+        # La etiqueta <time> suele tener un atributo 'datetime' que es más limpio
+        date_str = date_element.get('datetime', date_element.text).strip()
         
-        if date_element:
-            # La etiqueta <time> suele tener un atributo 'datetime' que es más limpio
-            date_str = date_element.get('datetime', date_element.text).strip()
-            
-            # --- LÓGICA DE PARSEO  ---
-            # Intentamos parsear la fecha con varios formatos conocidos.
-            for fmt in ('%Y-%m-%d', '%B %d, %Y', '%b. %d, %Y'):
-                try:
-                    return datetime.strptime(date_str, fmt).date()
-                except ValueError:
-                    continue # Si falla, prueba el siguiente formato
-            
-            # Si ninguno de los formatos funcionó
-            print(f"   Aviso: Formato de fecha no reconocido: '{date_str}' en {url}")
-            return None
-        else:
-            print(f"   Aviso: No se encontró un elemento de fecha en {url}")
-            return None
+        # --- LÓGICA DE PARSEO  ---
+        # Intentamos parsear la fecha con varios formatos conocidos.
+        for fmt in ('%Y-%m-%d', '%B %d, %Y', '%b. %d, %Y'):
+            try:
+                return datetime.strptime(date_str, fmt).date()
+            except ValueError:
+                continue # Si falla, prueba el siguiente formato
+        
+        # Si ninguno de los formatos funcionó
+        print(f"   Aviso: Formato de fecha no reconocido: '{date_str}' en {url}")
+        return None
+    else:
+        print(f"   Aviso: No se encontró un elemento de fecha en {url}")
+        return None
+
+def _cached_date(cache_entry):
+    """Fecha ya parseada de una entrada de la caché (None si no hay)."""
+    cached_date = (cache_entry or {}).get('date')
+    return date.fromisoformat(cached_date) if cached_date else None
+
+def fetch_news_date(session, url, cache_entry=None, rate_limiter=None):
+    """
+    Descarga una noticia y devuelve (fecha, entrada_de_caché).
+    Si la caché tiene ETag/Last-Modified se hace una petición condicional:
+    un 304 reutiliza la fecha ya parseada sin descargar ni parsear la página.
+    Si la descarga falla se devuelve la fecha de la caché, si la hay.
+    """
+    conditional_headers = {}
+    if cache_entry:
+        if cache_entry.get('etag'):
+            conditional_headers['If-None-Match'] = cache_entry['etag']
+        if cache_entry.get('last_modified'):
+            conditional_headers['If-Modified-Since'] = cache_entry['last_modified']
+
+    try:
+        if rate_limiter:
+            rate_limiter.wait(url)
+        response = session.get(url, headers=conditional_headers, timeout=REQUEST_TIMEOUT)
+        if response.status_code == 304 and cache_entry:
+            return _cached_date(cache_entry), cache_entry
+        response.raise_for_status() # Lanza un error si la descarga falla
+
+        event_date = parse_news_date(response.content, url)
+        new_entry = {
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'date': event_date.isoformat() if event_date else None,
+        }
+        return event_date, new_entry
 
     except requests.exceptions.RequestException as e:
         print(f"   Error descargando la URL {url}: {e}")
-        return None
+        return _cached_date(cache_entry), cache_entry
     except Exception as e:
         print(f"   Error procesando la URL {url}: {e}")
-        return None
+        return _cached_date(cache_entry), cache_entry
+
+def scrape_news_date(url, session=None):
+    """
+    Visita una URL, parsea su HTML y extrae la fecha de publicación.
+    """
+    event_date, _ = fetch_news_date(session or create_session(pool_size=1), url)
+    return event_date
 
-def update_clickhouse_record(client, event_date, news_type):
+def read_news_file(path=NEWS_FILE_PATH):
+    """Lee el fichero de noticias y devuelve una lista de (url, tipo_de_noticia)."""
+    news = []
+    with open(path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if not line or '->' not in line:
+                continue
+            url, news_type = line.split(' -> ', 1)
+            news.append((url.strip(), news_type.strip()))
+    return news
+
+def scrape_news_concurrently(news, max_workers=MAX_WORKERS, cache_path=NEWS_CACHE_PATH,
+                             requests_per_second=REQUESTS_PER_SECOND_PER_DOMAIN):
+    """
+    Obtiene la fecha de cada noticia con un pool acotado de hilos que comparten
+    una sesión HTTP (pool de conexiones por host) y un limitador por dominio.
+    Devuelve una lista de (url, tipo_de_noticia, fecha) en el orden de entrada.
     """
-    Ejecuta un comando ALTER TABLE...UPDATE en ClickHouse para una fecha específica.
+    cache = load_news_cache(cache_path)
+    session = create_session(pool_size=max_workers)
+    rate_limiter = DomainRateLimiter(requests_per_second)
+    results = [None] * len(news)
+
+    try:
+        with stage('scrape_news', rows_in=len(news)) as s, ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(fetch_news_date, session, url, cache.get(url), rate_limiter): i
+                for i, (url, _) in enumerate(news)
+            }
+            for done, future in enumerate(as_completed(futures), start=1):
+                i = futures[future]
+                url, news_type = news[i]
+                event_date, entry = future.result()
+                if entry is not None:
+                    cache[url] = entry
+                results[i] = (url, news_type, event_date)
+                print(f"[{done}/{len(news)}] {url} -> {event_date or 'sin fecha'}")
+            s.rows_out = sum(1 for _, _, event_date in results if event_date)
+    finally:
+        session.close()
+        save_news_cache(cache, cache_path)
+
+    return results
+
+def get_stored_news(client):
+    """Devuelve el conjunto de (url, fecha ISO) ya guardados en news_events para NEWS_TICKER."""
+    rows = client.execute(f'SELECT url, event_date FROM {DB_NAME}.news_events WHERE ticker = %(ticker)s',
+                          {'ticker': NEWS_TICKER})
+    return {(url, str(event_date)) for url, event_date in rows}
+
+def insert_news_events(client, events):
     """
-    date_str_for_query = event_date.strftime('%Y-%m-%d')
-    query = f"""
-    ALTER TABLE {DB_NAME}.stock_daily 
-    UPDATE News = 1, News_Type = '{news_type.replace("'", "''")}'
-    WHERE event_date = '{date_str_for_query}'
+    Inserta en un único lote las noticias en la tabla news_events.
+    Cada evento es una tupla (url, tipo_de_noticia, fecha).
     """
-    
+    rows = [
+        (NEWS_TICKER, event_date, news_type, url)
+        for url, news_type, event_date in events
+    ]
+    if not rows:
+        return 0
+
     try:
-        # Los settings son necesarios para que la mutación se ejecute de forma síncrona
-        client.execute(query, settings={'mutations_sync': 2})
-        print(f"   ✅ Registro actualizado para la fecha {date_str_for_query}")
-        return True
+        client.execute(
+            f'INSERT INTO {DB_NAME}.news_events (ticker, event_date, news_type, url) VALUES',
+            rows
+        )
+        print(f"   ✅ {len(rows)} noticias insertadas en news_events.")
+        return len(rows)
     except Exception as e:
-        print(f"   ❌ Error actualizando el registro para la fecha {date_str_for_query}: {e}")
-        return False
+        print(f"   ❌ Error insertando las noticias en news_events: {e}")
+        return 0
 
-def main():
+def load_news_events(client, scraped):
+    """
+    Inserta las noticias con fecha que aún no están en news_events (nuevas o
+    con la fecha cambiada) e invalida en la caché local solo esas fechas.
+    Devuelve el número de noticias insertadas.
+    """
+    stored = get_stored_news(client)
+    events = []
+    for url, news_type, event_date in scraped:
+        if not event_date:
+            print(f"   No se pudo procesar la noticia {url}.")
+        elif (url, event_date.isoformat()) not in stored:
+            events.append((url, news_type, event_date))
+    print(f"   {len(events)} noticias nuevas o con fecha cambiada; {len(scraped) - len(events)} sin cambios o sin fecha.")
+
+    with stage('insert_news_events', rows_in=len(events)) as s:
+        s.rows_out = insert_news_events(client, events)
+    if s.rows_out:
+        # Las filas de esas fechas cambian News/News_Type: se refrescarán en la caché local
+        invalidate_cache(event_dates=sorted({event_date for _, _, event_date in events}), tickers=[NEWS_TICKER])
+    return s.rows_out
+
+def main(max_workers=MAX_WORKERS):
     if not os.path.exists(NEWS_FILE_PATH):
         print(f"Error: El fichero de noticias '{NEWS_FILE_PATH}' no fue encontrado.")
         return
 
+    news = read_news_file(NEWS_FILE_PATH)
+    print(f"📰 {len(news)} noticias encontradas. Descargando con {max_workers} hilos...")
+    scraped = scrape_news_concurrently(news, max_workers=max_workers)
+
     client = Client(host=CLICKHOUSE_HOST, port=CLICKHOUSE_PORT, user=CLICKHOUSE_USER, password=CLICKHOUSE_PASSWORD, database=DB_NAME)
     print("🔌 Conexión a ClickHouse establecida.")
-
-    with open(NEWS_FILE_PATH, 'r') as f:
-        for i, line in enumerate(f):
-            line = line.strip()
-            if not line or '->' not in line:
-                continue
-
-            url, news_type = line.split(' -> ', 1)
-            print(f"\n[{i+1}] Procesando URL: {url.strip()}")
-
-            event_date = scrape_news_date(url.strip())
-            
-            if event_date:
-                update_clickhouse_record(client, event_date, news_type.strip())
-            else:
-                print("   No se pudo procesar esta noticia.")
-
+    load_news_events(client, scraped)
     client.disconnect()
     print("\n🏁 Proceso finalizado. Conexión a ClickHouse cerrada.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    import argparse
+    parser = argparse.ArgumentParser(description="Carga las fechas de las noticias en news_events.")
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS, help="Número de descargas simultáneas.")
+    args = parser.parse_args()
+    main(max_workers=args.workers)
@@ -24,19 +24,154 @@ CREATE TABLE IF NOT EXISTS {DB_NAME}.stock_daily
     `close` Float64,
     `volume` UInt64
 )
-ENGINE = MergeTree
+ENGINE = ReplacingMergeTree -- Una fila por (ticker, event_date) aunque se reinserte
 PARTITION BY toYYYYMM(event_date)
 ORDER BY (ticker, event_date);
 """
-ADD_COLUMNS = [f"""
-ALTER TABLE stocks_db.stock_daily ADD COLUMN IF NOT EXISTS News UInt8 DEFAULT 0;""",
-f"""ALTER TABLE stocks_db.stock_daily ADD COLUMN IF NOT EXISTS News_Type Nullable(String) DEFAULT NULL;
-"""]
+# Las noticias se guardan en su propia tabla con inserciones en bloque;
+# News/News_Type se resuelven al leer mediante la vista stock_daily_news,
+# que lee stock_daily con FINAL: las barras reinsertadas (última sesión
+# cargada de nuevo) no se ven duplicadas aunque las partes no se hayan fusionado.
+CREATE_NEWS_TABLE_SQL = f"""
+CREATE TABLE IF NOT EXISTS {DB_NAME}.news_events
+(
+    `ticker` String,
+    `event_date` Date,
+    `news_type` String,
+    `url` String
+)
+ENGINE = ReplacingMergeTree
+ORDER BY (ticker, event_date, url);
+"""
+
+CREATE_NEWS_VIEW_SQL = f"""
+CREATE OR REPLACE VIEW {DB_NAME}.stock_daily_news AS
+SELECT
+    s.ticker AS ticker,
+    s.event_date AS event_date,
+    s.open AS open,
+    s.high AS high,
+    s.low AS low,
+    s.close AS close,
+    s.volume AS volume,
+    toUInt8(n.has_news) AS News,
+    if(n.has_news = 1, n.news_type, NULL) AS News_Type
+FROM {DB_NAME}.stock_daily AS s FINAL
+LEFT JOIN
+(
+    SELECT ticker, event_date, toUInt8(1) AS has_news, anyLast(news_type) AS news_type
+    FROM {DB_NAME}.news_events
+    GROUP BY ticker, event_date
+) AS n ON s.ticker = n.ticker AND s.event_date = n.event_date;
+"""
+
+# Índices de referencia (p. ej. ^GSPC) para el event study, sin depender de la red
+CREATE_MARKET_INDEX_TABLE_SQL = f"""
+CREATE TABLE IF NOT EXISTS {DB_NAME}.market_index
+(
+    `symbol` String,
+    `event_date` Date,
+    `close` Float64
+)
+ENGINE = ReplacingMergeTree
+ORDER BY (symbol, event_date);
+"""
+
+# Capa de características calculada en el servidor con funciones de ventana.
+# Es una vista normal: se evalúa al leer, así que siempre refleja las filas
+# recién insertadas (una vista materializada solo vería cada bloque insertado
+# y no podría calcular ventanas que abarcan inserciones anteriores).
+# Las filas sin historia suficiente devuelven nan, igual que pandas.
+CREATE_FEATURES_VIEW_SQL = f"""
+CREATE OR REPLACE VIEW {DB_NAME}.stock_features AS
+SELECT
+    ticker, event_date, open, high, low, close, volume, News, News_Type,
+    toUInt8(next_close > close) AS target,
+    if(rn > 1, prev_close_1, nan) AS close_lag_1,
+    if(rn > 1, prev_volume_1, nan) AS volume_lag_1,
+    if(rn > 2, prev_close_2, nan) AS close_lag_2,
+    if(rn > 2, prev_volume_2, nan) AS volume_lag_2,
+    if(rn > 3, prev_close_3, nan) AS close_lag_3,
+    if(rn > 3, prev_volume_3, nan) AS volume_lag_3,
+    if(rn > 4, prev_close_4, nan) AS close_lag_4,
+    if(rn > 4, prev_volume_4, nan) AS volume_lag_4,
+    if(rn > 5, prev_close_5, nan) AS close_lag_5,
+    if(rn > 5, prev_volume_5, nan) AS volume_lag_5,
+    if(rn >= 10, sma_10_raw, nan) AS sma_10,
+    if(rn >= 30, sma_30_raw, nan) AS sma_30,
+    if(rn >= 30, volatility_30_raw, nan) AS volatility_30,
+    if(rn >= 14, 100 - (100 / (1 + avg_gain / avg_loss)), nan) AS rsi,
+    if(rn > 1, close / prev_close_1 - 1, nan) AS daily_return,
+    abs(daily_return) AS abs_return,
+    (high - low) / low AS volatility_range,
+    if(rn >= 30, volume / volume_sma_30_raw, nan) AS volume_change_ratio
+FROM
+(
+    SELECT
+        *,
+        avg(gain) OVER w14 AS avg_gain,
+        avg(loss) OVER w14 AS avg_loss
+    FROM
+    (
+        SELECT
+            ticker, event_date, open, high, low, close, volume, News, News_Type,
+            row_number() OVER w AS rn,
+            leadInFrame(close, 1) OVER (PARTITION BY ticker ORDER BY event_date
+                                        ROWS BETWEEN CURRENT ROW AND 1 FOLLOWING) AS next_close,
+            lagInFrame(close, 1) OVER w AS prev_close_1,
+            lagInFrame(close, 2) OVER w AS prev_close_2,
+            lagInFrame(close, 3) OVER w AS prev_close_3,
+            lagInFrame(close, 4) OVER w AS prev_close_4,
+            lagInFrame(close, 5) OVER w AS prev_close_5,
+            lagInFrame(toFloat64(volume), 1) OVER w AS prev_volume_1,
+            lagInFrame(toFloat64(volume), 2) OVER w AS prev_volume_2,
+            lagInFrame(toFloat64(volume), 3) OVER w AS prev_volume_3,
+            lagInFrame(toFloat64(volume), 4) OVER w AS prev_volume_4,
+            lagInFrame(toFloat64(volume), 5) OVER w AS prev_volume_5,
+            if(rn > 1, greatest(close - prev_close_1, 0), 0) AS gain,
+            if(rn > 1, greatest(prev_close_1 - close, 0), 0) AS loss,
+            avg(close) OVER (PARTITION BY ticker ORDER BY event_date ROWS BETWEEN 9 PRECEDING AND CURRENT ROW) AS sma_10_raw,
+            avg(close) OVER w30 AS sma_30_raw,
+            stddevSamp(close) OVER w30 AS volatility_30_raw,
+            avg(toFloat64(volume)) OVER w30 AS volume_sma_30_raw
+        FROM {DB_NAME}.stock_daily_news
+        WINDOW
+            w AS (PARTITION BY ticker ORDER BY event_date ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW),
+            w30 AS (PARTITION BY ticker ORDER BY event_date ROWS BETWEEN 29 PRECEDING AND CURRENT ROW)
+    )
+    WINDOW w14 AS (PARTITION BY ticker ORDER BY event_date ROWS BETWEEN 13 PRECEDING AND CURRENT ROW)
+);
+"""
+
+def migrate_stock_daily(client):
+    """
+    Las bases de datos creadas antes de usar ReplacingMergeTree tienen
+    stock_daily como MergeTree, y CREATE TABLE IF NOT EXISTS no la cambia.
+    Se crea la tabla nueva, se copian las filas (una por ticker y día al
+    fusionarse), se intercambian los nombres y se borra la antigua.
+    Devuelve True si ha hecho falta migrar.
+    """
+    engine = client.execute(
+        "SELECT engine FROM system.tables WHERE database = %(database)s AND name = 'stock_daily'",
+        {'database': DB_NAME}
+    )
+    if not engine or engine[0][0] == 'ReplacingMergeTree':
+        return False
+    columns = 'ticker, event_date, open, high, low, close, volume'
+    client.execute(f"DROP TABLE IF EXISTS {DB_NAME}.stock_daily_replacing")
+    client.execute(CREATE_TABLE_SQL.replace(f"{DB_NAME}.stock_daily", f"{DB_NAME}.stock_daily_replacing", 1))
+    client.execute(f"INSERT INTO {DB_NAME}.stock_daily_replacing ({columns}) SELECT {columns} FROM {DB_NAME}.stock_daily")
+    client.execute(f"RENAME TABLE {DB_NAME}.stock_daily TO {DB_NAME}.stock_daily_mergetree, "
+                   f"{DB_NAME}.stock_daily_replacing TO {DB_NAME}.stock_daily")
+    client.execute(f"DROP TABLE {DB_NAME}.stock_daily_mergetree")
+    return True
 
 def main():
     """
     Se conecta a la base de datos 'default', crea la base de datos
     del proyecto y luego crea la tabla necesaria, en pasos separados.
+    Volver a ejecutarlo sobre una base de datos existente migra stock_daily
+    a ReplacingMergeTree si aún es MergeTree.
     """
     client = None
     try:
@@ -57,9 +192,18 @@ def main():
         print(f">> Paso 3: Creando la tabla 'stock_daily'...")
         client.execute(CREATE_TABLE_SQL)
         print("   Tabla 'stock_daily' creada o ya existente.")
-        print(f" >> Añadir columnas relacionadas con noticias ...")
-        client.execute(ADD_COLUMNS[0])
-        client.execute(ADD_COLUMNS[1])
+        if migrate_stock_daily(client):
+            print("   Tabla 'stock_daily' migrada de MergeTree a ReplacingMergeTree.")
+        print(f">> Paso 4: Creando la tabla 'news_events' y la vista 'stock_daily_news'...")
+        client.execute(CREATE_NEWS_TABLE_SQL)
+        client.execute(CREATE_NEWS_VIEW_SQL)
+        print("   Tabla de noticias y vista enriquecida creadas o ya existentes.")
+        print(f">> Paso 5: Creando la tabla 'market_index'...")
+        client.execute(CREATE_MARKET_INDEX_TABLE_SQL)
+        print("   Tabla 'market_index' creada o ya existente.")
+        print(f">> Paso 6: Creando la vista de características 'stock_features'...")
+        client.execute(CREATE_FEATURES_VIEW_SQL)
+        print("   Vista 'stock_features' creada o actualizada.")
         print("\n✅ ¡Inicialización de la base de datos completada exitosamente!")
 
     except Exception as e:
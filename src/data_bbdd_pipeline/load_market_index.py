@@ -0,0 +1,88 @@
+import os
+from datetime import date, timedelta
+import numpy as np
+import yfinance as yf
+from clickhouse_driver import Client
+from dotenv import load_dotenv
+from src.data_cache import invalidate_cache
+
+load_dotenv('credenciales.env')
+# --- Configuración ---
+CLICKHOUSE_HOST = 'localhost'
+CLICKHOUSE_PORT = 9000
+CLICKHOUSE_USER = os.getenv('CH_USER')      
+CLICKHOUSE_PASSWORD = os.getenv('CH_PASSWORD')
+DB_NAME = 'stocks_db'
+MARKET_SYMBOLS = ['^GSPC'] # Índices de referencia que se guardan en market_index
+HISTORY_START = '2000-01-01' # Inicio de la descarga cuando el índice aún no está en la tabla
+REFETCH_DAYS = 1 # Días naturales hasta el último guardado (incluido) que se vuelven a descargar: pueden ser barras intradía parciales
+INSERT_SQL = f'INSERT INTO {DB_NAME}.market_index (symbol, event_date, close) VALUES'
+
+def get_latest_index_dates(client):
+    """Devuelve {símbolo: última fecha almacenada} de la tabla market_index."""
+    result = client.execute(f'SELECT symbol, max(event_date) FROM {DB_NAME}.market_index GROUP BY symbol', columnar=True)
+    symbols, dates = result if result else ([], [])
+    return {symbol: np.datetime64(last_date, 'D').item() for symbol, last_date in zip(symbols, dates)}
+
+def fetch_index_closes(symbol, start):
+    """Descarga los cierres diarios del índice desde start (incluido)."""
+    df = yf.download(symbol, start=start, progress=False)
+    if df.empty:
+        return df
+    close = df['Close']
+    if close.ndim > 1: # Las versiones recientes de yfinance devuelven columnas por símbolo
+        close = close[symbol]
+    return close.dropna()
+
+def main(symbols=MARKET_SYMBOLS):
+    """
+    Refresca de forma incremental los índices de referencia: para cada símbolo
+    se descargan los días posteriores al último almacenado y, además, los
+    últimos REFETCH_DAYS días guardados, por si se cargaron con la sesión aún
+    abierta. ReplacingMergeTree se queda con la última versión de cada día y
+    la caché local vuelve a pedir esas fechas.
+    """
+    client = None
+    try:
+        print(">> Conectando a la base de datos de ClickHouse...")
+        client = Client(
+            host=CLICKHOUSE_HOST,
+            port=CLICKHOUSE_PORT,
+            user=CLICKHOUSE_USER,
+            password=CLICKHOUSE_PASSWORD,
+            database=DB_NAME,
+            settings={'use_numpy': True}
+        )
+        latest_dates = get_latest_index_dates(client)
+
+        for symbol in symbols:
+            latest_date = latest_dates.get(symbol)
+            start = latest_date - timedelta(days=REFETCH_DAYS - 1) if latest_date else date.fromisoformat(HISTORY_START)
+
+            print(f">> [{symbol}] Descargando cierres desde {start}...")
+            closes = fetch_index_closes(symbol, start)
+            closes = closes[closes.index.date >= start] # yfinance puede devolver días anteriores a start
+            if closes.empty:
+                print(f"   [{symbol}] No hay días nuevos.")
+                continue
+
+            columns = [
+                np.full(len(closes), symbol, dtype=object),
+                closes.index.values.astype('datetime64[D]'),
+                closes.to_numpy(dtype=np.float64),
+            ]
+            client.execute(INSERT_SQL, columns, columnar=True)
+            print(f"   [{symbol}] ✅ {len(closes)} días insertados (hasta {closes.index.max().date()}).")
+            refetched = [d for d in closes.index.date if latest_date and d <= latest_date]
+            if refetched:
+                invalidate_cache(event_dates=refetched)
+
+    except Exception as e:
+        print(f"❌ Error refrescando los índices de mercado: {e}")
+    finally:
+        if client:
+            client.disconnect()
+            print("\n🔌 Conexión a ClickHouse cerrada.")
+
+if __name__ == "__main__":
+    main()
@@ -1,49 +1,146 @@
 import json
 import os
-from datetime import datetime
+from datetime import datetime, date, timedelta
+import ijson
+import numpy as np
 from dotenv import load_dotenv
 from clickhouse_driver import Client
+from data_api import SYMBOLS, fetch_symbols, symbol_data_path
+from src.data_cache import invalidate_cache
+from src.telemetry import stage
 
 load_dotenv('credenciales.env')
 # --- Configuración ---
-DATA_FILE_PATH = 'toyota_daily_data.json'
+COMPACT_MAX_AGE_DAYS = 140 # 'compact' cubre ~100 sesiones bursátiles (unos 140 días naturales)
 CLICKHOUSE_HOST = 'localhost'
 CLICKHOUSE_PORT = 9000
 CLICKHOUSE_USER = os.getenv('CH_USER')      
 CLICKHOUSE_PASSWORD = os.getenv('CH_PASSWORD')
 DB_NAME = 'stocks_db'
-TICKER_SYMBOL = 'TM' # Símbolo bursátil para Toyota Motor (NYSE)
+INSERT_BLOCK_SIZE = 50_000 # Filas por bloque columnar enviado a ClickHouse
+REFETCH_DAYS = 1 # Días naturales hasta el último guardado (incluido) que se vuelven a insertar: pueden ser barras intradía parciales
+INSERT_SQL = f'INSERT INTO {DB_NAME}.stock_daily (ticker, event_date, open, high, low, close, volume) VALUES'
 
-def transform_alpha_vantage_json(json_data, ticker):
+def iter_alpha_vantage_rows(file_obj, min_date=None):
     """
-    Transforma el JSON de 'TIME_SERIES_DAILY'.
+    Recorre el JSON de 'TIME_SERIES_DAILY' de forma incremental (sin cargar
+    el documento completo) y genera tuplas (fecha, open, high, low, close, volume).
+    Las fechas anteriores o iguales a min_date se descartan.
     """
-    time_series_key = "Time Series (Daily)"
-    if time_series_key not in json_data:
-        print(f"Error: La clave '{time_series_key}' no se encuentra en el JSON.")
-        return []
-
-    daily_data = json_data[time_series_key]
-    rows_to_insert = []
-
-    for date_str, values in daily_data.items():
+    for date_str, values in ijson.kvitems(file_obj, 'Time Series (Daily)'):
         try:
-            row = [
-                ticker,
-                datetime.strptime(date_str, '%Y-%m-%d').date(),
+            event_date = datetime.strptime(date_str, '%Y-%m-%d').date()
+            if min_date and event_date <= min_date:
+                continue
+            yield (
+                event_date,
                 float(values['1. open']),
                 float(values['2. high']),
                 float(values['3. low']),
                 float(values['4. close']),
-                int(values['5. volume']) 
-            ]
-            rows_to_insert.append(row)
+                int(values['5. volume'])
+            )
         except (ValueError, KeyError) as e:
             print(f"Aviso: Saltando fila para la fecha {date_str} debido a un error de formato o clave faltante: {e}")
             continue
-    return rows_to_insert
 
-def main():
+def iter_alpha_vantage_blocks(file_obj, ticker, block_size=INSERT_BLOCK_SIZE, min_date=None):
+    """
+    Agrupa las filas del JSON en bloques columnares tipados (fechas, OHLC en
+    float64 y volumen en uint64) de como mucho block_size filas. La memoria
+    usada depende del tamaño de bloque, no del tamaño del fichero.
+    """
+    def new_buffers():
+        return (np.empty(block_size, dtype='datetime64[D]'),
+                np.empty((4, block_size), dtype=np.float64),
+                np.empty(block_size, dtype=np.uint64))
+
+    def to_columns(dates, prices, volumes, n):
+        return [np.full(n, ticker, dtype=object), dates[:n],
+                prices[0, :n], prices[1, :n], prices[2, :n], prices[3, :n], volumes[:n]]
+
+    dates, prices, volumes = new_buffers()
+    n = 0
+    for event_date, open_, high, low, close, volume in iter_alpha_vantage_rows(file_obj, min_date):
+        dates[n] = event_date
+        prices[:, n] = (open_, high, low, close)
+        volumes[n] = volume
+        n += 1
+        if n == block_size:
+            yield to_columns(dates, prices, volumes, n)
+            dates, prices, volumes = new_buffers()
+            n = 0
+    if n:
+        yield to_columns(dates, prices, volumes, n)
+
+def get_latest_dates(client):
+    """Devuelve {ticker: última fecha almacenada} para los tickers ya cargados."""
+    result = client.execute(f'SELECT ticker, max(event_date) FROM {DB_NAME}.stock_daily GROUP BY ticker', columnar=True)
+    tickers, dates = result if result else ([], [])
+    return {ticker: np.datetime64(last_date, 'D').item() for ticker, last_date in zip(tickers, dates)}
+
+def resolve_data_files(symbols, latest_dates, incremental=True):
+    """
+    Devuelve {símbolo: fichero JSON a cargar}. En modo incremental, los símbolos
+    con datos recientes en la tabla piden a la API solo la ventana 'compact';
+    los que no tienen fichero local descargan el histórico completo.
+    """
+    def is_recent(symbol):
+        latest_date = latest_dates.get(symbol)
+        return latest_date is not None and (date.today() - latest_date).days < COMPACT_MAX_AGE_DAYS
+
+    compact = [s for s in symbols if incremental and is_recent(s)]
+    missing = [s for s in symbols if s not in compact and not os.path.exists(symbol_data_path(s))]
+
+    fetched = {}
+    if compact:
+        print(f">> Pidiendo la ventana reciente de {len(compact)} símbolos a la API...")
+        fetched.update(fetch_symbols(compact, outputsize='compact'))
+    if missing:
+        print(f">> Descargando el histórico completo de {len(missing)} símbolos sin fichero local...")
+        fetched.update(fetch_symbols(missing, outputsize='full'))
+
+    data_files = {}
+    for symbol in symbols:
+        path = fetched.get(symbol)
+        if path is None and os.path.exists(symbol_data_path(symbol)):
+            path = symbol_data_path(symbol) # Si falla la descarga, usamos el histórico local
+        if path is None:
+            print(f"Aviso: No hay datos disponibles para '{symbol}'. Se omite.")
+            continue
+        data_files[symbol] = path
+    return data_files
+
+def insert_symbol_file(client, symbol, data_path, latest_date=None, block_size=INSERT_BLOCK_SIZE):
+    """
+    Inserta en bloques columnares las barras del fichero posteriores a
+    latest_date y, además, los últimos REFETCH_DAYS días ya guardados, por si
+    se cargaron con la sesión aún abierta. ReplacingMergeTree se queda con la
+    última versión de cada día y la caché local vuelve a pedir esas fechas.
+    """
+    min_date = latest_date - timedelta(days=REFETCH_DAYS) if latest_date else None
+    total_rows = 0
+    refetched = set()
+    with stage('insert_symbol', symbol=symbol) as s, open(data_path, 'rb') as f:
+        for columns in iter_alpha_vantage_blocks(f, symbol, block_size, min_date=min_date):
+            client.execute(INSERT_SQL, columns, columnar=True)
+            total_rows += len(columns[0])
+            if latest_date:
+                refetched.update(d for d in columns[1].astype(object) if d <= latest_date)
+            print(f"   [{symbol}] Insertado bloque de {len(columns[0])} filas ({total_rows} en total)...")
+        s.rows_out = total_rows
+    if refetched:
+        invalidate_cache(event_dates=sorted(refetched), tickers=[symbol])
+    return total_rows
+
+def main(symbols=SYMBOLS, incremental=True, block_size=INSERT_BLOCK_SIZE):
+    """
+    Carga en stock_daily las barras posteriores a la última fecha almacenada
+    para cada ticker, más ese último día por si estaba incompleto. Repetir la
+    carga no duplica filas: ReplacingMergeTree deja una por ticker y día, y la
+    vista stock_daily_news lee con FINAL.
+    Cada fichero JSON se lee en streaming y se inserta por bloques columnares.
+    """
     client = None
     try:
         print(">> Conectando a la base de datos de ClickHouse...")
@@ -52,7 +149,8 @@ def main():
             port=CLICKHOUSE_PORT,
             user=CLICKHOUSE_USER,
             password=CLICKHOUSE_PASSWORD,
-            database=DB_NAME
+            database=DB_NAME,
+            settings={'use_numpy': True} # Inserciones columnares con arrays de NumPy
         )
         print("   Conexión establecida exitosamente.")
 
@@ -60,38 +158,22 @@ def main():
         print(f"Error fatal: No se pudo conectar a ClickHouse. Error: {e}")
         return
 
-    if not os.path.exists(DATA_FILE_PATH):
-        print(f"Error fatal: El fichero de datos '{DATA_FILE_PATH}' no fue encontrado.")
-        client.disconnect()
-        return
-    with open(DATA_FILE_PATH, 'r') as f:
-        stock_json = json.load(f)
-
-    print(">> Transformando datos del JSON...")
-    data_for_insertion = transform_alpha_vantage_json(stock_json, TICKER_SYMBOL)
-    if not data_for_insertion:
-        print("No se generaron datos para la inserción. Abortando.")
-        client.disconnect()
-        return
-    print(f"   Datos transformados. {len(data_for_insertion)} filas listas para ser insertadas.")
-
-    # --- LÓGICA DE INSERCIÓN EN LOTES ---
+    # --- LÓGICA DE INSERCIÓN EN BLOQUES COLUMNARES ---
     try:
-        print(">> Iniciando inserción de datos en ClickHouse por lotes...")
-        
-        chunk_size = 2000  # Insertaremos las filas en grupos de 2000
-        total_rows = len(data_for_insertion)
-        
-        for i in range(0, total_rows, chunk_size):
-            chunk = data_for_insertion[i:i + chunk_size]
-            print(f"   Insertando lote de {len(chunk)} filas (desde la fila {i+1})...")
-            
-            client.execute(
-                'INSERT INTO stock_daily VALUES',
-                chunk
-            )
-        
-        print("\n✅ ¡Inserción completada exitosamente!")
+        latest_dates = get_latest_dates(client)
+        data_files = resolve_data_files(symbols, latest_dates, incremental)
+
+        total_rows = 0
+        with stage('load_to_clickhouse', rows_in=len(data_files)) as s:
+            for symbol, data_path in data_files.items():
+                print(f">> Transformando e insertando '{data_path}' en bloques de hasta {block_size} filas...")
+                total_rows += insert_symbol_file(client, symbol, data_path, latest_dates.get(symbol), block_size)
+            s.rows_out = total_rows
+
+        if total_rows:
+            print(f"\n✅ ¡Inserción completada exitosamente! {total_rows} filas insertadas.")
+        else:
+            print("No hay filas nuevas que insertar: la tabla ya está al día.")
 
     except Exception as e:
         print(f"❌ Error durante la inserción de datos: {e}")
@@ -101,4 +183,10 @@ def main():
             print("\n🔌 Conexión a ClickHouse cerrada.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    import argparse
+    parser = argparse.ArgumentParser(description="Carga los datos diarios de Alpha Vantage en stock_daily.")
+    parser.add_argument('symbols', nargs='*', help="Símbolos a cargar (por defecto, todo el universo de data_api).")
+    parser.add_argument('--full', action='store_true', help="Usa los ficheros locales completos en lugar de la ventana reciente de la API.")
+    parser.add_argument('--block-size', type=int, default=INSERT_BLOCK_SIZE, help="Filas por bloque de inserción.")
+    args = parser.parse_args()
+    main(symbols=args.symbols or SYMBOLS, incremental=not args.full, block_size=args.block_size)
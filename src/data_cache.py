@@ -0,0 +1,146 @@
+import os
+import json
+import hashlib
+import pandas as pd
+from src.data_pipeline import load_data_from_clickhouse
+
+CACHE_DIR = 'data/cache'
+
+def _cache_key(tickers, columns, start_date, market_index=None):
+    """Clave estable para (conjunto de tickers, columnas, fecha de inicio, índice de mercado)."""
+    definition = {
+        'tickers': sorted(tickers) if tickers else None,
+        'columns': list(columns) if columns else None,
+        'start_date': pd.Timestamp(start_date).date().isoformat(),
+    }
+    if market_index:
+        definition['market_index'] = market_index
+    digest = hashlib.sha1(json.dumps(definition, sort_keys=True).encode()).hexdigest()[:16]
+    return digest, definition
+
+def _cache_paths(key, cache_dir):
+    return os.path.join(cache_dir, f"{key}.parquet"), os.path.join(cache_dir, f"{key}.json")
+
+def _read_meta(meta_path):
+    with open(meta_path, 'r') as f:
+        return json.load(f)
+
+def _write_entry(df, meta, data_path, meta_path):
+    """Escribe datos y metadatos de forma atómica."""
+    os.makedirs(os.path.dirname(data_path), exist_ok=True)
+    df.to_parquet(f"{data_path}.tmp")
+    os.replace(f"{data_path}.tmp", data_path)
+    with open(f"{meta_path}.tmp", 'w') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(f"{meta_path}.tmp", meta_path)
+
+def _sort_like_clickhouse(df):
+    """Mismo orden que load_data_from_clickhouse: (ticker, event_date)."""
+    by = ['ticker', 'event_date'] if 'ticker' in df.columns else ['event_date']
+    return df.sort_values(by, kind='stable')
+
+def _watermarks(cached):
+    """
+    Última fecha guardada de cada ticker ({ticker: fecha}), o {None: fecha}
+    si las filas no tienen columna ticker.
+    """
+    if 'ticker' not in cached.columns:
+        return {None: cached.index.max()}
+    return pd.Series(cached.index, index=cached['ticker'].to_numpy()).groupby(level=0).max().to_dict()
+
+def load_data_cached(start_date='2019-01-01', tickers=None, columns=None, market_index=None,
+                     cache_dir=CACHE_DIR, refresh=True):
+    """
+    Carga los datos a través de una caché Parquet local.
+    La primera llamada lee todo el histórico; las siguientes solo piden a
+    ClickHouse las filas posteriores a la última fecha de la caché y, para los
+    tickers retrasados, las que les faltan desde su propia última fecha (así un
+    ticker que ya no recibe datos no obliga a releer a todos los demás), además
+    de las fechas invalidadas con invalidate_cache. Si ClickHouse no está
+    disponible se devuelve la copia local.
+    """
+    key, definition = _cache_key(tickers, columns, start_date, market_index)
+    data_path, meta_path = _cache_paths(key, cache_dir)
+
+    cached = None
+    meta = dict(definition, stale_dates=[])
+    if os.path.exists(data_path) and os.path.exists(meta_path):
+        cached = pd.read_parquet(data_path)
+        meta = _read_meta(meta_path)
+        if not refresh:
+            print(f"Datos cargados desde la caché local ({len(cached)} filas).")
+            return cached
+
+    try:
+        if cached is None or cached.empty:
+            df = load_data_from_clickhouse(start_date, tickers=tickers, columns=columns,
+                                            market_index=market_index)
+        else:
+            watermarks = _watermarks(cached)
+            last_date = max(watermarks.values())
+            parts = [cached, load_data_from_clickhouse(last_date + pd.Timedelta(days=1), tickers=tickers,
+                                                       columns=columns, market_index=market_index)]
+            # Las fechas posteriores a last_date ya llegan con las filas nuevas
+            stale_dates = [d for d in meta['stale_dates'] if pd.Timestamp(d) <= last_date]
+            lagging = {}
+            for ticker, ticker_date in watermarks.items():
+                if ticker_date < last_date:
+                    lagging.setdefault(ticker_date, []).append(ticker)
+            for ticker_date, group in sorted(lagging.items()):
+                part = load_data_from_clickhouse(ticker_date + pd.Timedelta(days=1), last_date, tickers=group,
+                                                 columns=columns, market_index=market_index)
+                parts.append(part[~part.index.isin(pd.to_datetime(stale_dates))]) # Llegan con las invalidadas
+            if stale_dates:
+                parts.append(load_data_from_clickhouse(start_date, tickers=tickers, columns=columns,
+                                                       event_dates=stale_dates, market_index=market_index))
+            parts = [part for part in parts if not part.empty]
+            # infer_objects: una parte sin ningún News_Type llega como object y no debe cambiar el tipo del resto
+            df = _sort_like_clickhouse(pd.concat(parts)).infer_objects() if len(parts) > 1 else parts[0]
+            print(f"Caché actualizada: {len(df) - len(cached)} filas nuevas o refrescadas.")
+    except Exception as e:
+        if cached is None:
+            raise
+        print(f"Aviso: No se pudo contactar con ClickHouse ({e}). Usando la caché local.")
+        return cached
+
+    meta['stale_dates'] = []
+    _write_entry(df, meta, data_path, meta_path)
+    return df
+
+def invalidate_cache(event_dates=None, tickers=None, cache_dir=CACHE_DIR):
+    """
+    Invalida las entradas de la caché afectadas por cambios en la base de datos.
+    Sin fechas se borran las entradas completas; con fechas (p. ej. las que ha
+    modificado el enriquecimiento de noticias) se eliminan esas filas y se
+    marcan para volver a pedirlas en la siguiente carga.
+    """
+    if not os.path.isdir(cache_dir):
+        return 0
+
+    dates = sorted({pd.Timestamp(d).date().isoformat() for d in event_dates}) if event_dates is not None else None
+    invalidated = 0
+    for name in os.listdir(cache_dir):
+        if not name.endswith('.json'):
+            continue
+        meta_path = os.path.join(cache_dir, name)
+        data_path = meta_path[:-len('.json')] + '.parquet'
+        meta = _read_meta(meta_path)
+        if tickers and meta['tickers'] and not set(tickers) & set(meta['tickers']):
+            continue
+
+        if dates is None:
+            for path in (data_path, meta_path):
+                if os.path.exists(path):
+                    os.remove(path)
+        else:
+            dates_in_range = [d for d in dates if d >= meta['start_date']]
+            if not dates_in_range:
+                continue
+            df = pd.read_parquet(data_path)
+            df = df[~df.index.isin(pd.to_datetime(dates_in_range))]
+            meta['stale_dates'] = sorted(set(meta['stale_dates']) | set(dates_in_range))
+            _write_entry(df, meta, data_path, meta_path)
+        invalidated += 1
+
+    print(f"Caché invalidada: {invalidated} entradas afectadas.")
+    return invalidated
@@ -1,88 +1,328 @@
 import pandas as pd
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
 from clickhouse_driver import Client
-from sklearn.preprocessing import StandardScaler
 import os
 from dotenv import load_dotenv
+from src.telemetry import stage
 
-def load_data_from_clickhouse(start_date='2019-01-01'):
-    """Carga los datos desde 2019 en un DataFrame de pandas."""
+# Columnas que expone la vista stock_daily_news (stock_daily + noticias)
+STOCK_TABLE = 'stocks_db.stock_daily_news'
+STOCK_COLUMNS = ('ticker', 'event_date', 'open', 'high', 'low', 'close', 'volume', 'News', 'News_Type')
+MARKET_TABLE = 'stocks_db.market_index'
+# Vista stock_features: columnas de stock_daily_news más las características calculadas en ClickHouse
+FEATURES_TABLE = 'stocks_db.stock_features'
+PRICE_FEATURE_COLUMNS = (
+    ('target',)
+    + tuple(f'{name}_lag_{i}' for i in range(1, 6) for name in ('close', 'volume'))
+    + ('sma_10', 'sma_30', 'volatility_30', 'rsi')
+)
+ANALYSIS_FEATURE_COLUMNS = ('daily_return', 'abs_return', 'volatility_range', 'volume_change_ratio')
+FEATURE_COLUMNS = STOCK_COLUMNS + PRICE_FEATURE_COLUMNS + ANALYSIS_FEATURE_COLUMNS
+# Representación compacta (compact=True): texto como categoría, indicadores 0/1 en uint8 y el resto en float32
+CATEGORICAL_COLUMNS = ('ticker', 'News_Type')
+FLAG_COLUMNS = ('News', 'target')
+
+def _compact_dtype(name, dtype):
+    """Tipo compacto de una columna según su nombre y tipo actual (None si se deja igual)."""
+    if name in CATEGORICAL_COLUMNS:
+        return 'category'
+    if name in FLAG_COLUMNS:
+        return np.uint8
+    if pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype):
+        return np.float32
+    return None
+
+def _compact_values(name, values):
+    """Versión compacta de un array de columna tal como llega de ClickHouse."""
+    dtype = _compact_dtype(name, values.dtype)
+    if dtype == 'category':
+        return pd.Categorical(values)
+    return values if dtype is None else values.astype(dtype, copy=False)
+
+def compact_dtypes(df):
+    """
+    Pasa el DataFrame a la representación compacta columna a columna, de modo
+    que nunca conviven dos copias completas del panel. Modifica df y lo devuelve.
+    """
+    for name in df.columns:
+        dtype = _compact_dtype(name, df[name].dtype)
+        if dtype is not None and df[name].dtype != dtype:
+            df[name] = df[name].astype(dtype)
+    return df
+
+def get_clickhouse_client(use_numpy=True):
+    """Crea un cliente de ClickHouse; con use_numpy los resultados llegan como arrays de NumPy."""
     load_dotenv('credenciales.env')
-    client = Client(
+    return Client(
         host=os.getenv('CH_HOST', 'localhost'),
         user=os.getenv('CH_USER'),
         password=os.getenv('CH_PASSWORD'),
-        database='stocks_db'
+        database='stocks_db',
+        settings={'use_numpy': use_numpy}
     )
-    query = f"SELECT * FROM stocks_db.stock_daily WHERE event_date >= '{start_date}' ORDER BY event_date"
-    data = client.execute(query, with_column_types=True)
-    
-    df = pd.DataFrame(data[0], columns=[col[0] for col in data[1]])
-    df['event_date'] = pd.to_datetime(df['event_date'])
-    df.set_index('event_date', inplace=True)
+
+def load_features_from_clickhouse(start_date='2019-01-01', end_date=None, tickers=None, columns=None, client=None):
+    """
+    Carga las características ya calculadas por ClickHouse (vista stock_features).
+    Por defecto trae exactamente las columnas que usan los modelos.
+    """
+    columns = columns or STOCK_COLUMNS + PRICE_FEATURE_COLUMNS
+    return load_data_from_clickhouse(start_date, end_date, tickers, columns, client=client, table=FEATURES_TABLE)
+
+def load_data_from_clickhouse(start_date='2019-01-01', end_date=None, tickers=None, columns=None,
+                              event_dates=None, market_index=None, client=None, table=STOCK_TABLE, compact=False):
+    """
+    Carga los datos desde start_date en un DataFrame de pandas.
+    Solo se piden las columnas indicadas, los filtros viajan como parámetros
+    de la consulta y el resultado se lee por columnas (arrays de NumPy),
+    sin construir una tupla de Python por fila.
+    Con market_index (p. ej. '^GSPC') se añade la columna market_close con el
+    cierre del índice, unido en la misma consulta (solo días con ambos datos).
+    Con table=FEATURES_TABLE se pueden pedir también las características
+    calculadas en el servidor (FEATURE_COLUMNS).
+    Con compact=True cada columna se convierte a su tipo compacto
+    (compact_dtypes) según llega, antes de montar el DataFrame.
+    """
+    available = FEATURE_COLUMNS if table == FEATURES_TABLE else STOCK_COLUMNS
+    columns = list(columns or STOCK_COLUMNS)
+    unknown = [col for col in columns if col not in available]
+    if unknown:
+        raise ValueError(f"Columnas desconocidas: {unknown}. Disponibles: {available}")
+    if 'event_date' not in columns:
+        columns.insert(0, 'event_date') # Se necesita para el índice temporal
+
+    conditions = ['event_date >= %(start_date)s']
+    params = {'start_date': pd.Timestamp(start_date).date()}
+    if end_date is not None:
+        conditions.append('event_date <= %(end_date)s')
+        params['end_date'] = pd.Timestamp(end_date).date()
+    if tickers:
+        conditions.append('ticker IN %(tickers)s')
+        params['tickers'] = tuple(tickers)
+    if event_dates is not None:
+        conditions.append('event_date IN %(event_dates)s')
+        params['event_dates'] = tuple(pd.Timestamp(d).date() for d in event_dates)
+
+    query = f"SELECT {', '.join(columns)} FROM {table} WHERE {' AND '.join(conditions)}"
+    if market_index:
+        inner_columns = columns if 'ticker' in columns else columns + ['ticker'] # Para ordenar
+        query = (
+            f"SELECT {', '.join(columns)}, market_close "
+            f"FROM (SELECT {', '.join(inner_columns)} FROM {table} WHERE {' AND '.join(conditions)}) AS s "
+            f"INNER JOIN (SELECT event_date, close AS market_close FROM {MARKET_TABLE} FINAL "
+            f"WHERE symbol = %(market_index)s) AS m USING (event_date)"
+        )
+        params['market_index'] = market_index
+    query += " ORDER BY ticker, event_date"
+
+    own_client = client is None
+    if own_client:
+        client = get_clickhouse_client()
+    with stage('load_data_from_clickhouse', table=table) as s:
+        try:
+            data, column_types = client.execute(query, params, with_column_types=True, columnar=True)
+        finally:
+            if own_client:
+                client.disconnect()
+
+        if data and compact:
+            # copy=False: cada columna queda en su propio bloque, sin consolidar en una matriz nueva
+            df = pd.DataFrame({name: values if name == 'event_date' else _compact_values(name, values)
+                               for (name, _), values in zip(column_types, data)}, copy=False)
+        elif data:
+            df = pd.DataFrame({name: values for (name, _), values in zip(column_types, data)})
+        else:
+            df = pd.DataFrame(columns=[name for name, _ in column_types])
+        df['event_date'] = pd.to_datetime(df['event_date'])
+        df.set_index('event_date', inplace=True)
+        s.rows_out = len(df)
     
     print(f"Datos cargados exitosamente. {len(df)} filas desde {start_date}.")
     return df
 
-def feature_engineering(df):
-    """Crea características y el target para el modelo."""
+def _add_price_features(df):
+    """Target, lags, medias móviles, volatilidad y RSI calculados por ticker."""
+    by_ticker = df.groupby('ticker', sort=False)
+    position = by_ticker.cumcount() # Posición de cada fila dentro de su ticker
+
     # 1. Crear el Target (nuestro objetivo a predecir)
     # ¿Subirá el precio mañana? (1 si sí, 0 si no)
-    df['target'] = (df['close'].shift(-1) > df['close']).astype(int)
+    df['target'] = (by_ticker['close'].shift(-1) > df['close']).astype(int)
     
     # 2. Crear Características (Features)
     # Lags de precios
     for i in range(1, 6):
-        df[f'close_lag_{i}'] = df['close'].shift(i)
-        df[f'volume_lag_{i}'] = df['volume'].shift(i)
+        df[f'close_lag_{i}'] = by_ticker['close'].shift(i)
+        df[f'volume_lag_{i}'] = by_ticker['volume'].shift(i)
         
-    # Medias móviles
-    df['sma_10'] = df['close'].rolling(window=10).mean()
-    df['sma_30'] = df['close'].rolling(window=30).mean()
+    # Medias móviles (las ventanas que cruzan de un ticker a otro quedan a NaN)
+    df['sma_10'] = df['close'].rolling(window=10).mean().where(position >= 9)
+    df['sma_30'] = df['close'].rolling(window=30).mean().where(position >= 29)
     
     # Volatilidad
-    df['volatility_30'] = df['close'].rolling(window=30).std()
+    df['volatility_30'] = df['close'].rolling(window=30).std().where(position >= 29)
     
     # RSI (Relative Strength Index)
-    delta = df['close'].diff()
-    gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
+    delta = df['close'].diff().where(position >= 1)
+    gain = (delta.where(delta > 0, 0)).rolling(window=14).mean().where(position >= 13)
+    loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean().where(position >= 13)
     rs = gain / loss
     df['rsi'] = 100 - (100 / (1 + rs))
+    return df
+
+def _engineer_partition(df, news_categories, keep_ticker=False, precomputed=False, compact=False):
+    """
+    Calcula target y características de un panel con uno o varios tickers contiguos.
+    Con precomputed=True (características de la vista stock_features) solo se
+    codifican las noticias y se limpian los NaN.
+    Con compact=True las columnas nuevas se guardan en float32/uint8 y las
+    variables dummy se añaden como columnas uint8 sin concatenar el panel.
+    """
+    if not precomputed:
+        df = _add_price_features(df)
 
     # Features de Noticias
-    # El tipo de noticia es una variable categórica, la convertimos con One-Hot Encoding
-    df['News_Type'].fillna('NoNews', inplace=True) # Rellenar nulos
-    news_dummies = pd.get_dummies(df['News_Type'], prefix='news_type')
-    df = pd.concat([df, news_dummies], axis=1)
+    # El tipo de noticia es una variable categórica, la convertimos con One-Hot Encoding.
+    # Las categorías se fijan de antemano para que todas las particiones tengan las mismas columnas.
+    # Los nulos son 'NoNews'; un tipo fuera de news_categories queda sin ninguna dummy.
+    news_type = df['News_Type']
+    if isinstance(news_type.dtype, pd.CategoricalDtype): # compact_dtypes: sin la categoría 'NoNews'
+        news_type = news_type.astype(object)
+    news_type = news_type.fillna('NoNews')
+    news_type = pd.Categorical(news_type.where(news_type.isin(news_categories)), categories=news_categories)
+    if compact:
+        df = compact_dtypes(df)
+        for code, category in enumerate(news_categories):
+            df[f'news_type_{category}'] = (news_type.codes == code).view(np.uint8)
+    else:
+        news_dummies = pd.get_dummies(news_type, prefix='news_type').set_axis(df.index)
+        df = pd.concat([df, news_dummies], axis=1)
     
     # Limpieza final
-    df.drop(['ticker', 'News_Type'], axis=1, inplace=True)
+    df.drop(['News_Type'] if keep_ticker else ['ticker', 'News_Type'], axis=1, inplace=True)
     df.dropna(inplace=True) # Eliminar filas con NaNs (generados por los lags y rolling)
-    
+    return df
+
+def feature_engineering(df, n_jobs=1, news_types=None, keep_ticker=False, precomputed=False, compact=False):
+    """
+    Crea características y el target para el modelo.
+    Funciona con uno o varios tickers: cada indicador se calcula dentro de su
+    ticker. Con n_jobs > 1 los tickers se reparten entre procesos.
+    Con compact=True el resultado usa float32, categorías y uint8 (compact_dtypes).
+    """
+    with stage('feature_engineering', rows_in=len(df), n_jobs=n_jobs) as s:
+        # Los tickers deben ser contiguos para las ventanas vectorizadas
+        df = df.sort_values('ticker', kind='stable')
+        if news_types is None:
+            news_types = df['News_Type'].dropna().unique()
+        news_categories = sorted(set(news_types) | {'NoNews'})
+
+        tickers = np.asarray(df['ticker'].unique())
+        n_jobs = min(n_jobs, len(tickers))
+        if n_jobs <= 1:
+            df = _engineer_partition(df, news_categories, keep_ticker, precomputed, compact)
+        else:
+            partitions = [df[df['ticker'].isin(chunk)] for chunk in np.array_split(tickers, n_jobs)]
+            with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+                results = executor.map(_engineer_partition, partitions, [news_categories] * n_jobs,
+                                       [keep_ticker] * n_jobs, [precomputed] * n_jobs, [compact] * n_jobs)
+                df = pd.concat(list(results))
+        s.rows_out = len(df)
+
     print("Ingeniería de características completada.")
     return df
 
-def get_prepared_data(start_date='2019-01-01', split_date='2024-01-01'):
-    """Pipeline completo que carga, procesa y divide los datos."""
-    df = load_data_from_clickhouse(start_date)
-    df_featured = feature_engineering(df)
-    
-    # Separar features (X) y target (y)
-    X = df_featured.drop('target', axis=1)
-    y = df_featured['target']
-    
-    # Dividir en Train y Test cronológicamente
-    X_train, X_test = X.loc[X.index < split_date], X.loc[X.index >= split_date]
-    y_train, y_test = y.loc[y.index < split_date], y.loc[y.index >= split_date]
-    
-    # Escalar los datos
-    scaler = StandardScaler()
-    X_train_scaled = scaler.fit_transform(X_train)
-    X_test_scaled = scaler.transform(X_test)
-    
-    # Convertir de vuelta a DataFrame para mantener la legibilidad
-    X_train_scaled = pd.DataFrame(X_train_scaled, index=X_train.index, columns=X_train.columns)
-    X_test_scaled = pd.DataFrame(X_test_scaled, index=X_test.index, columns=X_test.columns)
-    
+def _split_compact(df_featured, split_date):
+    """
+    Separa train y test copiando cada columna una sola vez en una matriz
+    float32 contigua (C) por partición, con las filas en el mismo orden.
+    """
+    columns = df_featured.columns.drop('target')
+    is_train = df_featured.index < split_date
+    target = df_featured['target'].to_numpy()
+    parts = []
+    for mask in (is_train, ~is_train):
+        X = np.empty((int(mask.sum()), len(columns)), dtype=np.float32)
+        for j, name in enumerate(columns):
+            X[:, j] = df_featured[name].to_numpy()[mask]
+        parts.append((X, target[mask], df_featured.index[mask]))
+    return columns, parts
+
+def split_and_scale(df_featured, split_date='2024-01-01', compact=False):
+    """
+    Divide cronológicamente en train/test y escala con un StandardScaler
+    ajustado en train. Devuelve X_train, X_test, y_train, y_test y el scaler.
+    Con compact=True las matrices son float32 contiguas, se escalan en el
+    sitio y los DataFrames devueltos las envuelven sin copiarlas.
+    """
+    from sklearn.preprocessing import StandardScaler # Import local: cargar datos no necesita scikit-learn
+    with stage('split_and_scale', rows_in=len(df_featured), compact=compact) as s:
+        if compact:
+            columns, parts = _split_compact(df_featured, split_date)
+            (X_train, y_train, index_train), (X_test, y_test, index_test) = parts
+            scaler = StandardScaler().fit(pd.DataFrame(X_train, columns=columns, copy=False))
+            for X in (X_train, X_test):
+                X -= scaler.mean_.astype(np.float32)
+                X /= scaler.scale_.astype(np.float32)
+            X_train_scaled = pd.DataFrame(X_train, index=index_train, columns=columns, copy=False)
+            X_test_scaled = pd.DataFrame(X_test, index=index_test, columns=columns, copy=False)
+            y_train = pd.Series(y_train, index=index_train, name='target', copy=False)
+            y_test = pd.Series(y_test, index=index_test, name='target', copy=False)
+        else:
+            # Separar features (X) y target (y)
+            X = df_featured.drop('target', axis=1)
+            y = df_featured['target']
+
+            # Dividir en Train y Test cronológicamente
+            X_train, X_test = X.loc[X.index < split_date], X.loc[X.index >= split_date]
+            y_train, y_test = y.loc[y.index < split_date], y.loc[y.index >= split_date]
+
+            # Escalar los datos
+            scaler = StandardScaler()
+            X_train_scaled = scaler.fit_transform(X_train)
+            X_test_scaled = scaler.transform(X_test)
+
+            # Convertir de vuelta a DataFrame para mantener la legibilidad
+            X_train_scaled = pd.DataFrame(X_train_scaled, index=X_train.index, columns=X_train.columns)
+            X_test_scaled = pd.DataFrame(X_test_scaled, index=X_test.index, columns=X_test.columns)
+        s.rows_out = len(X_train_scaled) + len(X_test_scaled)
+    return X_train_scaled, X_test_scaled, y_train, y_test, scaler
+
+def get_prepared_data(start_date='2019-01-01', split_date='2024-01-01', feature_source='client', return_scaler=False,
+                      compact=False, return_groups=False):
+    """
+    Pipeline completo que carga, procesa y divide los datos.
+    Con feature_source='server' las características se calculan en ClickHouse
+    (vista stock_features) y solo viaja la matriz final.
+    Con return_scaler=True se devuelve también el StandardScaler ajustado.
+    Con compact=True todo el pipeline usa tipos compactos y X_train/X_test
+    envuelven matrices float32 contiguas (X.to_numpy() no copia).
+    Con return_groups=True se devuelven al final el código de ticker (int32)
+    de cada fila de train y de test, para no crear ventanas que crucen tickers.
+    """
+    if feature_source == 'server':
+        df = load_features_from_clickhouse(start_date)
+        df_featured = feature_engineering(compact_dtypes(df) if compact else df, keep_ticker=return_groups,
+                                          precomputed=True, compact=compact)
+    else:
+        from src.data_cache import load_data_cached # Import local: data_cache depende de este módulo
+        df = load_data_cached(start_date)
+        df_featured = feature_engineering(compact_dtypes(df) if compact else df, keep_ticker=return_groups,
+                                          compact=compact)
+    del df
+
+    if return_groups:
+        # Mismo orden de filas que las dos particiones de split_and_scale
+        codes = pd.factorize(df_featured.pop('ticker'))[0].astype(np.int32)
+        is_train = df_featured.index < split_date
+        groups = (codes[is_train], codes[~is_train])
+
+    X_train_scaled, X_test_scaled, y_train, y_test, scaler = split_and_scale(df_featured, split_date, compact)
     print("Datos divididos y escalados. Listos para el entrenamiento.")
-    return X_train_scaled, X_test_scaled, y_train, y_test
\ No newline at end of file
+    result = (X_train_scaled, X_test_scaled, y_train, y_test)
+    if return_scaler:
+        result += (scaler,)
+    if return_groups:
+        result += groups
+    return result
@@ -0,0 +1,224 @@
+import os
+import json
+import shutil
+import hashlib
+import inspect
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+from src import data_pipeline
+from src.telemetry import stage
+from src.data_pipeline import get_clickhouse_client, get_prepared_data
+
+FEATURE_STORE_DIR = 'data/features'
+FEATURE_STORE_VERSION = 3   # Subirlo si cambia el formato de los ficheros (v3: código de ticker de cada fila)
+ARRAY_NAMES = ('X_train', 'X_test', 'y_train', 'y_test', 'index_train', 'index_test', 'groups_train', 'groups_test')
+SOURCE_DATABASE = 'stocks_db'
+SOURCE_TABLES = ('stock_daily', 'news_events') # Tablas base de stock_daily_news y stock_features (la primera da max_date)
+
+def definition_hash(start_date='2019-01-01', split_date='2024-01-01', feature_source='client'):
+    """
+    Huella de la definición de las características: el código que las calcula
+    (o la vista de ClickHouse, si se calculan en el servidor) y los parámetros
+    del split. Cualquier cambio en ellos genera una versión nueva.
+    """
+    sources = [inspect.getsource(func) for func in (
+        data_pipeline._add_price_features, data_pipeline._engineer_partition,
+        data_pipeline.feature_engineering, data_pipeline.get_prepared_data,
+        data_pipeline._compact_dtype, data_pipeline.compact_dtypes,
+        data_pipeline._split_compact, data_pipeline.split_and_scale,
+    )]
+    if feature_source == 'server':
+        from src.data_bbdd_pipeline.initialize_database import CREATE_FEATURES_VIEW_SQL
+        sources.append(CREATE_FEATURES_VIEW_SQL)
+    definition = {
+        'version': FEATURE_STORE_VERSION,
+        'start_date': pd.Timestamp(start_date).date().isoformat(),
+        'split_date': pd.Timestamp(split_date).date().isoformat(),
+        'feature_source': feature_source,
+        'sources': hashlib.sha1('\n'.join(sources).encode()).hexdigest(),
+    }
+    return hashlib.sha1(json.dumps(definition, sort_keys=True).encode()).hexdigest()[:12]
+
+def data_watermark(start_date='2019-01-01', feature_source='client', client=None):
+    """
+    Marca de agua de los datos de origen sin leerlos: sale de system.parts de
+    las tablas base (SOURCE_TABLES), de las que se derivan tanto
+    stock_daily_news como la vista stock_features. Por cada partición se toma
+    su último bloque insertado y su última mutación, que cambian al cargar
+    precios nuevos, al enriquecer noticias y al corregir filas (ALTER
+    UPDATE/DELETE), pero no cuando ClickHouse fusiona partes. Cualquier cambio
+    en las tablas invalida la versión, sea cual sea start_date.
+    """
+    own_client = client is None
+    if own_client:
+        client = get_clickhouse_client(use_numpy=False)
+    try:
+        rows = client.execute(
+            f"SELECT table, max(max_date), toString(sipHash64(arraySort(groupArray((partition_id, max_block, mutation))))) "
+            f"FROM (SELECT table, partition_id, max(max_date) AS max_date, max(max_block_number) AS max_block, "
+            f"max(if(data_version = min_block_number, 0, data_version)) AS mutation "
+            f"FROM system.parts WHERE database = '{SOURCE_DATABASE}' AND active "
+            f"AND table IN ({', '.join(repr(t) for t in SOURCE_TABLES)}) GROUP BY table, partition_id) "
+            f"GROUP BY table"
+        )
+    finally:
+        if own_client:
+            client.disconnect()
+    parts = {table: (max_date, digest) for table, max_date, digest in rows}
+    if SOURCE_TABLES[0] not in parts:
+        raise ValueError(f"La tabla {SOURCE_DATABASE}.{SOURCE_TABLES[0]} no tiene datos.")
+    watermark = {'max_date': pd.Timestamp(parts[SOURCE_TABLES[0]][0]).date().isoformat()}
+    watermark.update({table: parts[table][1] if table in parts else None for table in SOURCE_TABLES})
+    return watermark
+
+def _feature_set_key(definition, watermark):
+    digest = hashlib.sha1(json.dumps(watermark, sort_keys=True).encode()).hexdigest()[:12]
+    return f"{definition}-{digest}"
+
+def _latest_feature_set(definition, store_dir):
+    """Versión más reciente guardada para una definición (modo sin conexión)."""
+    if not os.path.isdir(store_dir):
+        return None
+    candidates = [name for name in os.listdir(store_dir)
+                  if name.startswith(f"{definition}-") and os.path.exists(os.path.join(store_dir, name, 'meta.json'))]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda name: _read_meta(os.path.join(store_dir, name))['created_at'])
+
+def _read_meta(path):
+    with open(os.path.join(path, 'meta.json'), 'r') as f:
+        return json.load(f)
+
+def materialize_features(start_date='2019-01-01', split_date='2024-01-01', feature_source='client',
+                         store_dir=FEATURE_STORE_DIR, watermark=None):
+    """
+    Ejecuta el pipeline completo una vez (en modo compacto) y guarda las
+    matrices escaladas en float32 como ficheros .npy, junto con columnas,
+    parámetros del scaler y marca de agua.
+    La escritura es atómica: se prepara en un directorio temporal y se renombra.
+    """
+    definition = definition_hash(start_date, split_date, feature_source)
+    watermark = watermark or data_watermark(start_date, feature_source)
+    key = _feature_set_key(definition, watermark)
+    path = os.path.join(store_dir, key)
+
+    X_train, X_test, y_train, y_test, scaler, groups_train, groups_test = get_prepared_data(
+        start_date, split_date, feature_source, return_scaler=True, compact=True, return_groups=True)
+    arrays = {
+        'X_train': X_train.to_numpy(), 'X_test': X_test.to_numpy(),
+        'y_train': y_train.to_numpy(), 'y_test': y_test.to_numpy(),
+        'index_train': X_train.index.to_numpy(dtype='datetime64[ns]'),
+        'index_test': X_test.index.to_numpy(dtype='datetime64[ns]'),
+        'groups_train': groups_train, 'groups_test': groups_test,
+    }
+    meta = {
+        'key': key,
+        'definition': definition,
+        'watermark': watermark,
+        'start_date': pd.Timestamp(start_date).date().isoformat(),
+        'split_date': pd.Timestamp(split_date).date().isoformat(),
+        'feature_source': feature_source,
+        'columns': list(X_train.columns),
+        'scaler': {'mean': scaler.mean_.tolist(), 'scale': scaler.scale_.tolist(), 'var': scaler.var_.tolist()},
+        'created_at': datetime.now(timezone.utc).isoformat(),
+    }
+
+    tmp_path = f"{path}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    with stage('feature_store_write', rows_in=len(X_train) + len(X_test)) as s:
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp_path, f"{name}.npy"), np.ascontiguousarray(array))
+        s.rows_out = s.rows_in
+    with open(os.path.join(tmp_path, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=2)
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+    print(f"✅ Conjunto de características '{key}' guardado en {path}")
+    return path
+
+def get_feature_set_path(start_date='2019-01-01', split_date='2024-01-01', feature_source='client',
+                         store_dir=FEATURE_STORE_DIR, refresh=True):
+    """
+    Devuelve el directorio de la versión vigente y la materializa si no existe.
+    Con refresh=False, o si ClickHouse no responde, se usa la última versión
+    guardada para la misma definición.
+    """
+    definition = definition_hash(start_date, split_date, feature_source)
+    watermark = None
+    if refresh:
+        try:
+            watermark = data_watermark(start_date, feature_source)
+        except Exception as e:
+            print(f"Aviso: No se pudo contactar con ClickHouse ({e}). Usando la última versión guardada.")
+
+    if watermark is None:
+        latest = _latest_feature_set(definition, store_dir)
+        if latest:
+            return os.path.join(store_dir, latest)
+        if not refresh:
+            return materialize_features(start_date, split_date, feature_source, store_dir)
+        raise FileNotFoundError(f"No hay ninguna versión guardada para la definición {definition}.")
+
+    path = os.path.join(store_dir, _feature_set_key(definition, watermark))
+    if os.path.exists(os.path.join(path, 'meta.json')):
+        return path
+    return materialize_features(start_date, split_date, feature_source, store_dir, watermark)
+
+def open_feature_set(path, mmap_mode='r'):
+    """
+    Abre los arrays de una versión como memmaps de solo lectura (sin copiarlos
+    a memoria). Los que no existan (groups_* en versiones anteriores a la 3) se omiten.
+    """
+    files = {name: os.path.join(path, f"{name}.npy") for name in ARRAY_NAMES}
+    arrays = {name: np.load(file, mmap_mode=mmap_mode) for name, file in files.items() if os.path.exists(file)}
+    return arrays, _read_meta(path)
+
+def scaler_from_meta(meta):
+    """Reconstruye el StandardScaler ajustado a partir de los parámetros guardados."""
+    scaler = StandardScaler()
+    scaler.mean_ = np.asarray(meta['scaler']['mean'])
+    scaler.scale_ = np.asarray(meta['scaler']['scale'])
+    scaler.var_ = np.asarray(meta['scaler']['var'])
+    scaler.n_features_in_ = len(meta['columns'])
+    scaler.feature_names_in_ = np.asarray(meta['columns'], dtype=object)
+    return scaler
+
+def load_prepared_data(start_date='2019-01-01', split_date='2024-01-01', feature_source='client',
+                       store_dir=FEATURE_STORE_DIR, refresh=True, path=None, return_groups=False):
+    """
+    Igual que get_prepared_data, pero leyendo del almacén de características.
+    Los DataFrames envuelven los memmaps sin copiarlos. Con path se abre
+    directamente esa versión. Con return_groups=True se devuelven también los
+    códigos de ticker de train y test (None si la versión no los guarda).
+    """
+    path = path or get_feature_set_path(start_date, split_date, feature_source, store_dir, refresh)
+    arrays, meta = open_feature_set(path)
+    print(f"Características cargadas desde el almacén: {meta['key']} (datos hasta {meta['watermark']['max_date']}).")
+
+    index_train = pd.DatetimeIndex(arrays['index_train'], name='event_date')
+    index_test = pd.DatetimeIndex(arrays['index_test'], name='event_date')
+    X_train = pd.DataFrame(arrays['X_train'], index=index_train, columns=meta['columns'], copy=False)
+    X_test = pd.DataFrame(arrays['X_test'], index=index_test, columns=meta['columns'], copy=False)
+    y_train = pd.Series(arrays['y_train'], index=index_train, name='target', copy=False)
+    y_test = pd.Series(arrays['y_test'], index=index_test, name='target', copy=False)
+    if return_groups:
+        return X_train, X_test, y_train, y_test, arrays.get('groups_train'), arrays.get('groups_test')
+    return X_train, X_test, y_train, y_test
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Materializa el conjunto de características versionado.")
+    parser.add_argument('--start-date', default='2019-01-01')
+    parser.add_argument('--split-date', default='2024-01-01')
+    parser.add_argument('--feature-source', choices=['client', 'server'], default='client')
+    parser.add_argument('--force', action='store_true', help="Vuelve a calcular aunque la versión ya exista.")
+    args = parser.parse_args()
+
+    if args.force:
+        materialize_features(args.start_date, args.split_date, args.feature_source)
+    else:
+        print(get_feature_set_path(args.start_date, args.split_date, args.feature_source))
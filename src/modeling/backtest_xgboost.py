@@ -0,0 +1,167 @@
+import os
+import csv
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, roc_auc_score, log_loss
+from src.feature_store import get_feature_set_path, open_feature_set
+from src.telemetry import stage
+from src.modeling.train_xgboost import XGB_PARAMS # Mismos hiperparámetros que el entrenamiento
+
+N_FOLDS = 5
+MIN_TRAIN_FRACTION = 0.5    # Parte del histórico (en días) que solo se usa para entrenar
+WARM_START_ROUNDS = 50      # Árboles que añade cada fold al continuar el modelo anterior
+PURGE_DAYS = 1              # Días previos al test fuera del entrenamiento: su target usa el cierre del test
+METRICS_PATH = 'output/backtest_metrics.csv'
+PREDICTIONS_PATH = 'output/backtest_predictions.csv'
+METRIC_FIELDS = ['fold', 'train_end', 'test_start', 'test_end', 'n_train', 'n_test',
+                 'accuracy', 'precision', 'recall', 'f1', 'roc_auc', 'logloss', 'fit_seconds']
+
+def make_folds(dates, n_folds=N_FOLDS, min_train_fraction=MIN_TRAIN_FRACTION, purge_days=PURGE_DAYS):
+    """
+    Folds de ventana creciente (walk-forward): los días posteriores a la parte
+    inicial se reparten en n_folds bloques consecutivos; cada fold entrena con
+    todo lo anterior a su bloque y evalúa sobre él. Se purgan los purge_days
+    días de mercado previos al bloque: el target del último día de
+    entrenamiento es la dirección hasta el cierre del primer día de test.
+    """
+    days = np.unique(np.asarray(dates, dtype='datetime64[D]'))
+    first_test = max(int(len(days) * min_train_fraction), purge_days + 1)
+    folds, start = [], first_test
+    for block in np.array_split(days[first_test:], n_folds):
+        if len(block):
+            folds.append({'fold': len(folds), 'train_end': str(days[start - purge_days - 1]),
+                          'test_start': str(block[0]), 'test_end': str(block[-1])})
+        start += len(block)
+    return folds
+
+def _fold_rows(arrays, start=None, end=None):
+    """
+    Filas con start <= fecha <= end de las dos particiones del almacén.
+    Solo se copian las filas seleccionadas; el resto se queda en el memmap.
+    """
+    X_parts, y_parts, date_parts = [], [], []
+    for part in ('train', 'test'):
+        dates = arrays[f'index_{part}'].astype('datetime64[D]')
+        mask = np.ones(len(dates), dtype=bool)
+        if start is not None:
+            mask &= dates >= np.datetime64(start)
+        if end is not None:
+            mask &= dates <= np.datetime64(end)
+        X_parts.append(arrays[f'X_{part}'][mask])
+        y_parts.append(arrays[f'y_{part}'][mask])
+        date_parts.append(dates[mask])
+    return np.concatenate(X_parts), np.concatenate(y_parts), np.concatenate(date_parts)
+
+def _fold_metrics(y_true, y_prob):
+    y_pred = (y_prob > 0.5).astype(int)
+    two_classes = len(np.unique(y_true)) == 2
+    return {
+        'accuracy': accuracy_score(y_true, y_pred),
+        'precision': precision_score(y_true, y_pred, zero_division=0),
+        'recall': recall_score(y_true, y_pred, zero_division=0),
+        'f1': f1_score(y_true, y_pred, zero_division=0),
+        'roc_auc': roc_auc_score(y_true, y_prob) if two_classes else np.nan,
+        'logloss': log_loss(y_true, y_prob, labels=[0, 1]),
+    }
+
+def run_fold(feature_set_path, fold, params=XGB_PARAMS, n_threads=1, xgb_model=None, n_estimators=None):
+    """
+    Entrena y evalúa un fold. Cada proceso abre los arrays del almacén como
+    memmap, así que la matriz de características no se copia entre procesos.
+    Devuelve (métricas, predicciones, modelo).
+    """
+    arrays, _ = open_feature_set(feature_set_path)
+    X_train, y_train, _ = _fold_rows(arrays, end=fold['train_end'])
+    X_test, y_test, test_dates = _fold_rows(arrays, start=fold['test_start'], end=fold['test_end'])
+
+    model = xgb.XGBClassifier(**dict(params, n_estimators=n_estimators or params['n_estimators'], n_jobs=n_threads))
+    with stage('backtest_fold', rows_in=len(y_train), fold=fold['fold']) as s:
+        started = time.perf_counter()
+        model.fit(X_train, y_train, xgb_model=xgb_model)
+        fit_seconds = time.perf_counter() - started
+        y_prob = model.predict_proba(X_test)[:, 1]
+        s.rows_out = len(y_prob)
+
+    metrics = dict(fold, n_train=len(y_train), n_test=len(y_test),
+                   fit_seconds=round(fit_seconds, 3), **_fold_metrics(y_test, y_prob))
+    predictions = pd.DataFrame({'fold': fold['fold'], 'event_date': test_dates, 'y_true': y_test, 'y_prob': y_prob})
+    return metrics, predictions, model
+
+def _run_fold_worker(feature_set_path, fold, params, n_threads):
+    """Versión para el pool: el modelo no se devuelve para no serializarlo."""
+    metrics, predictions, _ = run_fold(feature_set_path, fold, params, n_threads)
+    return metrics, predictions
+
+def walk_forward_backtest(feature_set_path=None, n_folds=N_FOLDS, n_jobs=1, warm_start=False, params=XGB_PARAMS,
+                          min_train_fraction=MIN_TRAIN_FRACTION, warm_start_rounds=WARM_START_ROUNDS,
+                          metrics_path=METRICS_PATH, predictions_path=PREDICTIONS_PATH):
+    """
+    Backtest walk-forward del modelo XGBoost.
+    Los folds se reparten entre n_jobs procesos y cada uno usa
+    cpu_count // n_jobs hilos, para no sobresuscribir la máquina. Métricas y
+    predicciones se escriben en CSV según termina cada fold.
+    Con warm_start=True cada fold continúa el modelo del anterior añadiendo
+    warm_start_rounds árboles; en ese caso los folds son secuenciales.
+    """
+    feature_set_path = feature_set_path or get_feature_set_path()
+    arrays, meta = open_feature_set(feature_set_path)
+    folds = make_folds(np.concatenate([arrays['index_train'], arrays['index_test']]), n_folds, min_train_fraction)
+    n_jobs = 1 if warm_start else max(1, min(n_jobs, len(folds)))
+    n_threads = max(1, (os.cpu_count() or 1) // n_jobs)
+    print(f"Backtest walk-forward sobre '{meta['key']}': {len(folds)} folds, {n_jobs} procesos x {n_threads} hilos.")
+
+    for path in (metrics_path, predictions_path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    results = []
+    with open(metrics_path, 'w', newline='') as metrics_file, open(predictions_path, 'w', newline='') as predictions_file:
+        writer = csv.DictWriter(metrics_file, fieldnames=METRIC_FIELDS)
+        writer.writeheader()
+        write_header = True
+
+        def record(metrics, predictions):
+            nonlocal write_header
+            writer.writerow(metrics)
+            metrics_file.flush()
+            predictions.to_csv(predictions_file, header=write_header, index=False)
+            predictions_file.flush()
+            write_header = False
+            results.append(metrics)
+            print(f"  Fold {metrics['fold']} ({metrics['test_start']} → {metrics['test_end']}): "
+                  f"accuracy={metrics['accuracy']:.4f} auc={metrics['roc_auc']:.4f}")
+
+        if n_jobs == 1:
+            previous = None
+            for fold in folds:
+                n_estimators = warm_start_rounds if warm_start and previous is not None else None
+                metrics, predictions, model = run_fold(feature_set_path, fold, params, n_threads,
+                                                       xgb_model=previous, n_estimators=n_estimators)
+                previous = model.get_booster() if warm_start else None
+                record(metrics, predictions)
+        else:
+            with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+                futures = [executor.submit(_run_fold_worker, feature_set_path, fold, params, n_threads) for fold in folds]
+                for future in as_completed(futures):
+                    record(*future.result())
+
+    summary = pd.DataFrame(results).sort_values('fold').reset_index(drop=True)
+    print("\n--- Resumen del backtest (media ± desviación entre folds) ---")
+    for metric in ('accuracy', 'precision', 'recall', 'f1', 'roc_auc', 'logloss'):
+        print(f"{metric:>10}: {summary[metric].mean():.4f} ± {summary[metric].std():.4f}")
+    print(f"\nMétricas guardadas en {metrics_path} y predicciones en {predictions_path}.")
+    return summary
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Backtest walk-forward del modelo XGBoost.")
+    parser.add_argument('--folds', type=int, default=N_FOLDS)
+    parser.add_argument('--jobs', type=int, default=1, help="Folds en paralelo (procesos).")
+    parser.add_argument('--warm-start', action='store_true', help="Cada fold continúa el modelo del anterior.")
+    parser.add_argument('--feature-source', choices=['client', 'server'], default='client')
+    args = parser.parse_args()
+
+    walk_forward_backtest(get_feature_set_path(feature_source=args.feature_source), n_folds=args.folds,
+                          n_jobs=args.jobs, warm_start=args.warm_start)
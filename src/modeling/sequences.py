@@ -0,0 +1,102 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+def window_starts(n_rows, time_steps=30, groups=None):
+    """
+    Posición inicial de cada ventana válida: las filas [i, i + time_steps).
+    Su etiqueta es el target de la última fila, i + time_steps - 1 (la
+    dirección del día siguiente al último de la ventana, lo mismo que predice
+    el servicio). Con groups (código de ticker de cada fila, con los tickers
+    contiguos) se descartan las ventanas que cruzan de un ticker a otro.
+    """
+    starts = np.arange(max(n_rows - time_steps + 1, 0))
+    if groups is not None:
+        groups = np.asarray(groups)
+        starts = starts[groups[starts] == groups[starts + time_steps - 1]]
+    return starts
+
+def validation_split(n_rows, time_steps=30, groups=None, fraction=0.1):
+    """
+    Reparte las ventanas válidas en (entrenamiento, validación). La validación
+    es la última fracción de las ventanas de CADA ticker: las filas están
+    ordenadas por ticker y fecha, así que cortar el final de todas las
+    ventanas dejaría fuera los últimos tickers en vez de las últimas fechas.
+    Sin groups se toma la última fracción de la serie.
+    """
+    starts = window_starts(n_rows, time_steps, groups)
+    if groups is None:
+        n_val = int(len(starts) * fraction)
+        return starts[:len(starts) - n_val], starts[len(starts) - n_val:]
+    codes = np.asarray(groups)[starts]
+    run_starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    run_lengths = np.diff(np.r_[run_starts, len(starts)])
+    run = np.repeat(np.arange(len(run_starts)), run_lengths)
+    position = np.arange(len(starts)) - run_starts[run]
+    is_val = position >= run_lengths[run] - (run_lengths * fraction).astype(int)[run]
+    return starts[~is_val], starts[is_val]
+
+def window_labels(y, starts, time_steps=30):
+    """Etiquetas de las ventanas que empiezan en starts: el target de su última fila."""
+    return np.asarray(y)[np.asarray(starts) + time_steps - 1]
+
+def sliding_windows(X, y, time_steps=30, groups=None):
+    """
+    Crea las secuencias para los modelos secuenciales como una vista sobre el
+    buffer de X (sin copiar datos). La ventana i contiene las filas
+    [i, i + time_steps) y su etiqueta es y[i + time_steps - 1].
+    Devuelve (ventanas de forma (N - T + 1, T, F), etiquetas de forma (N - T + 1,)),
+    vacías si hay menos de T filas. Con groups solo quedan las ventanas de un
+    único ticker (window_starts), pero el resultado es una COPIA de tamaño
+    (ventanas, T, F): para contar ventanas o leer etiquetas sin materializarlas
+    usa window_starts, y para entrenar sequence_batches / sequence_dataset.
+    """
+    X = np.asarray(X)
+    y = np.asarray(y)
+    if len(X) < time_steps:
+        return np.empty((0, time_steps) + X.shape[1:], dtype=X.dtype), y[:0]
+    # sliding_window_view añade el eje de la ventana al final: (N - T + 1, F, T)
+    windows = sliding_window_view(X, time_steps, axis=0).transpose(0, 2, 1)
+    labels = y[time_steps - 1:]
+    if groups is None:
+        return windows, labels
+    starts = window_starts(len(X), time_steps, groups)
+    return windows[starts], labels[starts]
+
+def create_sequences(X, y, time_steps=30):
+    """Compatibilidad con la versión anterior: mismas ventanas, pero como vista."""
+    return sliding_windows(X, y, time_steps)
+
+def sequence_batches(X, y, time_steps=30, batch_size=32, start=0, stop=None, shuffle=False, seed=None, groups=None,
+                     starts=None):
+    """
+    Genera lotes (X_lote, y_lote) de las ventanas válidas [start, stop) bajo
+    demanda (con groups, solo las de un único ticker), o de las que empiezan
+    en starts si se indican (p. ej. las de validation_split). Solo se
+    materializa en memoria el lote actual, nunca el tensor completo.
+    """
+    windows, labels = sliding_windows(X, y, time_steps)
+    if starts is None:
+        starts = window_starts(len(y), time_steps, groups)[start:stop]
+    indices = np.array(starts) # Copia: el barajado no debe tocar los índices del llamador
+    if shuffle:
+        np.random.default_rng(seed).shuffle(indices)
+    for i in range(0, len(indices), batch_size):
+        batch = indices[i:i + batch_size]
+        yield windows[batch].astype(np.float32), labels[batch]
+
+def sequence_dataset(X, y, time_steps=30, batch_size=32, start=0, stop=None, shuffle=False, seed=None, groups=None,
+                     starts=None):
+    """Versión tf.data de sequence_batches, lista para model.fit / model.predict."""
+    import tensorflow as tf # Import local: las ventanas de NumPy no necesitan TensorFlow
+
+    X = np.asarray(X)
+    y = np.asarray(y)
+    signature = (
+        tf.TensorSpec(shape=(None, time_steps, X.shape[1]), dtype=tf.float32),
+        tf.TensorSpec(shape=(None,), dtype=tf.as_dtype(y.dtype)),
+    )
+    dataset = tf.data.Dataset.from_generator(
+        lambda: sequence_batches(X, y, time_steps, batch_size, start, stop, shuffle, seed, groups, starts),
+        output_signature=signature
+    )
+    return dataset.prefetch(tf.data.AUTOTUNE)
@@ -1,55 +1,97 @@
-import numpy as np
-import tensorflow as tf
-from tensorflow.keras.models import Sequential
-from tensorflow.keras.layers import LSTM, Dense, Dropout
 from sklearn.metrics import classification_report, confusion_matrix
-from src.data_pipeline import get_prepared_data
-
-# Función para crear secuencias para la LSTM
-def create_sequences(X, y, time_steps=30):
-    Xs, ys = [], []
-    for i in range(len(X) - time_steps):
-        v = X.iloc[i:(i + time_steps)].values
-        Xs.append(v)
-        ys.append(y.iloc[i + time_steps])
-    return np.array(Xs), np.array(ys)
-
-# 1. Cargar y preparar los datos
-X_train_df, X_test_df, y_train, y_test = get_prepared_data()
+from src.feature_store import get_feature_set_path, load_prepared_data
+from src.serving.registry import save_model
+from src.telemetry import stage
+from src.modeling.sequences import validation_split, window_starts, window_labels, sequence_dataset
+from src.modeling.training import (FAST_BATCH_SIZE, MAX_EPOCHS, VALIDATION_FRACTION, configure_threads,
+                                    fit_fast, windowed_dataset)
+
 TIME_STEPS = 30 # Usaremos los últimos 30 días para predecir el siguiente
+BATCH_SIZE = 32
+EPOCHS = 20
+
+def build_lstm_model(input_shape):
+    from tensorflow.keras.models import Sequential # Import local: TensorFlow solo se carga al entrenar
+    from tensorflow.keras.layers import LSTM, Dense, Dropout
+
+    model = Sequential()
+    model.add(LSTM(units=50, return_sequences=True, input_shape=input_shape))
+    model.add(Dropout(0.2))
+    model.add(LSTM(units=50))
+    model.add(Dropout(0.2))
+    model.add(Dense(units=1, activation='sigmoid'))
+    return model
+
+def train_lstm(feature_set_path=None, time_steps=TIME_STEPS, batch_size=None, epochs=None, save=True,
+                fast=False, jit_compile=False, intra_op=None, inter_op=None):
+    """
+    Entrena, evalúa y (opcionalmente) guarda el modelo LSTM. Devuelve el modelo.
+    Con fast=True usa el modo rápido de src.modeling.training: lotes grandes
+    con learning rate escalado, pipeline tf.data paralelo, XLA opcional
+    (jit_compile), hilos configurables y parada temprana.
+    """
+    if fast:
+        configure_threads(intra_op, inter_op) # Antes de crear ningún tensor
+    batch_size = batch_size or (FAST_BATCH_SIZE if fast else BATCH_SIZE)
+    epochs = epochs or (MAX_EPOCHS if fast else EPOCHS)
+
+    # 1. Cargar y preparar los datos (matrices versionadas del almacén de características, en memmap)
+    feature_set_path = feature_set_path or get_feature_set_path()
+    X_train_df, X_test_df, y_train, y_test, groups_train, groups_test = load_prepared_data(
+        path=feature_set_path, return_groups=True)
+
+    # Solo los índices de las ventanas que no cruzan de un ticker a otro; los lotes se generan bajo demanda
+    # La validación son las últimas fechas de cada ticker, no los últimos tickers
+    train_starts, val_starts = validation_split(len(y_train), time_steps, groups_train, VALIDATION_FRACTION)
+    test_starts = window_starts(len(y_test), time_steps, groups_test)
+    y_test_seq = window_labels(y_test, test_starts, time_steps)
+    input_shape = (time_steps, X_train_df.shape[1])
+    if fast:
+        test_ds = windowed_dataset(X_test_df, y_test, time_steps, batch_size, groups=groups_test)
+    else:
+        train_ds = sequence_dataset(X_train_df, y_train, time_steps, batch_size, shuffle=True, starts=train_starts)
+        val_ds = sequence_dataset(X_train_df, y_train, time_steps, batch_size, starts=val_starts)
+        test_ds = sequence_dataset(X_test_df, y_test, time_steps, batch_size, groups=groups_test)
+
+    print(f"\nForma de los datos de entrenamiento para LSTM: {(len(train_starts),) + input_shape}")
+
+    # 2. Construir y compilar el modelo LSTM
+    print("\nConstruyendo modelo LSTM...")
+    model = build_lstm_model(input_shape)
+    if not fast:
+        model.compile(optimizer='adam', loss='binary_crossentropy', metrics=['accuracy'])
+    model.summary()
+
+    # 3. Entrenar el modelo
+    print("\nEntrenando modelo LSTM...")
+    if fast:
+        _, report = fit_fast(model, X_train_df, y_train, time_steps, 'lstm', batch_size, epochs, jit_compile,
+                             groups=groups_train)
+        print(f"{report['samples_per_second']:.0f} muestras/s, {report['epochs']} épocas, "
+              f"mejor val_accuracy {report['best_val_accuracy']:.4f}.")
+    else:
+        with stage('train_lstm', rows_in=len(train_starts)) as s:
+            history = model.fit(
+                train_ds,
+                epochs=epochs,
+                validation_data=val_ds,
+                verbose=1
+            )
+            s.rows_out = len(history.epoch)
+    print("Entrenamiento completado.")
+
+    # 4. Evaluar el modelo
+    print("\n--- Evaluación del Modelo LSTM ---")
+    y_pred_prob = model.predict(test_ds)
+    y_pred = (y_pred_prob > 0.5).astype(int)
+    print(classification_report(y_test_seq, y_pred))
+    print("Matriz de Confusión:")
+    print(confusion_matrix(y_test_seq, y_pred))
+
+    # 5. Guardar el modelo con su esquema para el servicio de predicción
+    if save:
+        save_model(model, 'lstm', feature_set_path, time_steps=time_steps)
+    return model
 
-X_train_seq, y_train_seq = create_sequences(X_train_df, y_train, TIME_STEPS)
-X_test_seq, y_test_seq = create_sequences(X_test_df, y_test, TIME_STEPS)
-
-print(f"\nForma de los datos de entrenamiento para LSTM: {X_train_seq.shape}")
-
-# 2. Construir y compilar el modelo LSTM
-print("\nConstruyendo modelo LSTM...")
-model = Sequential()
-model.add(LSTM(units=50, return_sequences=True, input_shape=(X_train_seq.shape[1], X_train_seq.shape[2])))
-model.add(Dropout(0.2))
-model.add(LSTM(units=50))
-model.add(Dropout(0.2))
-model.add(Dense(units=1, activation='sigmoid'))
-
-model.compile(optimizer='adam', loss='binary_crossentropy', metrics=['accuracy'])
-model.summary()
-
-# 3. Entrenar el modelo
-print("\nEntrenando modelo LSTM...")
-history = model.fit(
-    X_train_seq, y_train_seq,
-    epochs=20,
-    batch_size=32,
-    validation_split=0.1,
-    verbose=1
-)
-print("Entrenamiento completado.")
-
-# 4. Evaluar el modelo
-print("\n--- Evaluación del Modelo LSTM ---")
-y_pred_prob = model.predict(X_test_seq)
-y_pred = (y_pred_prob > 0.5).astype(int)
-print(classification_report(y_test_seq, y_pred))
-print("Matriz de Confusión:")
-print(confusion_matrix(y_test_seq, y_pred))
\ No newline at end of file
+if __name__ == "__main__":
+    train_lstm()
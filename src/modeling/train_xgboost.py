@@ -1,26 +1,42 @@
 import xgboost as xgb
 from sklearn.metrics import classification_report, confusion_matrix
-from src.data_pipeline import get_prepared_data
+from src.feature_store import get_feature_set_path, load_prepared_data
+from src.serving.registry import save_model
+from src.telemetry import stage
 
-# 1. Cargar y preparar los datos
-X_train, X_test, y_train, y_test = get_prepared_data()
+XGB_PARAMS = {
+    'objective': 'binary:logistic',
+    'n_estimators': 200,
+    'learning_rate': 0.05,
+    'max_depth': 5,
+    'eval_metric': 'logloss',
+}
 
-# 2. Inicializar y entrenar el modelo XGBoost
-print("\nEntrenando modelo XGBoost...")
-model = xgb.XGBClassifier(
-    objective='binary:logistic',
-    n_estimators=200,
-    learning_rate=0.05,
-    max_depth=5,
-    use_label_encoder=False,
-    eval_metric='logloss'
-)
-model.fit(X_train, y_train)
-print("Entrenamiento completado.")
+def train_xgboost(feature_set_path=None, params=XGB_PARAMS, save=True):
+    """Entrena, evalúa y (opcionalmente) guarda el clasificador XGBoost. Devuelve el modelo."""
+    # 1. Cargar y preparar los datos (matrices versionadas del almacén de características, en memmap)
+    feature_set_path = feature_set_path or get_feature_set_path()
+    X_train, X_test, y_train, y_test = load_prepared_data(path=feature_set_path)
 
-# 3. Evaluar el modelo
-print("\n--- Evaluación del Modelo XGBoost ---")
-y_pred = model.predict(X_test)
-print(classification_report(y_test, y_pred))
-print("Matriz de Confusión:")
-print(confusion_matrix(y_test, y_pred))
\ No newline at end of file
+    # 2. Inicializar y entrenar el modelo XGBoost
+    print("\nEntrenando modelo XGBoost...")
+    model = xgb.XGBClassifier(**params)
+    with stage('train_xgboost', rows_in=len(X_train)) as s:
+        model.fit(X_train, y_train)
+        s.rows_out = model.get_booster().num_boosted_rounds()
+    print("Entrenamiento completado.")
+
+    # 3. Evaluar el modelo
+    print("\n--- Evaluación del Modelo XGBoost ---")
+    y_pred = model.predict(X_test)
+    print(classification_report(y_test, y_pred))
+    print("Matriz de Confusión:")
+    print(confusion_matrix(y_test, y_pred))
+
+    # 4. Guardar el modelo con su esquema para el servicio de predicción
+    if save:
+        save_model(model, 'xgboost', feature_set_path)
+    return model
+
+if __name__ == "__main__":
+    train_xgboost()
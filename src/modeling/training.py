@@ -0,0 +1,238 @@
+"""
+Modo de entrenamiento rápido en CPU para los modelos secuenciales (LSTM y
+Transformer): pipeline tf.data con ventanas generadas en paralelo a partir de
+la matriz en memoria, lotes grandes con el learning rate escalado, XLA
+opcional, hilos configurables y parada temprana con restauración del mejor
+checkpoint. Informa de muestras/s y del tiempo hasta alcanzar una accuracy
+de validación, y permite compararlo con la configuración original.
+
+Uso:
+    python -m src.modeling.training lstm --compare --epochs 5 --target-accuracy 0.52
+"""
+import os
+import time
+import numpy as np
+from src.telemetry import stage
+
+FAST_BATCH_SIZE = 256
+BASE_BATCH_SIZE = 32        # Configuración original, referencia para escalar el learning rate
+BASE_LEARNING_RATE = 1e-3   # Valor por defecto de Adam
+WARMUP_EPOCHS = 2           # Subida progresiva hasta el learning rate escalado
+MAX_EPOCHS = 100            # Límite superior; la parada temprana decide el final
+PATIENCE = 5
+VALIDATION_FRACTION = 0.1   # Último 10% de las ventanas de cada ticker (validation_split)
+CHECKPOINT_DIR = 'models/checkpoints'
+
+def configure_threads(intra_op=None, inter_op=None):
+    """
+    Fija los pools de hilos de TensorFlow (hay que llamarlo antes de crear
+    ningún tensor). intra_op paraleliza dentro de cada operación (matmul,
+    convoluciones); inter_op ejecuta operaciones independientes a la vez.
+    """
+    import tensorflow as tf
+    if intra_op:
+        tf.config.threading.set_intra_op_parallelism_threads(intra_op)
+    if inter_op:
+        tf.config.threading.set_inter_op_parallelism_threads(inter_op)
+    return tf.config.threading.get_intra_op_parallelism_threads(), tf.config.threading.get_inter_op_parallelism_threads()
+
+def windowed_dataset(X, y, time_steps, batch_size, start=0, stop=None, shuffle=False, seed=None, cache=False,
+                     groups=None, starts=None):
+    """
+    Pipeline tf.data de las ventanas [start, stop) de sliding_windows(X, y, groups=groups),
+    o de las que empiezan en starts si se indican.
+    La matriz se convierte una sola vez a un tensor float32 en memoria; cada
+    lote se arma con un único gather vectorizado, en paralelo (AUTOTUNE) y con
+    prefetch, sin materializar nunca el tensor completo de ventanas.
+    cache=True guarda los lotes ya armados (útil para validación y test,
+    que no se barajan). En entrenamiento no compensa: cachear los lotes
+    congelaría el orden del primer barajado, y cachear las ventanas sueltas
+    guardaría cada fila time_steps veces; el gather sobre el tensor en
+    memoria ya es barato.
+    """
+    import tensorflow as tf
+    from src.modeling.sequences import window_starts
+
+    if starts is None:
+        starts = window_starts(len(y), time_steps, groups)[start:stop]
+    X = tf.convert_to_tensor(np.asarray(X, dtype=np.float32))
+    y = tf.convert_to_tensor(np.asarray(y, dtype=np.float32))
+    offsets = tf.range(time_steps, dtype=tf.int64)
+
+    def gather(indices):
+        rows = indices[:, None] + offsets[None, :]     # (lote, time_steps)
+        return tf.gather(X, rows), tf.gather(y, indices + time_steps - 1)
+
+    dataset = tf.data.Dataset.from_tensor_slices(starts.astype(np.int64))
+    if shuffle:
+        dataset = dataset.shuffle(len(starts), seed=seed, reshuffle_each_iteration=True)
+    dataset = dataset.batch(batch_size).map(gather, num_parallel_calls=tf.data.AUTOTUNE, deterministic=not shuffle)
+    if cache:
+        dataset = dataset.cache()
+    return dataset.prefetch(tf.data.AUTOTUNE)
+
+def scaled_learning_rate(batch_size, base_lr=BASE_LEARNING_RATE, base_batch_size=BASE_BATCH_SIZE):
+    """Regla de escalado lineal: el learning rate crece en proporción al tamaño del lote."""
+    return base_lr * batch_size / base_batch_size
+
+def warmup_schedule(target_lr, base_lr=BASE_LEARNING_RATE, warmup_epochs=WARMUP_EPOCHS):
+    """Learning rate por época: rampa lineal desde base_lr hasta target_lr y luego constante."""
+    def schedule(epoch, lr=None):
+        if warmup_epochs <= 0 or epoch >= warmup_epochs:
+            return target_lr
+        return base_lr + (target_lr - base_lr) * epoch / warmup_epochs
+    return schedule
+
+def make_throughput_callback(n_samples, target_accuracy=None):
+    """
+    Callback de Keras que mide muestras/s de entrenamiento por época (sin
+    contar la validación) y el tiempo hasta la primera época con
+    val_accuracy >= target_accuracy.
+    """
+    import tensorflow as tf
+
+    class ThroughputCallback(tf.keras.callbacks.Callback):
+        def __init__(self):
+            super().__init__()
+            self.samples_per_second = []
+            self.time_to_accuracy = None
+            self.epoch_to_accuracy = None
+
+        def on_train_begin(self, logs=None):
+            self._train_start = time.perf_counter()
+
+        def on_epoch_begin(self, epoch, logs=None):
+            self._epoch_start = self._last_batch = time.perf_counter()
+
+        def on_train_batch_end(self, batch, logs=None):
+            self._last_batch = time.perf_counter()
+
+        def on_epoch_end(self, epoch, logs=None):
+            self.samples_per_second.append(n_samples / max(self._last_batch - self._epoch_start, 1e-9))
+            accuracy = (logs or {}).get('val_accuracy')
+            if (target_accuracy is not None and self.time_to_accuracy is None
+                    and accuracy is not None and accuracy >= target_accuracy):
+                self.time_to_accuracy = time.perf_counter() - self._train_start
+                self.epoch_to_accuracy = epoch + 1
+
+    return ThroughputCallback()
+
+def _report(name, callback, history, wall_seconds, batch_size):
+    return {
+        'mode': name,
+        'batch_size': batch_size,
+        'epochs': len(history.epoch),
+        'samples_per_second': float(np.median(callback.samples_per_second)) if callback.samples_per_second else None,
+        'time_to_accuracy': callback.time_to_accuracy,
+        'epoch_to_accuracy': callback.epoch_to_accuracy,
+        'best_val_accuracy': float(max(history.history.get('val_accuracy', [np.nan]))),
+        'best_val_loss': float(min(history.history.get('val_loss', [np.nan]))),
+        'wall_seconds': wall_seconds,
+    }
+
+def fit_fast(model, X, y, time_steps, name, batch_size=FAST_BATCH_SIZE, epochs=MAX_EPOCHS, jit_compile=False,
+             patience=PATIENCE, warmup_epochs=WARMUP_EPOCHS, target_accuracy=None, checkpoint_dir=CHECKPOINT_DIR,
+             seed=0, groups=None):
+    """
+    Compila y entrena el modelo en modo rápido sobre las ventanas de (X, y),
+    con el último VALIDATION_FRACTION de las ventanas de cada ticker como
+    validación (validation_split; sin groups, el final de la serie).
+    La parada temprana restaura los mejores pesos y el mejor checkpoint queda
+    en checkpoint_dir. Devuelve (history, informe de rendimiento).
+    """
+    import tensorflow as tf
+    from src.modeling.sequences import validation_split
+
+    train_starts, val_starts = validation_split(len(y), time_steps, groups, VALIDATION_FRACTION)
+    train_ds = windowed_dataset(X, y, time_steps, batch_size, shuffle=True, seed=seed, starts=train_starts)
+    val_ds = windowed_dataset(X, y, time_steps, batch_size, cache=True, starts=val_starts)
+
+    learning_rate = scaled_learning_rate(batch_size)
+    model.compile(optimizer=tf.keras.optimizers.Adam(learning_rate=learning_rate), loss='binary_crossentropy',
+                  metrics=['accuracy'], jit_compile=jit_compile)
+
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    checkpoint_path = os.path.join(checkpoint_dir, f"{name}.weights.h5")
+    throughput = make_throughput_callback(len(train_starts), target_accuracy)
+    callbacks = [
+        tf.keras.callbacks.LearningRateScheduler(warmup_schedule(learning_rate, warmup_epochs=warmup_epochs)),
+        tf.keras.callbacks.EarlyStopping(monitor='val_loss', patience=patience, restore_best_weights=True),
+        tf.keras.callbacks.ModelCheckpoint(checkpoint_path, monitor='val_loss', save_best_only=True, save_weights_only=True),
+        throughput,
+    ]
+    print(f"Modo rápido: lotes de {batch_size}, learning rate {learning_rate:.2e}, XLA={'sí' if jit_compile else 'no'}.")
+
+    started = time.perf_counter()
+    with stage(f'fit_fast_{name}', rows_in=len(train_starts), batch_size=batch_size) as s:
+        history = model.fit(train_ds, epochs=epochs, validation_data=val_ds, callbacks=callbacks, verbose=2)
+        s.rows_out = len(history.epoch)
+    report = _report('rápido', throughput, history, time.perf_counter() - started, batch_size)
+    return history, report
+
+def fit_baseline(model, X, y, time_steps, epochs, target_accuracy=None, groups=None):
+    """Configuración original (lotes de 32 desde el generador, Adam por defecto, épocas fijas) con las mismas métricas."""
+    from src.modeling.sequences import sequence_dataset, validation_split
+
+    train_starts, val_starts = validation_split(len(y), time_steps, groups, VALIDATION_FRACTION)
+    train_ds = sequence_dataset(X, y, time_steps, BASE_BATCH_SIZE, shuffle=True, starts=train_starts)
+    val_ds = sequence_dataset(X, y, time_steps, BASE_BATCH_SIZE, starts=val_starts)
+    model.compile(optimizer='adam', loss='binary_crossentropy', metrics=['accuracy'])
+
+    throughput = make_throughput_callback(len(train_starts), target_accuracy)
+    started = time.perf_counter()
+    history = model.fit(train_ds, epochs=epochs, validation_data=val_ds, callbacks=[throughput], verbose=2)
+    return history, _report('original', throughput, history, time.perf_counter() - started, BASE_BATCH_SIZE)
+
+def compare_with_baseline(kind='lstm', feature_set_path=None, epochs=5, target_accuracy=None,
+                          batch_size=FAST_BATCH_SIZE, jit_compile=False, intra_op=None, inter_op=None):
+    """
+    Entrena el mismo modelo con la configuración original y con el modo
+    rápido (mismo límite de épocas) y compara muestras/s y tiempo hasta la
+    accuracy objetivo.
+    """
+    configure_threads(intra_op, inter_op)
+    batch_size = batch_size or FAST_BATCH_SIZE
+    from src.feature_store import get_feature_set_path, load_prepared_data
+    from src.modeling.train_lstm import TIME_STEPS as LSTM_TIME_STEPS, build_lstm_model
+    from src.modeling.train_transformers import TIME_STEPS as TRANSFORMER_TIME_STEPS, TRANSFORMER_PARAMS, build_transformer_model
+
+    X_train, _, y_train, _, groups_train, _ = load_prepared_data(path=feature_set_path or get_feature_set_path(),
+                                                                  return_groups=True)
+    if kind == 'lstm':
+        time_steps = LSTM_TIME_STEPS
+        build = lambda: build_lstm_model((time_steps, X_train.shape[1]))
+    else:
+        time_steps = TRANSFORMER_TIME_STEPS
+        build = lambda: build_transformer_model(input_shape=(time_steps, X_train.shape[1]), **TRANSFORMER_PARAMS)
+
+    reports = [
+        fit_baseline(build(), X_train, y_train, time_steps, epochs, target_accuracy, groups_train)[1],
+        fit_fast(build(), X_train, y_train, time_steps, f"{kind}_compare", batch_size, epochs, jit_compile,
+                 target_accuracy=target_accuracy, groups=groups_train)[1],
+    ]
+
+    print(f"\n--- {kind.upper()}: configuración original vs modo rápido ({epochs} épocas máx.) ---")
+    print(f"{'Modo':<10}{'Lote':>6}{'Épocas':>8}{'Muestras/s':>13}{'Hasta objetivo (s)':>20}{'Mejor val_acc':>15}{'Total (s)':>11}")
+    for r in reports:
+        to_target = '-' if r['time_to_accuracy'] is None else f"{r['time_to_accuracy']:.1f}"
+        print(f"{r['mode']:<10}{r['batch_size']:>6}{r['epochs']:>8}{r['samples_per_second']:>13.0f}"
+              f"{to_target:>20}{r['best_val_accuracy']:>15.4f}{r['wall_seconds']:>11.1f}")
+    base, fast = reports
+    print(f"\nAceleración en muestras/s: {fast['samples_per_second'] / base['samples_per_second']:.1f}x")
+    return reports
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('model', choices=['lstm', 'transformer'])
+    parser.add_argument('--compare', action='store_true', help="Compara con la configuración original.")
+    parser.add_argument('--epochs', type=int, default=5)
+    parser.add_argument('--target-accuracy', type=float, default=None)
+    parser.add_argument('--batch-size', type=int, default=FAST_BATCH_SIZE)
+    parser.add_argument('--jit', action='store_true', help="Compila el modelo con XLA.")
+    parser.add_argument('--intra-op', type=int, default=None)
+    parser.add_argument('--inter-op', type=int, default=None)
+    args = parser.parse_args()
+
+    compare_with_baseline(args.model, epochs=args.epochs, target_accuracy=args.target_accuracy,
+                          batch_size=args.batch_size, jit_compile=args.jit, intra_op=args.intra_op, inter_op=args.inter_op)
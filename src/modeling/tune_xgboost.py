@@ -0,0 +1,194 @@
+import os
+import json
+import time
+import hashlib
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import xgboost as xgb
+from src.feature_store import get_feature_set_path, open_feature_set
+from src.telemetry import stage
+
+# Espacio de búsqueda (incluye la configuración fija de train_xgboost.py)
+PARAM_GRID = {
+    'max_depth': [3, 5, 7],
+    'learning_rate': [0.02, 0.05, 0.1],
+    'subsample': [0.8, 1.0],
+    'colsample_bytree': [0.8, 1.0],
+    'min_child_weight': [1, 5],
+}
+BASE_PARAMS = {'objective': 'binary:logistic', 'eval_metric': 'logloss', 'tree_method': 'hist', 'max_bin': 256}
+VALID_FRACTION = 0.2        # Últimos días del periodo de entrenamiento usados para validar
+MAX_ROUNDS = 800
+MIN_ROUNDS = 50             # Presupuesto de la primera ronda de successive halving
+HALVING_FACTOR = 3          # En cada ronda sobrevive 1/3 de las configuraciones con 3x de árboles
+EARLY_STOPPING_ROUNDS = 30
+TRIALS_PATH = 'output/xgboost_trials.jsonl'
+
+# Matrices del proceso: se construyen una sola vez en _init_worker
+_DATA = {}
+
+def param_grid(grid=PARAM_GRID):
+    """Todas las combinaciones del grid como lista de diccionarios."""
+    names = sorted(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+def _init_worker(feature_set_path, valid_fraction, n_threads):
+    """
+    Abre el almacén (memmap) y construye los QuantileDMatrix de entrenamiento
+    y validación una vez por proceso; todas las pruebas del proceso los reutilizan.
+    La validación son los últimos días del periodo de entrenamiento, de modo
+    que el conjunto de test no interviene en la búsqueda.
+    """
+    arrays, meta = open_feature_set(feature_set_path)
+    dates = arrays['index_train'].astype('datetime64[D]')
+    days = np.unique(dates)
+    valid_start = days[int(len(days) * (1 - valid_fraction))]
+    train_mask = dates < valid_start
+
+    X, y = arrays['X_train'], arrays['y_train']
+    dtrain = xgb.QuantileDMatrix(X[train_mask], y[train_mask], max_bin=BASE_PARAMS['max_bin'], nthread=n_threads)
+    dvalid = xgb.QuantileDMatrix(X[~train_mask], y[~train_mask], ref=dtrain, nthread=n_threads)
+    _DATA.update(dtrain=dtrain, dvalid=dvalid, y_valid=np.asarray(y[~train_mask]), n_threads=n_threads,
+                 feature_set=meta['key'])
+
+def trial_key(feature_set, params, num_rounds):
+    """Identificador estable de una prueba: datos, hiperparámetros y presupuesto de árboles."""
+    definition = {'feature_set': feature_set, 'params': params, 'num_rounds': num_rounds}
+    return hashlib.sha1(json.dumps(definition, sort_keys=True).encode()).hexdigest()[:16]
+
+def run_trial(params, num_rounds, early_stopping_rounds=EARLY_STOPPING_ROUNDS):
+    """Entrena una configuración con parada temprana sobre la validación."""
+    started = time.perf_counter()
+    with stage('tune_trial', rows_in=_DATA['dtrain'].num_row(), num_rounds=num_rounds) as s:
+        booster = xgb.train(
+            dict(BASE_PARAMS, **params, nthread=_DATA['n_threads']),
+            _DATA['dtrain'],
+            num_boost_round=num_rounds,
+            evals=[(_DATA['dvalid'], 'valid')],
+            early_stopping_rounds=early_stopping_rounds,
+            verbose_eval=False,
+        )
+        s.rows_out = booster.best_iteration + 1
+    y_prob = booster.predict(_DATA['dvalid'], iteration_range=(0, booster.best_iteration + 1))
+    return {
+        'trial': trial_key(_DATA['feature_set'], params, num_rounds),
+        'feature_set': _DATA['feature_set'],
+        'params': params,
+        'num_rounds': num_rounds,
+        'best_iteration': int(booster.best_iteration),
+        'valid_logloss': float(booster.best_score),
+        'valid_accuracy': float(((y_prob > 0.5).astype(int) == _DATA['y_valid']).mean()),
+        'seconds': round(time.perf_counter() - started, 3),
+    }
+
+def _run_trial_worker(args):
+    return run_trial(*args)
+
+def load_trials(trials_path=TRIALS_PATH):
+    """Pruebas ya terminadas, indexadas por su clave (para reanudar la búsqueda)."""
+    if not os.path.exists(trials_path):
+        return {}
+    trials = {}
+    with open(trials_path, 'r') as f:
+        for line in f:
+            if line.strip():
+                trial = json.loads(line)
+                trials[trial['trial']] = trial
+    return trials
+
+class TrialRunner:
+    """
+    Ejecuta lotes de pruebas en un pool de procesos (o en el propio proceso
+    con n_jobs=1), saltando las que ya están en el fichero de resultados y
+    guardando cada prueba en cuanto termina.
+    """
+    def __init__(self, feature_set_path, n_jobs=1, valid_fraction=VALID_FRACTION, trials_path=TRIALS_PATH):
+        _, meta = open_feature_set(feature_set_path)
+        self.feature_set = meta['key']
+        self.trials_path = trials_path
+        self.completed = load_trials(trials_path)
+        n_threads = max(1, (os.cpu_count() or 1) // n_jobs)
+        init_args = (feature_set_path, valid_fraction, n_threads)
+        if n_jobs > 1:
+            self._executor = ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker, initargs=init_args)
+        else:
+            self._executor = None
+            _init_worker(*init_args)
+
+    def run(self, configs, num_rounds):
+        """Devuelve los resultados de las configuraciones con el presupuesto num_rounds."""
+        pending = [params for params in configs
+                   if trial_key(self.feature_set, params, num_rounds) not in self.completed]
+        if len(pending) < len(configs):
+            print(f"  {len(configs) - len(pending)} pruebas recuperadas de {self.trials_path}.")
+
+        tasks = [(params, num_rounds) for params in pending]
+        results = self._executor.map(_run_trial_worker, tasks) if self._executor else map(_run_trial_worker, tasks)
+        os.makedirs(os.path.dirname(self.trials_path) or '.', exist_ok=True)
+        with open(self.trials_path, 'a') as f:
+            for trial in results:
+                f.write(json.dumps(trial) + '\n')
+                f.flush()
+                self.completed[trial['trial']] = trial
+        return [self.completed[trial_key(self.feature_set, params, num_rounds)] for params in configs]
+
+    def close(self):
+        if self._executor:
+            self._executor.shutdown()
+
+def grid_search(runner, configs, num_rounds=MAX_ROUNDS):
+    """Evalúa todas las configuraciones con el presupuesto completo."""
+    print(f"Grid search: {len(configs)} configuraciones x {num_rounds} árboles máx.")
+    return sorted(runner.run(configs, num_rounds), key=lambda trial: trial['valid_logloss'])
+
+def successive_halving(runner, configs, min_rounds=MIN_ROUNDS, max_rounds=MAX_ROUNDS, factor=HALVING_FACTOR):
+    """
+    Successive halving: todas las configuraciones empiezan con pocos árboles y
+    en cada ronda solo sobrevive la mejor 1/factor, con factor veces más árboles.
+    """
+    num_rounds = min_rounds
+    survivors = configs
+    while True:
+        print(f"Successive halving: {len(survivors)} configuraciones x {num_rounds} árboles máx.")
+        ranked = sorted(runner.run(survivors, num_rounds), key=lambda trial: trial['valid_logloss'])
+        if len(ranked) <= 1 or num_rounds >= max_rounds:
+            return ranked
+        survivors = [trial['params'] for trial in ranked[:max(1, len(ranked) // factor)]]
+        num_rounds = min(num_rounds * factor, max_rounds)
+
+def tune_xgboost(feature_set_path=None, strategy='halving', n_jobs=1, grid=PARAM_GRID, trials_path=TRIALS_PATH):
+    """
+    Busca hiperparámetros para el clasificador XGBoost.
+    Los datos se preparan una vez (almacén de características) y cada proceso
+    construye sus matrices una sola vez. Si se interrumpe, al relanzarla se
+    reutilizan las pruebas guardadas en trials_path.
+    """
+    feature_set_path = feature_set_path or get_feature_set_path()
+    runner = TrialRunner(feature_set_path, n_jobs, trials_path=trials_path)
+    try:
+        configs = param_grid(grid)
+        ranked = successive_halving(runner, configs) if strategy == 'halving' else grid_search(runner, configs)
+    finally:
+        runner.close()
+
+    best = ranked[0]
+    print("\n--- Mejores configuraciones (logloss de validación) ---")
+    for trial in ranked[:5]:
+        print(f"{trial['valid_logloss']:.4f}  acc={trial['valid_accuracy']:.4f}  "
+              f"árboles={trial['best_iteration'] + 1}  {trial['params']}")
+    print(f"\n✅ Mejor configuración: {dict(best['params'], n_estimators=best['best_iteration'] + 1)}")
+    return best
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Búsqueda de hiperparámetros para XGBoost.")
+    parser.add_argument('--strategy', choices=['halving', 'grid'], default='halving')
+    parser.add_argument('--jobs', type=int, default=1, help="Pruebas en paralelo (procesos).")
+    parser.add_argument('--trials', default=TRIALS_PATH, help="Fichero JSONL con las pruebas (permite reanudar).")
+    parser.add_argument('--feature-source', choices=['client', 'server'], default='client')
+    args = parser.parse_args()
+
+    tune_xgboost(get_feature_set_path(feature_source=args.feature_source), args.strategy, args.jobs,
+                 trials_path=args.trials)
@@ -0,0 +1,141 @@
+import math
+from collections import deque
+
+LAGS = 5
+SMA_WINDOWS = (10, 30)
+VOLATILITY_WINDOW = 30
+RSI_WINDOW = 14
+RESYNC_EVERY = 1000 # Cada cuántas actualizaciones se recalculan las sumas para evitar deriva
+
+class RollingWindow:
+    """
+    Ventana deslizante de tamaño fijo con suma y suma de cuadrados acumuladas.
+    Los valores se guardan desplazados respecto al primero observado para
+    reducir la cancelación numérica en la varianza.
+    """
+    def __init__(self, size):
+        self.size = size
+        self.values = deque(maxlen=size)
+        self.offset = None
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.nonzero = 0
+        self._updates = 0
+
+    def push(self, value):
+        if self.offset is None:
+            self.offset = value
+        shifted = value - self.offset
+        if len(self.values) == self.size:
+            old = self.values[0]
+            self.total -= old
+            self.total_sq -= old * old
+            self.nonzero -= old != 0
+        self.values.append(shifted)
+        self.total += shifted
+        self.total_sq += shifted * shifted
+        self.nonzero += shifted != 0
+
+        self._updates += 1
+        if self._updates % RESYNC_EVERY == 0:
+            self.total = math.fsum(self.values)
+            self.total_sq = math.fsum(v * v for v in self.values)
+
+    @property
+    def full(self):
+        return len(self.values) == self.size
+
+    def mean(self):
+        if not self.full:
+            return math.nan
+        if self.nonzero == 0:
+            return self.offset # Todos los valores iguales: media exacta
+        return self.offset + self.total / self.size
+
+    def std(self):
+        """Desviación típica muestral (ddof=1), como pandas."""
+        if not self.full:
+            return math.nan
+        if self.nonzero == 0:
+            return 0.0
+        variance = (self.total_sq - self.total * self.total / self.size) / (self.size - 1)
+        return math.sqrt(max(variance, 0.0))
+
+class OnlineFeatureEngine:
+    """
+    Versión incremental de data_pipeline.feature_engineering para un ticker.
+    Mantiene el estado de cada indicador (buffers de lags, sumas de las medias
+    móviles y la volatilidad, acumuladores de ganancias/pérdidas del RSI) y
+    genera la fila de características de cada nueva barra en O(1).
+    El target no se calcula porque depende del cierre del día siguiente.
+    """
+    def __init__(self, news_types=('NoNews',)):
+        self.news_types = sorted(set(news_types) | {'NoNews'})
+        self.close_lags = deque(maxlen=LAGS)
+        self.volume_lags = deque(maxlen=LAGS)
+        self.smas = {window: RollingWindow(window) for window in SMA_WINDOWS}
+        self.volatility = RollingWindow(VOLATILITY_WINDOW)
+        self.gains = RollingWindow(RSI_WINDOW)
+        self.losses = RollingWindow(RSI_WINDOW)
+        self.prev_close = None
+        self.bars_seen = 0
+
+    def feature_names(self):
+        """Columnas en el mismo orden que feature_engineering (sin el target)."""
+        names = ['open', 'high', 'low', 'close', 'volume', 'News']
+        for i in range(1, LAGS + 1):
+            names += [f'close_lag_{i}', f'volume_lag_{i}']
+        names += [f'sma_{w}' for w in SMA_WINDOWS] + [f'volatility_{VOLATILITY_WINDOW}', 'rsi']
+        return names + [f'news_type_{t}' for t in self.news_types]
+
+    def _rsi(self):
+        gain, loss = self.gains.mean(), self.losses.mean()
+        if loss == 0:
+            return 100.0 if gain > 0 else math.nan
+        return 100 - (100 / (1 + gain / loss))
+
+    def update(self, bar):
+        """
+        Añade una barra (dict con open, high, low, close, volume, News y News_Type)
+        y devuelve su fila de características, o None mientras los indicadores
+        no tengan historia suficiente.
+        """
+        close, volume = float(bar['close']), float(bar['volume'])
+        # Igual que en pandas: el primer delta (NaN) cuenta como 0 en ganancias y pérdidas
+        delta = 0.0 if self.prev_close is None else close - self.prev_close
+        self.gains.push(delta if delta > 0 else 0.0)
+        self.losses.push(-delta if delta < 0 else 0.0)
+        for window in self.smas.values():
+            window.push(close)
+        self.volatility.push(close)
+
+        ready = len(self.close_lags) == LAGS and self.volatility.full and self.gains.full
+        row = None
+        if ready:
+            news_type = bar.get('News_Type')
+            if not isinstance(news_type, str) or not news_type:
+                news_type = 'NoNews' # Nulos (None/NaN) como en feature_engineering
+            if news_type not in self.news_types:
+                raise ValueError(f"Tipo de noticia desconocido: '{news_type}'")
+            row = {key: bar[key] for key in ('open', 'high', 'low', 'close', 'volume', 'News')}
+            for i in range(1, LAGS + 1):
+                row[f'close_lag_{i}'] = self.close_lags[-i]
+                row[f'volume_lag_{i}'] = self.volume_lags[-i]
+            for w, window in self.smas.items():
+                row[f'sma_{w}'] = window.mean()
+            row[f'volatility_{VOLATILITY_WINDOW}'] = self.volatility.std()
+            row['rsi'] = self._rsi()
+            for t in self.news_types:
+                row[f'news_type_{t}'] = t == news_type
+
+        self.close_lags.append(close)
+        self.volume_lags.append(volume)
+        self.prev_close = close
+        self.bars_seen += 1
+        return row
+
+    def warm_up(self, df):
+        """Inicializa el estado con el histórico (DataFrame de load_data_from_clickhouse)."""
+        for bar in df.to_dict('records'):
+            self.update(bar)
+        return self
@@ -0,0 +1,218 @@
+"""
+Exporta un modelo secuencial del registro (LSTM o Transformer) a artefactos
+de inferencia: SavedModel y grafo TFLite, con cuantización post-entrenamiento
+opcional (float16, dinámica o int8 calibrada con ventanas del conjunto de
+entrenamiento). Compara el artefacto con el modelo Keras en float32
+(deriva de las probabilidades y de la accuracy, tamaño y latencia de una
+sola muestra) y guarda el informe en models/<tipo>/export.json.
+
+Uso:
+    python -m src.serving.export transformer --quantization int8
+"""
+import os
+import json
+import time
+import shutil
+from datetime import datetime, timezone
+import numpy as np
+from src.feature_store import FEATURE_STORE_DIR, get_feature_set_path, open_feature_set
+from src.modeling.sequences import window_starts, window_labels
+from src.serving.lite import LITE_FILE, LiteModel
+from src.serving.registry import MODELS_DIR, MODEL_FILES
+from src.telemetry import stage
+
+QUANTIZATIONS = ('none', 'float16', 'dynamic', 'int8')
+N_CALIBRATION = 500     # Ventanas de entrenamiento para calibrar los rangos int8
+N_REPORT = 5000         # Ventanas de test para medir la deriva
+LATENCY_RUNS = 200      # Predicciones de una sola muestra para la latencia
+PREDICT_BATCH = 256
+
+def _directory_size(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+def _window_indices(n_rows, time_steps, n_windows, groups=None):
+    """Índices de inicio de n_windows ventanas válidas (window_starts) repartidas uniformemente."""
+    starts = window_starts(n_rows, time_steps, groups)
+    if not len(starts):
+        return starts
+    return starts[np.unique(np.linspace(0, len(starts) - 1, min(n_windows, len(starts))).astype(int))]
+
+def _windows(X, indices, time_steps):
+    return np.stack([X[i:i + time_steps] for i in indices]).astype(np.float32)
+
+def _latency_ms(predict_fn, sample, runs):
+    predict_fn(sample) # Calentamiento (trazado del grafo, reserva de tensores)
+    times = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        predict_fn(sample)
+        times.append((time.perf_counter() - started) * 1000)
+    return {'p50': float(np.percentile(times, 50)), 'p99': float(np.percentile(times, 99))}
+
+def _auc(y_true, y_prob):
+    from sklearn.metrics import roc_auc_score
+    return float(roc_auc_score(y_true, y_prob)) if len(np.unique(y_true)) == 2 else float('nan')
+
+def inference_model(model):
+    """
+    Copia del modelo para exportar, con las capas recurrentes desenrolladas
+    (unroll=True) y los mismos pesos. El bucle de una LSTM con el tamaño de
+    lote variable no se puede bajar a operaciones nativas de TFLite; desenrollada
+    son time_steps pasos de matmul que admiten cualquier lote e int8.
+    """
+    import tensorflow as tf
+
+    def clone_layer(layer):
+        config = layer.get_config()
+        if 'unroll' in config:
+            config['unroll'] = True
+        return layer.__class__.from_config(config)
+
+    if not any('unroll' in layer.get_config() for layer in model.layers):
+        return model
+    clone = tf.keras.models.clone_model(model, clone_function=clone_layer)
+    clone.set_weights(model.get_weights())
+    return clone
+
+def convert_to_tflite(saved_model_dir, quantization='float16', calibration=None):
+    """
+    Convierte el SavedModel a TFLite. 'int8' cuantiza pesos y activaciones
+    con los rangos observados en las ventanas de calibration (entrada y
+    salida se mantienen en float32, y las operaciones sin versión entera
+    quedan en float); 'dynamic' solo cuantiza los pesos.
+    Si alguna operación no tiene versión nativa se repite la conversión con
+    SELECT_TF_OPS; ese artefacto necesita el intérprete de TensorFlow (Flex).
+    """
+    import tensorflow as tf
+
+    def converter(select_tf_ops=False):
+        converter = tf.lite.TFLiteConverter.from_saved_model(saved_model_dir)
+        if quantization != 'none':
+            converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        if quantization == 'float16':
+            converter.target_spec.supported_types = [tf.float16]
+        elif quantization == 'int8':
+            converter.representative_dataset = lambda: ([window[None]] for window in calibration)
+        if select_tf_ops:
+            converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS, tf.lite.OpsSet.SELECT_TF_OPS]
+            converter._experimental_lower_tensor_list_ops = False
+        return converter
+
+    if quantization == 'int8' and calibration is None:
+        raise ValueError("La cuantización int8 necesita ventanas de calibración")
+    try:
+        return converter().convert()
+    except Exception as e: # ConverterError, que TensorFlow no expone en tf.lite
+        print(f"Aviso: Conversión solo con operaciones nativas fallida ({str(e).splitlines()[0][:120]}...). "
+              f"Se reintenta con SELECT_TF_OPS: el artefacto necesitará el intérprete de TensorFlow.")
+        return converter(select_tf_ops=True).convert()
+
+def export_model(kind='transformer', quantization='float16', models_dir=MODELS_DIR, feature_set_path=None,
+                 n_calibration=N_CALIBRATION, n_report=N_REPORT, latency_runs=LATENCY_RUNS):
+    """
+    Genera models/<kind>/saved_model y models/<kind>/model.tflite a partir
+    del modelo registrado y devuelve el informe de deriva y rendimiento.
+    Calibración y evaluación usan el conjunto de características con el que
+    se entrenó el modelo (el de su esquema) o, si ya no está, feature_set_path.
+    """
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f"Cuantización desconocida: '{quantization}' (opciones: {', '.join(QUANTIZATIONS)})")
+    import tensorflow as tf
+
+    path = os.path.join(models_dir, kind)
+    with open(os.path.join(path, 'schema.json'), 'r') as f:
+        schema = json.load(f)
+    time_steps = schema['time_steps']
+    if time_steps is None:
+        raise ValueError(f"Solo se exportan los modelos secuenciales ('{kind}' no lo es)")
+
+    registered = os.path.join(FEATURE_STORE_DIR, schema['feature_set'])
+    if not feature_set_path:
+        feature_set_path = registered if os.path.exists(registered) else get_feature_set_path()
+    arrays, meta = open_feature_set(feature_set_path)
+    if meta['columns'] != schema['columns']:
+        raise ValueError(f"Las columnas de '{meta['key']}' no coinciden con las del modelo '{kind}'")
+
+    model_path = os.path.join(path, MODEL_FILES[kind])
+    model = tf.keras.models.load_model(model_path)
+
+    # 1. SavedModel (grafo de inferencia sin el estado del optimizador)
+    saved_model_dir = os.path.join(path, 'saved_model')
+    shutil.rmtree(saved_model_dir, ignore_errors=True)
+    with stage('export_saved_model', kind=kind):
+        exported = inference_model(model)
+        if hasattr(exported, 'export'):
+            exported.export(saved_model_dir)
+        else:
+            tf.saved_model.save(exported, saved_model_dir)
+
+    # 2. TFLite con la cuantización pedida
+    X_train, X_test, y_test = arrays['X_train'], arrays['X_test'], arrays['y_test']
+    calibration = None
+    if quantization == 'int8':
+        calibration = _windows(X_train, _window_indices(len(X_train), time_steps, n_calibration,
+                                                        arrays.get('groups_train')), time_steps)
+    with stage('export_tflite', rows_in=0 if calibration is None else len(calibration), quantization=quantization):
+        tflite_model = convert_to_tflite(saved_model_dir, quantization, calibration)
+    lite_path = os.path.join(path, LITE_FILE)
+    with open(f"{lite_path}.tmp", 'wb') as f:
+        f.write(tflite_model)
+    os.replace(f"{lite_path}.tmp", lite_path)
+
+    # 3. Deriva frente al modelo float sobre ventanas de test
+    indices = _window_indices(len(X_test), time_steps, n_report, arrays.get('groups_test'))
+    windows = _windows(X_test, indices, time_steps)
+    labels = window_labels(y_test, indices, time_steps)
+    lite_model = LiteModel(lite_path, num_threads=1)
+    float_prob = model.predict(windows, batch_size=PREDICT_BATCH, verbose=0).ravel()
+    lite_prob = np.concatenate([lite_model.predict_proba(windows[i:i + PREDICT_BATCH])
+                                for i in range(0, len(windows), PREDICT_BATCH)])
+    diff = np.abs(float_prob - lite_prob)
+    float_pred, lite_pred = (float_prob > 0.5).astype(int), (lite_prob > 0.5).astype(int)
+
+    sample = windows[:1]
+    report = {
+        'kind': kind,
+        'quantization': quantization,
+        'feature_set': meta['key'],
+        'n_windows': int(len(windows)),
+        'mean_abs_diff': float(diff.mean()),
+        'max_abs_diff': float(diff.max()),
+        'decision_agreement': float((float_pred == lite_pred).mean()),
+        'accuracy': {'float': float((float_pred == labels).mean()), 'tflite': float((lite_pred == labels).mean())},
+        'roc_auc': {'float': _auc(labels, float_prob), 'tflite': _auc(labels, lite_prob)},
+        'size_bytes': {'keras': _directory_size(model_path), 'saved_model': _directory_size(saved_model_dir),
+                       'tflite': _directory_size(lite_path)},
+        'latency_ms': {'keras': _latency_ms(lambda x: model(x, training=False), sample, latency_runs),
+                       'tflite': _latency_ms(lite_model.predict_proba, sample, latency_runs)},
+        'created_at': datetime.now(timezone.utc).isoformat(),
+    }
+    with open(os.path.join(path, 'export.json'), 'w') as f:
+        json.dump(report, f, indent=2)
+    print_report(report)
+    return report
+
+def print_report(report):
+    sizes, latency = report['size_bytes'], report['latency_ms']
+    print(f"\n--- Exportación de '{report['kind']}' (cuantización: {report['quantization']}) ---")
+    print(f"{'':<10}{'Tamaño (MB)':>12}{'p50 (ms)':>10}{'p99 (ms)':>10}{'Accuracy':>10}{'AUC':>8}")
+    for name in ('keras', 'tflite'):
+        source = 'float' if name == 'keras' else 'tflite'
+        print(f"{name:<10}{sizes[name] / 1e6:>12.2f}{latency[name]['p50']:>10.2f}{latency[name]['p99']:>10.2f}"
+              f"{report['accuracy'][source]:>10.4f}{report['roc_auc'][source]:>8.4f}")
+    print(f"\nDeriva sobre {report['n_windows']} ventanas de test: |Δp| media {report['mean_abs_diff']:.5f}, "
+          f"máxima {report['max_abs_diff']:.5f}; misma decisión en el {report['decision_agreement']:.2%} de los casos.")
+    print(f"✅ Artefactos: SavedModel ({sizes['saved_model'] / 1e6:.2f} MB) y TFLite ({sizes['tflite'] / 1e6:.2f} MB).")
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('model', choices=['lstm', 'transformer'])
+    parser.add_argument('--quantization', choices=QUANTIZATIONS, default='float16')
+    parser.add_argument('--calibration', type=int, default=N_CALIBRATION, help="Ventanas de calibración (int8).")
+    args = parser.parse_args()
+
+    export_model(args.model, args.quantization, n_calibration=args.calibration)
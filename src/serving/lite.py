@@ -0,0 +1,75 @@
+"""
+Cargador ligero de los modelos secuenciales exportados a TFLite
+(src.serving.export). Solo necesita el intérprete de TFLite: usa
+ai-edge-litert o tflite-runtime si están instalados y, si no, el de
+TensorFlow; en ningún caso carga Keras ni el resto del stack de entrenamiento.
+"""
+import numpy as np
+
+LITE_FILE = 'model.tflite'
+BATCH_BUCKETS = (1, 8, 64, 256) # Tamaños de lote con intérprete propio (64: lote máximo del servicio)
+
+def _interpreter_class():
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+    except ImportError:
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+    return Interpreter
+
+class LiteModel:
+    """
+    Modelo TFLite listo para puntuar lotes ya escalados de forma
+    (n, time_steps, F). Si el grafo está cuantizado a int8 en la entrada o la
+    salida, cuantiza y decuantiza con la escala y el punto cero del tensor.
+    Cada lote se rellena hasta el menor tamaño de BATCH_BUCKETS que lo
+    contiene, con un intérprete ya reservado por tamaño, para no reasignar
+    los tensores con cada tamaño de lote distinto; los lotes mayores que el
+    último tamaño se puntúan por trozos.
+    """
+    def __init__(self, path, num_threads=None, buckets=BATCH_BUCKETS):
+        self.path = path
+        self.num_threads = num_threads
+        self.buckets = tuple(sorted(buckets))
+        self._interpreters = {} # Tamaño de lote -> (intérprete, tensor de entrada, tensor de salida)
+        _, self._input, self._output = self._interpreter(self.buckets[0])
+
+    def _interpreter(self, batch_size):
+        """Intérprete con los tensores reservados para lotes de batch_size (se crea la primera vez)."""
+        if batch_size not in self._interpreters:
+            interpreter = _interpreter_class()(model_path=self.path, num_threads=self.num_threads)
+            details = interpreter.get_input_details()[0]
+            if int(details['shape'][0]) != batch_size:
+                interpreter.resize_tensor_input(details['index'], [batch_size] + list(details['shape'][1:]))
+            interpreter.allocate_tensors()
+            self._interpreters[batch_size] = (interpreter, interpreter.get_input_details()[0],
+                                              interpreter.get_output_details()[0])
+        return self._interpreters[batch_size]
+
+    def _predict_bucket(self, batch):
+        n = len(batch)
+        bucket = next(size for size in self.buckets if size >= n)
+        interpreter, input_details, output_details = self._interpreter(bucket)
+        if n < bucket:
+            batch = np.concatenate([batch, np.zeros((bucket - n,) + batch.shape[1:], dtype=batch.dtype)])
+        scale, zero_point = input_details['quantization']
+        if scale:
+            batch = np.round(batch / scale + zero_point).astype(input_details['dtype'])
+        interpreter.set_tensor(input_details['index'], batch)
+        interpreter.invoke()
+        output = interpreter.get_tensor(output_details['index'])
+        scale, zero_point = output_details['quantization']
+        if scale:
+            output = (output.astype(np.float32) - zero_point) * scale
+        return output.ravel()[:n]
+
+    def predict_proba(self, batch):
+        """Probabilidad de subida para cada elemento del lote."""
+        batch = np.asarray(batch, dtype=np.float32)
+        largest = self.buckets[-1]
+        if len(batch) <= largest:
+            return self._predict_bucket(batch)
+        return np.concatenate([self._predict_bucket(batch[i:i + largest]) for i in range(0, len(batch), largest)])
@@ -0,0 +1,98 @@
+import os
+import json
+import shutil
+from datetime import datetime, timezone
+import numpy as np
+from src.feature_store import open_feature_set, scaler_from_meta
+
+MODELS_DIR = 'models'
+MODEL_KINDS = ('xgboost', 'lstm', 'transformer')
+MODEL_FILES = {'xgboost': 'model.json', 'lstm': 'model.keras', 'transformer': 'model.keras'}
+
+def save_model(model, kind, feature_set_path, time_steps=None, models_dir=MODELS_DIR):
+    """
+    Guarda un modelo entrenado junto con su esquema: columnas de entrada (en
+    orden), parámetros del scaler, versión del almacén de características y,
+    para los modelos secuenciales, la longitud de la ventana.
+    La escritura es atómica para que el servicio nunca lea un modelo a medias.
+    """
+    if kind not in MODEL_KINDS:
+        raise ValueError(f"Tipo de modelo desconocido: '{kind}'")
+    _, meta = open_feature_set(feature_set_path)
+    path = os.path.join(models_dir, kind)
+    tmp_path = f"{path}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    model_path = os.path.join(tmp_path, MODEL_FILES[kind])
+    if kind == 'xgboost':
+        model.get_booster().save_model(model_path)
+    else:
+        model.save(model_path)
+
+    schema = {
+        'kind': kind,
+        'feature_set': meta['key'],
+        'columns': meta['columns'],
+        'scaler': meta['scaler'],
+        'time_steps': time_steps,
+        'created_at': datetime.now(timezone.utc).isoformat(),
+    }
+    with open(os.path.join(tmp_path, 'schema.json'), 'w') as f:
+        json.dump(schema, f, indent=2)
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+    print(f"✅ Modelo '{kind}' guardado en {path}")
+    return path
+
+class RegisteredModel:
+    """
+    Modelo cargado del registro, listo para puntuar lotes ya escalados:
+    (n, F) para XGBoost y (n, time_steps, F) para los secuenciales.
+    Con runtime='tflite' los secuenciales se sirven con el artefacto
+    exportado por src.serving.export, sin cargar Keras.
+    """
+    def __init__(self, kind, models_dir=MODELS_DIR, runtime='keras'):
+        path = os.path.join(models_dir, kind)
+        with open(os.path.join(path, 'schema.json'), 'r') as f:
+            self.schema = json.load(f)
+        self.kind = kind
+        self.columns = self.schema['columns']
+        self.time_steps = self.schema['time_steps']
+        self.scaler = scaler_from_meta(self.schema)
+        model_path = os.path.join(path, MODEL_FILES[kind])
+        if kind == 'xgboost':
+            import xgboost as xgb
+            self._model = xgb.Booster()
+            self._model.load_model(model_path)
+        elif runtime == 'tflite':
+            from src.serving.lite import LITE_FILE, LiteModel
+            lite_path = os.path.join(path, LITE_FILE)
+            if not os.path.exists(lite_path):
+                raise FileNotFoundError(f"El modelo '{kind}' no está exportado: python -m src export {kind}")
+            self._model = LiteModel(lite_path)
+        else:
+            import tensorflow as tf # Import local: XGBoost no necesita TensorFlow
+            self._model = tf.keras.models.load_model(model_path)
+        self.runtime = 'native' if kind == 'xgboost' else runtime
+
+    @property
+    def is_sequential(self):
+        return self.time_steps is not None
+
+    def predict_proba(self, batch):
+        """Probabilidad de subida para cada elemento del lote."""
+        batch = np.asarray(batch, dtype=np.float32)
+        if self.kind == 'xgboost':
+            return self._model.inplace_predict(batch)
+        if self.runtime == 'tflite':
+            return self._model.predict_proba(batch)
+        return np.asarray(self._model(batch, training=False)).ravel()
+
+def available_models(models_dir=MODELS_DIR):
+    """Tipos de modelo guardados en el registro."""
+    return [kind for kind in MODEL_KINDS if os.path.exists(os.path.join(models_dir, kind, 'schema.json'))]
+
+def load_models(kinds=None, models_dir=MODELS_DIR, runtime='keras'):
+    """Carga los modelos indicados (por defecto, todos los disponibles)."""
+    return {kind: RegisteredModel(kind, models_dir, runtime) for kind in (kinds or available_models(models_dir))}
@@ -0,0 +1,287 @@
+import json
+import time
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import numpy as np
+import pandas as pd
+from data_api import SYMBOLS
+from src.data_pipeline import load_data_from_clickhouse
+from src.online_features import OnlineFeatureEngine
+from src.serving.registry import MODELS_DIR, load_models
+
+HOST = '127.0.0.1'
+PORT = 8080
+LOOKBACK_DAYS = 365         # Histórico para inicializar indicadores y ventanas de los modelos secuenciales
+REFRESH_SECONDS = 3600      # Cada cuánto se piden a ClickHouse las barras nuevas
+MAX_BATCH_SIZE = 64
+MAX_WAIT_MS = 2.0           # Espera máxima para juntar peticiones concurrentes en un lote
+TARGET_P99_MS = 50.0
+PREDICT_TIMEOUT_SECONDS = 5.0 # Espera máxima por la respuesta del modelo antes de devolver 503
+LATENCY_WINDOW = 10_000     # Últimas peticiones consideradas en los percentiles
+
+class LatencyTracker:
+    """Latencias de las últimas peticiones y sus percentiles frente al objetivo."""
+    def __init__(self, target_p99_ms=TARGET_P99_MS, window=LATENCY_WINDOW):
+        self.target_p99_ms = target_p99_ms
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, latency_ms):
+        with self._lock:
+            self._latencies.append(latency_ms)
+
+    def snapshot(self):
+        with self._lock:
+            latencies = np.array(self._latencies)
+        if not len(latencies):
+            return {'count': 0, 'target_p99_ms': self.target_p99_ms}
+        p50, p99 = np.percentile(latencies, [50, 99])
+        return {
+            'count': len(latencies),
+            'p50_ms': round(float(p50), 3),
+            'p99_ms': round(float(p99), 3),
+            'target_p99_ms': self.target_p99_ms,
+            'within_target': bool(p99 <= self.target_p99_ms),
+        }
+
+class MicroBatcher:
+    """
+    Agrupa las entradas que llegan a la vez desde distintos hilos y las
+    puntúa en una sola llamada al modelo. Un hilo toma la primera entrada de
+    la cola y espera hasta max_wait_ms (o hasta max_batch_size entradas)
+    antes de lanzar el lote.
+    """
+    def __init__(self, predict_fn, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        threading.Thread(target=self._loop, daemon=True).start()
+
+    def submit(self, x):
+        future = Future()
+        self._queue.put((x, future))
+        return future
+
+    def _loop(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            try:
+                probabilities = self.predict_fn(np.stack([x for x, _ in batch]))
+                for (_, future), probability in zip(batch, probabilities):
+                    future.set_result(float(probability))
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+
+class TickerState:
+    """Estado incremental de un ticker: indicadores y últimas filas de características."""
+    def __init__(self, news_types, history):
+        self.engine = OnlineFeatureEngine(news_types)
+        self.rows = deque(maxlen=history)
+        self.last_date = None
+
+    def update(self, event_date, bar):
+        row = self.engine.update(bar)
+        # feature_engineering descarta las filas con NaN; aquí tampoco entran en las ventanas
+        if row is not None and not any(isinstance(v, float) and np.isnan(v) for v in row.values()):
+            self.rows.append(row)
+        self.last_date = event_date
+
+class PredictionService:
+    """
+    Servicio de predicción con los modelos cargados una sola vez en memoria.
+    Mantiene las características de cada ticker al día con OnlineFeatureEngine,
+    de modo que una petición solo escala la fila (o ventana) ya calculada y la
+    manda al lote del modelo.
+    """
+    def __init__(self, models, tickers=SYMBOLS, lookback_days=LOOKBACK_DAYS, target_p99_ms=TARGET_P99_MS,
+                 predict_timeout=PREDICT_TIMEOUT_SECONDS):
+        if not models:
+            raise ValueError("No hay modelos en el registro. Entrena y guarda alguno antes de servir.")
+        self.models = models
+        self.tickers = list(tickers)
+        self.lookback_days = lookback_days
+        self.predict_timeout = predict_timeout
+        self.latency = LatencyTracker(target_p99_ms)
+        self.batchers = {kind: MicroBatcher(model.predict_proba) for kind, model in models.items()}
+        columns = {c for model in models.values() for c in model.columns}
+        self.news_types = sorted(c[len('news_type_'):] for c in columns if c.startswith('news_type_'))
+        self.history = max(model.time_steps or 1 for model in models.values())
+        self.states = {ticker: TickerState(self.news_types, self.history) for ticker in self.tickers}
+        self._inputs = {} # (ticker, modelo) -> entrada escalada, se invalida al refrescar
+        self._lock = threading.Lock()
+
+    def _apply_bars(self, df):
+        known = set(self.news_types)
+        for ticker, group in df.groupby('ticker', sort=False):
+            state = self.states.get(ticker)
+            if state is None:
+                continue
+            for event_date, bar in zip(group.index, group.to_dict('records')):
+                if bar.get('News_Type') not in known:
+                    bar['News_Type'] = None # Tipos que los modelos no conocen cuentan como 'NoNews'
+                state.update(event_date, bar)
+
+    def refresh(self):
+        """Inicializa (primera vez) o actualiza el estado con las barras nuevas de ClickHouse."""
+        last_dates = [s.last_date for s in self.states.values() if s.last_date is not None]
+        if len(last_dates) < len(self.states):
+            start = date.today() - timedelta(days=self.lookback_days)
+        else:
+            start = min(last_dates) + pd.Timedelta(days=1)
+        df = load_data_from_clickhouse(start, tickers=self.tickers)
+        with self._lock:
+            # Solo las barras posteriores a lo que ya tiene cada ticker
+            last = df['ticker'].map({t: s.last_date for t, s in self.states.items()})
+            df = df[last.isna().to_numpy() | (df.index.to_numpy() > pd.to_datetime(last).to_numpy())]
+            self._apply_bars(df)
+            self._inputs.clear()
+        print(f"🔄 Estado actualizado con {len(df)} barras nuevas.")
+        return len(df)
+
+    def _model_input(self, ticker, kind):
+        key = (ticker, kind)
+        if key not in self._inputs:
+            model = self.models[kind]
+            steps = model.time_steps or 1
+            rows = list(self.states[ticker].rows)[-steps:]
+            if len(rows) < steps:
+                raise ValueError(f"Histórico insuficiente para '{ticker}' con el modelo '{kind}'.")
+            raw = np.array([[float(row.get(c, 0.0)) for c in model.columns] for row in rows])
+            scaled = (raw - model.scaler.mean_) / model.scaler.scale_
+            self._inputs[key] = scaled if model.is_sequential else scaled[0]
+        return self._inputs[key]
+
+    def predict(self, tickers, kind='xgboost'):
+        """
+        Probabilidad de que el cierre del día siguiente a as_of (la última barra
+        del ticker) supere al de as_of. Los modelos secuenciales reciben las T
+        últimas filas, terminadas en as_of, igual que en el entrenamiento, donde
+        la etiqueta de cada ventana es el target de su última fila (window_labels).
+        Lanza TimeoutError si el modelo no responde en predict_timeout segundos.
+        """
+        started = time.perf_counter()
+        if kind not in self.models:
+            raise ValueError(f"Modelo no disponible: '{kind}'")
+        unknown = [t for t in tickers if t not in self.states]
+        if unknown:
+            raise ValueError(f"Tickers desconocidos: {unknown}")
+        with self._lock:
+            inputs = [self._model_input(ticker, kind) for ticker in tickers]
+            as_of = [self.states[ticker].last_date for ticker in tickers]
+        futures = [self.batchers[kind].submit(x) for x in inputs]
+        deadline = time.perf_counter() + self.predict_timeout # Un único plazo para toda la petición
+        predictions = {}
+        for ticker, future, event_date in zip(tickers, futures, as_of):
+            try:
+                probability = future.result(timeout=max(deadline - time.perf_counter(), 0))
+            except FutureTimeoutError:
+                raise TimeoutError(f"El modelo '{kind}' no respondió en {self.predict_timeout} s.")
+            predictions[ticker] = {
+                'prob_up': round(probability, 6),
+                'direction': 'up' if probability > 0.5 else 'down',
+                'as_of': pd.Timestamp(event_date).date().isoformat(),
+            }
+        self.latency.record((time.perf_counter() - started) * 1000)
+        return predictions
+
+    def start_refresh_loop(self, interval=REFRESH_SECONDS):
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.refresh()
+                except Exception as e:
+                    print(f"❌ Error al actualizar el estado: {e}")
+        threading.Thread(target=loop, daemon=True).start()
+
+def make_handler(service):
+    class PredictionHandler(BaseHTTPRequestHandler):
+        """
+        GET  /predict?tickers=TM,GM&model=xgboost
+        GET  /metrics   -> latencias p50/p99 frente al objetivo
+        GET  /health
+        POST /refresh   -> pide a ClickHouse las barras nuevas
+        """
+        def _send(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == '/predict':
+                query = parse_qs(url.query)
+                tickers = [t for t in query.get('tickers', [','.join(service.tickers)])[0].split(',') if t]
+                try:
+                    self._send(200, service.predict(tickers, query.get('model', ['xgboost'])[0]))
+                except ValueError as e:
+                    self._send(400, {'error': str(e)})
+                except TimeoutError as e:
+                    self._send(503, {'error': str(e)})
+            elif url.path == '/metrics':
+                self._send(200, service.latency.snapshot())
+            elif url.path == '/health':
+                self._send(200, {'status': 'ok', 'models': list(service.models)})
+            else:
+                self._send(404, {'error': 'Ruta no encontrada'})
+
+        def do_POST(self):
+            if urlparse(self.path).path == '/refresh':
+                self._send(200, {'new_bars': service.refresh()})
+            else:
+                self._send(404, {'error': 'Ruta no encontrada'})
+
+        def log_message(self, format, *args):
+            pass # El registro por petición añadiría latencia
+
+    return PredictionHandler
+
+def serve(host=HOST, port=PORT, models_dir=MODELS_DIR, kinds=None, tickers=SYMBOLS, runtime='keras'):
+    """
+    Carga los modelos una vez, inicializa el estado y atiende peticiones HTTP.
+    runtime='tflite' sirve los modelos secuenciales con su artefacto exportado.
+    """
+    service = PredictionService(load_models(kinds, models_dir, runtime), tickers)
+    service.refresh()
+    service.start_refresh_loop()
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    server.daemon_threads = True
+    print(f"🚀 Servicio de predicción en http://{host}:{port} (modelos: {', '.join(service.models)})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Servicio local de predicción de la dirección del día siguiente.")
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--models', nargs='*', help="Modelos a cargar (por defecto, todos los del registro).")
+    parser.add_argument('--runtime', choices=['keras', 'tflite'], default='keras',
+                        help="Motor de los modelos secuenciales.")
+    args = parser.parse_args()
+
+    serve(args.host, args.port, kinds=args.models, runtime=args.runtime)
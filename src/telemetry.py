@@ -0,0 +1,304 @@
+import os
+import json
+import time
+import uuid
+import atexit
+import shutil
+import signal
+import threading
+import subprocess
+import multiprocessing
+from contextlib import contextmanager
+from datetime import datetime, timezone
+try:
+    import resource # Solo existe en Unix
+except ImportError:
+    resource = None
+
+# Configuración por variables de entorno (sin tocar el código de los scripts)
+TELEMETRY_DIR = os.getenv('PIPELINE_TELEMETRY_DIR', 'output/telemetry')
+TELEMETRY_ENABLED = os.getenv('PIPELINE_TELEMETRY', '1') != '0' # Una línea por etapa en events.jsonl
+PROMETHEUS_ENABLED = os.getenv('PIPELINE_PROMETHEUS', '0') == '1' # Reescribe pipeline.prom en cada etapa
+PROFILER = os.getenv('PIPELINE_PROFILE', '').lower()   # '', 'cprofile' o 'py-spy'
+PROFILE_STAGES = {s for s in os.getenv('PIPELINE_PROFILE_STAGES', '').split(',') if s} # Vacío = todas
+RSS_SAMPLE_SECONDS = float(os.getenv('PIPELINE_RSS_SAMPLE_MS', '10')) / 1000 # Muestreo del RSS de las etapas abiertas
+RESET_PEAK_RSS = os.getenv('PIPELINE_RESET_PEAK_RSS', '0') == '1' # Opt-in: reinicia VmHWM en cada etapa (ver _reset_hwm)
+EVENTS_FILE = 'events.jsonl'
+PROMETHEUS_FILE = 'pipeline.prom'
+
+RUN_ID = uuid.uuid4().hex[:12]  # Agrupa los eventos de una misma ejecución
+_local = threading.local()      # Pila de etapas abiertas en cada hilo
+_lock = threading.Lock()
+_summary = {}                   # Última medición y contadores por etapa (para Prometheus)
+_open_stages = set()            # Etapas abiertas (de cualquier hilo) cuyo pico de RSS se muestrea
+_sampler_wakeup = threading.Event()
+_sampler = None
+
+class Stage:
+    """Medición de una etapa; rows_in/rows_out y labels se pueden fijar dentro del bloque."""
+    def __init__(self, name, rows_in=None, labels=None):
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.labels = labels or {}
+        self.peak_rss = 0
+
+def _read_hwm():
+    """Pico de memoria residente (VmHWM) del proceso en bytes, o None fuera de Linux."""
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+def _reset_hwm():
+    """
+    Reinicia VmHWM para medir el pico de cada etapa por separado (Linux).
+    Es un contador de todo el proceso que también lee getrusage().ru_maxrss,
+    así que solo se usa con PIPELINE_RESET_PEAK_RSS=1: con él, cualquier otra
+    medida del pico del proceso (p. ej. benchmarks/bench_memory.py) queda falseada.
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+def _current_rss():
+    """Memoria residente actual del proceso en bytes, o None fuera de Linux."""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def _peak_rss():
+    """Pico de memoria residente de todo el proceso desde que arrancó (o desde el último _reset_hwm)."""
+    hwm = _read_hwm()
+    if hwm is not None:
+        return hwm
+    if resource is None: # Windows: sin medida de memoria
+        return 0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024 # ru_maxrss está en KB en Linux
+
+def _sample_loop():
+    """Hilo que, mientras haya etapas abiertas, lleva su pico de RSS al máximo muestreado."""
+    while True:
+        _sampler_wakeup.wait()
+        rss = _current_rss()
+        with _lock:
+            if not _open_stages:
+                _sampler_wakeup.clear()
+            for current in _open_stages:
+                current.peak_rss = max(current.peak_rss, rss)
+        time.sleep(RSS_SAMPLE_SECONDS)
+
+def _start_sampling(current):
+    """
+    Empieza a muestrear el RSS de la etapa. Sin /proc (fuera de Linux) no hay
+    muestras y la etapa informa del pico del proceso.
+    """
+    global _sampler
+    rss = _current_rss()
+    if rss is None:
+        return False
+    current.peak_rss = rss
+    with _lock:
+        _open_stages.add(current)
+        if _sampler is None or not _sampler.is_alive():
+            _sampler = threading.Thread(target=_sample_loop, name='telemetry-rss', daemon=True)
+            _sampler.start()
+    _sampler_wakeup.set()
+    return True
+
+def _stop_sampling(current):
+    with _lock:
+        _open_stages.discard(current)
+        current.peak_rss = max(current.peak_rss, _current_rss() or 0)
+
+def _cpu_time():
+    """CPU de usuario y sistema del proceso más la de los hijos ya terminados (pools de procesos)."""
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+def _write_event(event):
+    os.makedirs(TELEMETRY_DIR, exist_ok=True)
+    with _lock, open(os.path.join(TELEMETRY_DIR, EVENTS_FILE), 'a') as f:
+        f.write(json.dumps(event) + '\n')
+
+def _prometheus_text():
+    lines = []
+    metrics = [
+        ('pipeline_stage_wall_seconds', 'gauge', 'Duración de la última ejecución de la etapa', 'wall_seconds'),
+        ('pipeline_stage_cpu_seconds', 'gauge', 'Tiempo de CPU de la última ejecución de la etapa', 'cpu_seconds'),
+        ('pipeline_stage_peak_rss_bytes', 'gauge', 'Pico de memoria residente durante la etapa', 'peak_rss_bytes'),
+        ('pipeline_stage_rows_in', 'gauge', 'Filas de entrada de la última ejecución', 'rows_in'),
+        ('pipeline_stage_rows_out', 'gauge', 'Filas de salida de la última ejecución', 'rows_out'),
+        ('pipeline_stage_last_run_timestamp_seconds', 'gauge', 'Fin de la última ejecución (epoch)', 'finished_at'),
+        ('pipeline_stage_runs_total', 'counter', 'Ejecuciones de la etapa en este proceso', 'runs'),
+        ('pipeline_stage_errors_total', 'counter', 'Ejecuciones de la etapa terminadas con error', 'errors'),
+    ]
+    for metric, kind, help_text, key in metrics:
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} {kind}"]
+        for name, values in sorted(_summary.items()):
+            if values.get(key) is not None:
+                lines.append(f'{metric}{{stage="{name}"}} {values[key]}')
+    return '\n'.join(lines) + '\n'
+
+def _write_prometheus():
+    """
+    Fichero de texto para el textfile collector de node_exporter (escritura
+    atómica). Solo lo escribe el proceso principal: los procesos de los pools
+    tienen su propio _summary y lo sobrescribirían con sus etapas.
+    """
+    if multiprocessing.parent_process() is not None:
+        return
+    os.makedirs(TELEMETRY_DIR, exist_ok=True)
+    path = os.path.join(TELEMETRY_DIR, PROMETHEUS_FILE)
+    with _lock:
+        text = _prometheus_text()
+    with open(f"{path}.{os.getpid()}.tmp", 'w') as f:
+        f.write(text)
+    os.replace(f"{path}.{os.getpid()}.tmp", path)
+
+def _record(event):
+    with _lock:
+        values = _summary.setdefault(event['stage'], {'runs': 0, 'errors': 0})
+        values.update(
+            wall_seconds=event['wall_seconds'], cpu_seconds=event['cpu_seconds'],
+            peak_rss_bytes=event['peak_rss_bytes'], rows_in=event['rows_in'], rows_out=event['rows_out'],
+            finished_at=round(time.time(), 3),
+        )
+        values['runs'] += 1
+        values['errors'] += event['status'] == 'error'
+    if TELEMETRY_ENABLED:
+        _write_event(event)
+    if PROMETHEUS_ENABLED:
+        _write_prometheus()
+
+@contextmanager
+def _profiled(name):
+    """
+    Perfilado opcional de la etapa según PIPELINE_PROFILE:
+    'cprofile' guarda un .prof (snakeviz, pstats) y 'py-spy' lanza
+    `py-spy record` sobre este proceso mientras dura la etapa.
+    """
+    if not PROFILER or (PROFILE_STAGES and name not in PROFILE_STAGES):
+        yield
+        return
+    profile_dir = os.path.join(TELEMETRY_DIR, 'profiles')
+    os.makedirs(profile_dir, exist_ok=True)
+    base = os.path.join(profile_dir, f"{name}-{RUN_ID}-{int(time.time())}")
+
+    if PROFILER == 'cprofile':
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            profiler.dump_stats(f"{base}.prof")
+    elif PROFILER == 'py-spy' and shutil.which('py-spy'):
+        recorder = subprocess.Popen(
+            ['py-spy', 'record', '--pid', str(os.getpid()), '--format', 'speedscope', '--output', f"{base}.speedscope.json"],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            yield
+        finally:
+            recorder.send_signal(signal.SIGINT) # py-spy escribe el perfil al recibir SIGINT
+            recorder.wait()
+    else:
+        print(f"Aviso: Perfilador '{PROFILER}' no disponible. Se ejecuta la etapa sin perfilar.")
+        yield
+
+@contextmanager
+def stage(name, rows_in=None, **labels):
+    """
+    Mide una etapa del pipeline: tiempo de reloj, tiempo de CPU, pico de RSS y
+    filas de entrada/salida. Al terminar añade un evento a events.jsonl y,
+    con PIPELINE_PROMETHEUS=1, actualiza el fichero de Prometheus. Las etapas
+    se pueden anidar.
+
+    El pico de la etapa es el máximo del RSS muestreado cada
+    PIPELINE_RSS_SAMPLE_MS (los picos más breves pueden no verse); el evento
+    incluye además el pico de todo el proceso (process_peak_rss_bytes). No se
+    toca ningún contador del kernel salvo con PIPELINE_RESET_PEAK_RSS=1.
+
+        with stage('feature_engineering', rows_in=len(df)) as s:
+            df = ...
+            s.rows_out = len(df)
+    """
+    current = Stage(name, rows_in, labels)
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    parent = stack[-1] if stack else None
+    if RESET_PEAK_RSS:
+        if parent is not None:
+            parent.peak_rss = max(parent.peak_rss, _peak_rss()) # Antes de reiniciar el pico para la etapa hija
+        # Solo el hilo principal lo reinicia; las etapas de hilos secundarios informan del pico del proceso
+        sampled = False
+        if threading.current_thread() is threading.main_thread():
+            _reset_hwm()
+    else:
+        sampled = _start_sampling(current)
+    stack.append(current)
+
+    started_at = datetime.now(timezone.utc)
+    wall_start, cpu_start = time.perf_counter(), _cpu_time()
+    status, error = 'ok', None
+    try:
+        with _profiled(name):
+            yield current
+    except BaseException as e:
+        status, error = 'error', f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        stack.pop()
+        if sampled:
+            _stop_sampling(current)
+        else:
+            current.peak_rss = max(current.peak_rss, _peak_rss())
+        process_peak = _peak_rss()
+        if parent is not None:
+            parent.peak_rss = max(parent.peak_rss, current.peak_rss)
+        _record({
+            'run_id': RUN_ID,
+            'pid': os.getpid(),
+            'stage': name,
+            'parent': parent.name if parent else None,
+            'started_at': started_at.isoformat(),
+            'wall_seconds': round(time.perf_counter() - wall_start, 6),
+            'cpu_seconds': round(_cpu_time() - cpu_start, 6),
+            'peak_rss_bytes': current.peak_rss,
+            'process_peak_rss_bytes': process_peak,
+            'rows_in': current.rows_in,
+            'rows_out': current.rows_out,
+            'status': status,
+            'error': error,
+            'labels': current.labels,
+        })
+
+def summary():
+    """Última medición de cada etapa en este proceso."""
+    with _lock:
+        return {name: dict(values) for name, values in _summary.items()}
+
+def print_summary():
+    rows = summary()
+    if not rows:
+        return
+    print(f"\n{'Etapa':<32}{'Reloj (s)':>11}{'CPU (s)':>10}{'Pico RSS (MB)':>15}{'Filas entrada':>15}{'Filas salida':>14}")
+    for name, v in rows.items():
+        fmt = lambda x: '-' if x is None else str(x)
+        print(f"{name:<32}{v['wall_seconds']:>11.3f}{v['cpu_seconds']:>10.3f}{v['peak_rss_bytes'] / 2**20:>15.1f}"
+              f"{fmt(v['rows_in']):>15}{fmt(v['rows_out']):>14}")
+
+if os.getenv('PIPELINE_TELEMETRY_SUMMARY') == '1':
+    atexit.register(print_summary)
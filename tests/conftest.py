@@ -0,0 +1,128 @@
+"""
+Fixtures comunes de los tests. Los datos sintéticos salen de
+benchmarks/synthetic.py, igual que en los benchmarks.
+"""
+import json
+import threading
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+import pytest
+
+class StubServer:
+    """
+    Servidor HTTP local para simular APIs y webs externas. respond(request)
+    recibe el manejador de la petición y devuelve (estado, cabeceras, cuerpo);
+    cada petición queda registrada en requests como (ruta, cabeceras).
+    """
+    def __init__(self, respond):
+        self.requests = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.requests.append((self.path, dict(self.headers)))
+                status, headers, body = respond(self)
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}"
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+class ChdbClient:
+    """Cliente mínimo sobre chdb (ClickHouse embebido) con la interfaz de clickhouse_driver."""
+    def __init__(self):
+        from chdb import session
+        self.session = session.Session()
+        self.disconnected = False
+
+    def execute(self, query, params=None, columnar=False, with_column_types=False):
+        if query.lstrip().startswith('INSERT') and params is not None: # Filas, o columnas con columnar=True
+            rows = params
+            if columnar:
+                rows = zip(*[column.astype(str) if hasattr(column, 'astype') else column for column in params])
+            query += ' ' + ', '.join('(' + ', '.join(repr(str(value)) for value in row) + ')' for row in rows)
+            params = None
+        for name, value in (params or {}).items():
+            query = query.replace(f'%({name})s', f"'{value}'")
+        result = self.session.query(query, 'JSONCompact').bytes()
+        payload = json.loads(result) if result else {'data': [], 'meta': []} # DDL: sin resultado
+        rows = [tuple(row) for row in payload['data']]
+        rows = [list(column) for column in zip(*rows)] if columnar else rows
+        if with_column_types:
+            return rows, [(column['name'], column['type']) for column in payload['meta']]
+        return rows
+
+    def disconnect(self):
+        self.disconnected = True
+
+@pytest.fixture
+def chdb_client():
+    """Base de datos stocks_db vacía en chdb, con el esquema de initialize_database."""
+    pytest.importorskip('chdb')
+    from src.data_bbdd_pipeline import initialize_database as schema
+    client = ChdbClient()
+    client.execute(f"DROP DATABASE IF EXISTS {schema.DB_NAME}")
+    for sql in (schema.CREATE_DB_SQL, schema.CREATE_TABLE_SQL, schema.CREATE_NEWS_TABLE_SQL, schema.CREATE_NEWS_VIEW_SQL,
+                schema.CREATE_MARKET_INDEX_TABLE_SQL, schema.CREATE_FEATURES_VIEW_SQL):
+        client.execute(sql)
+    return client
+
+@pytest.fixture
+def panel_feature_set(tmp_path):
+    """
+    Versión del almacén de características con el formato de
+    materialize_features: 3 tickers x 120 días de mercado (80 de entrenamiento,
+    40 de test), con un target que depende de la primera característica.
+    """
+    path = tmp_path / 'features' / 'panel'
+    path.mkdir(parents=True)
+    rng = np.random.default_rng(0)
+    days = np.busday_offset('2024-01-01', np.arange(120), roll='forward')
+    arrays = {}
+    for part, part_days in (('train', days[:80]), ('test', days[80:])):
+        n_rows = 3 * len(part_days)
+        X = rng.normal(size=(n_rows, 4)).astype(np.float32)
+        arrays[f'X_{part}'] = X
+        arrays[f'y_{part}'] = (X[:, 0] + rng.normal(scale=0.5, size=n_rows) > 0).astype(np.uint8)
+        arrays[f'index_{part}'] = np.tile(part_days, 3).astype('datetime64[ns]') # Ordenado por ticker y fecha
+        arrays[f'groups_{part}'] = np.repeat(np.arange(3, dtype=np.int32), len(part_days))
+    for name, array in arrays.items():
+        np.save(path / f"{name}.npy", array)
+    meta = {'key': 'panel', 'columns': [f'f{i}' for i in range(4)],
+            'scaler': {'mean': [0.0] * 4, 'scale': [1.0] * 4, 'var': [1.0] * 4},
+            'watermark': {'max_date': str(days[-1])}, 'created_at': datetime.now(timezone.utc).isoformat()}
+    (path / 'meta.json').write_text(json.dumps(meta))
+    return str(path)
+
+@pytest.fixture
+def stub_server():
+    servers = []
+
+    def start(respond):
+        server = StubServer(respond)
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.close()
+
+@pytest.fixture(autouse=True)
+def telemetry_dir(tmp_path, monkeypatch):
+    """Los eventos de telemetría de cada test van a su directorio temporal."""
+    from src import telemetry
+    monkeypatch.setattr(telemetry, 'TELEMETRY_DIR', str(tmp_path / 'telemetry'))
+    return tmp_path / 'telemetry'
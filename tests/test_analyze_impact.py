@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+import pytest
+from benchmarks.synthetic import make_ohlcv
+from src.analysis.analyze_impact import IMPACT_METRICS, SUMMARY_LEVELS, in_database_analysis, load_impact_summary
+
+@pytest.fixture
+def panel(chdb_client):
+    """Panel sintético cargado en stock_daily y news_events de chdb."""
+    panel = make_ohlcv(n_days=80, n_tickers=3, news_rate=0.2, start_date='2024-01-01').reset_index()
+    stock = panel[['ticker', 'event_date', 'open', 'high', 'low', 'close', 'volume']]
+    chdb_client.execute("INSERT INTO stocks_db.stock_daily VALUES", [stock[column].to_numpy() for column in stock.columns],
+                        columnar=True)
+    news = panel[panel['News'] == 1]
+    chdb_client.execute("INSERT INTO stocks_db.news_events VALUES",
+                        [news['ticker'].to_numpy(), news['event_date'].to_numpy(), news['News_Type'].to_numpy(),
+                         ('https://example.com/' + news.index.astype(str)).to_numpy()], columnar=True)
+    return panel
+
+def pandas_metrics(panel, start_date):
+    """Las métricas de impacto calculadas por ticker con pandas, sin la vista."""
+    df = panel.copy()
+    by_ticker = df.groupby('ticker', sort=False)
+    df['abs_return'] = by_ticker['close'].pct_change().abs()
+    df['volatility_range'] = (df['high'] - df['low']) / df['low']
+    df['volume_change_ratio'] = df['volume'] / by_ticker['volume'].transform(lambda v: v.rolling(30).mean())
+    df['news_type'] = df['News_Type'].fillna('NoNews')
+    return df[df['event_date'] >= pd.Timestamp(start_date)]
+
+@pytest.mark.parametrize('level', list(SUMMARY_LEVELS))
+def test_summary_matches_pandas_group_means_and_counts(panel, chdb_client, level):
+    start_date = '2024-02-01'
+    summary = load_impact_summary(level, start_date, client=chdb_client)
+    df = pandas_metrics(panel, start_date)
+    keys = {'news': ['News'], 'news_type': ['News', 'news_type'], 'ticker': ['News', 'ticker']}[level]
+    expected = df.groupby(keys)[list(IMPACT_METRICS)].agg(['mean', 'size'])
+
+    summary = summary.set_index(keys).sort_index()
+    assert list(summary.index) == list(expected.index)
+    assert (summary['n'] == expected[(IMPACT_METRICS[0], 'size')]).all()
+    for metric in IMPACT_METRICS:
+        # La media ignora los nan (filas sin historia), igual que pandas
+        np.testing.assert_allclose(summary[f'{metric}_mean'], expected[(metric, 'mean')], rtol=1e-9)
+        assert (summary[f'{metric}_q05'] <= summary[f'{metric}_q50']).all() # t-digest: aproximados, solo el orden
+
+def test_in_database_analysis_writes_summaries_and_figures(panel, chdb_client, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'output').mkdir()
+    summaries = in_database_analysis('2024-01-01', client=chdb_client)
+    assert summaries['news']['n'].sum() == len(panel)
+    for name in ('impact_summary_news.csv', 'impact_summary_news_type.csv', 'impact_summary_ticker.csv',
+                 'impact_analysis_final.png', 'impact_by_news_type.png'):
+        assert (tmp_path / 'output' / name).exists()
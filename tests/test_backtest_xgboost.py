@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.feature_store import open_feature_set
+from src.modeling import backtest_xgboost
+from src.modeling.backtest_xgboost import make_folds, walk_forward_backtest
+from src.modeling.train_xgboost import XGB_PARAMS
+
+PARAMS = dict(XGB_PARAMS, n_estimators=20)
+
+def test_folds_are_time_ordered_and_do_not_overlap():
+    days = np.busday_offset('2024-01-01', np.arange(103), roll='forward')
+    dates = np.tile(days, 3) # Varios tickers por día
+    folds = make_folds(dates, n_folds=4, min_train_fraction=0.5)
+    assert [f['fold'] for f in folds] == [0, 1, 2, 3]
+
+    tested = []
+    for fold in folds:
+        block = days[(days >= np.datetime64(fold['test_start'])) & (days <= np.datetime64(fold['test_end']))]
+        assert len(block) in (13, 12)
+        # Se purga el último día antes del test: su target depende del cierre de test_start
+        first = np.searchsorted(days, np.datetime64(fold['test_start']))
+        assert fold['train_end'] == str(days[first - 2])
+        tested.extend(block)
+    assert tested == sorted(set(tested)) == list(days[51:]) # Bloques consecutivos, sin solapes ni huecos
+    assert all(a['test_end'] < b['test_start'] for a, b in zip(folds, folds[1:]))
+
+def test_training_rows_stop_before_the_purged_day(panel_feature_set):
+    arrays, _ = open_feature_set(panel_feature_set)
+    fold = make_folds(np.concatenate([arrays['index_train'], arrays['index_test']]), n_folds=2)[1]
+    metrics, predictions, _ = backtest_xgboost.run_fold(panel_feature_set, fold, PARAMS)
+    days = np.unique(arrays['index_test'].astype('datetime64[D]'))
+    test_days = days[(days >= np.datetime64(fold['test_start'])) & (days <= np.datetime64(fold['test_end']))]
+    train_days = np.unique(np.concatenate([arrays['index_train'], arrays['index_test']]).astype('datetime64[D]'))
+    train_days = train_days[train_days <= np.datetime64(fold['train_end'])]
+    assert metrics['n_train'] == 3 * len(train_days) and metrics['n_test'] == 3 * len(test_days)
+    assert str(predictions['event_date'].min().date()) == fold['test_start']
+
+def test_parallel_and_sequential_runs_agree(panel_feature_set, tmp_path):
+    runs = {}
+    for n_jobs in (1, 2):
+        metrics_path, predictions_path = tmp_path / f'metrics_{n_jobs}.csv', tmp_path / f'predictions_{n_jobs}.csv'
+        summary = walk_forward_backtest(panel_feature_set, n_folds=3, n_jobs=n_jobs, params=PARAMS,
+                                        metrics_path=str(metrics_path), predictions_path=str(predictions_path))
+        predictions = pd.read_csv(predictions_path).sort_values(['fold', 'event_date'], kind='stable')
+        runs[n_jobs] = summary.drop(columns='fit_seconds'), predictions.reset_index(drop=True)
+
+    assert len(runs[1][0]) == 3
+    pd.testing.assert_frame_equal(runs[1][0], runs[2][0])
+    pd.testing.assert_frame_equal(runs[1][1], runs[2][1])
+    assert runs[1][0]['accuracy'].min() > 0.6 # El target depende de f0
@@ -0,0 +1,67 @@
+import json
+import pytest
+import data_api
+from benchmarks.synthetic import make_alpha_vantage_json
+
+MINUTE_NOTE = ("Thank you for using Alpha Vantage! Our standard API call frequency is "
+               "5 calls per minute and 500 calls per day.")
+DAILY_NOTE = "Thank you for using Alpha Vantage! Our standard API rate limit is 25 requests per day."
+
+def json_response(payload):
+    return 200, {'Content-Type': 'application/json'}, json.dumps(payload).encode()
+
+@pytest.fixture
+def fake_api(stub_server, monkeypatch):
+    """Endpoint falso de Alpha Vantage que responde con la secuencia de payloads indicada."""
+    def start(*payloads):
+        remaining = list(payloads)
+        server = stub_server(lambda request: json_response(remaining.pop(0) if len(remaining) > 1 else remaining[0]))
+        monkeypatch.setattr(data_api, 'API_URL', server.url)
+        return server
+    monkeypatch.setattr(data_api, 'BACKOFF_SECONDS', 0)
+    return start
+
+def test_minute_note_is_not_daily_exhaustion():
+    assert data_api.classify_api_message(MINUTE_NOTE) == 'minute'
+    assert data_api.classify_api_message(DAILY_NOTE) == 'day'
+
+def test_retries_after_minute_throttle(fake_api, tmp_path):
+    payload = make_alpha_vantage_json(n_days=20)
+    server = fake_api({'Note': MINUTE_NOTE}, {'Information': MINUTE_NOTE}, payload)
+    limiter = data_api.QuotaLimiter(calls_per_minute=100, calls_per_day=10, quota_path=None)
+    path = tmp_path / 'TM.json'
+
+    assert data_api.fetch_and_save_data('TM', path=str(path), limiter=limiter) == payload
+    assert len(server.requests) == 3
+    assert json.loads(path.read_text()) == payload
+    assert limiter.acquire() # El cupo diario sigue disponible
+
+def test_daily_limit_exhausts_budget_without_retrying(fake_api, tmp_path):
+    server = fake_api({'Information': DAILY_NOTE})
+    limiter = data_api.QuotaLimiter(calls_per_minute=100, calls_per_day=10, quota_path=str(tmp_path / 'quota.json'))
+
+    assert data_api.fetch_and_save_data('TM', path=str(tmp_path / 'TM.json'), limiter=limiter) is None
+    assert len(server.requests) == 1
+    assert not limiter.acquire()
+    assert not (tmp_path / 'TM.json').exists()
+
+def test_error_message_is_not_saved(fake_api, tmp_path):
+    server = fake_api({'Error Message': 'Invalid API call.'})
+    assert data_api.fetch_and_save_data('XXXX', path=str(tmp_path / 'XXXX.json')) is None
+    assert len(server.requests) == 1
+    assert not (tmp_path / 'XXXX.json').exists()
+
+def test_gives_up_after_max_retries(fake_api, tmp_path, monkeypatch):
+    monkeypatch.setattr(data_api, 'MAX_RETRIES', 2)
+    server = fake_api({'Note': MINUTE_NOTE})
+    assert data_api.fetch_and_save_data('TM', path=str(tmp_path / 'TM.json')) is None
+    assert len(server.requests) == 3
+
+def test_fetch_symbols_stops_at_daily_quota(fake_api, tmp_path, monkeypatch):
+    monkeypatch.setattr(data_api, 'DATA_DIR', str(tmp_path))
+    server = fake_api(make_alpha_vantage_json(n_days=5))
+    limiter = data_api.QuotaLimiter(calls_per_minute=100, calls_per_day=2, quota_path=None)
+
+    results = data_api.fetch_symbols(['TM', 'GM', 'F'], max_workers=1, limiter=limiter)
+    assert sum(1 for path in results.values() if path) == 2
+    assert len(server.requests) == 2
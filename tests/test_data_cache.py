@@ -0,0 +1,55 @@
+import pandas as pd
+import pytest
+from benchmarks.synthetic import make_ohlcv, InMemoryClickHouse
+from src import data_cache
+from src.data_pipeline import load_data_from_clickhouse
+
+@pytest.fixture
+def database(monkeypatch):
+    """ClickHouse en memoria cuyo contenido se puede cambiar entre cargas."""
+    client = InMemoryClickHouse(make_ohlcv(n_days=10))
+    monkeypatch.setattr(data_cache, 'load_data_from_clickhouse',
+                        lambda *args, **kwargs: load_data_from_clickhouse(*args, client=client, **kwargs))
+    return client
+
+def test_incremental_refresh_keeps_lagging_tickers(database, tmp_path):
+    panel = make_ohlcv(n_days=120, n_tickers=2, start_date='2024-01-01')
+    dates = panel.index.unique()
+    lagging = (panel['ticker'] == 'T0001') & (panel.index > dates[79])
+    database.df = panel[~(lagging | (panel.index > dates[99]))].reset_index()
+
+    first = data_cache.load_data_cached('2024-01-01', cache_dir=str(tmp_path))
+    assert first.groupby('ticker').size().to_dict() == {'T0000': 100, 'T0001': 80}
+
+    database.df = panel.reset_index() # T0001 recupera sus 20 días y ambos avanzan hasta el 120
+    refreshed = data_cache.load_data_cached('2024-01-01', cache_dir=str(tmp_path))
+    expected = load_data_from_clickhouse('2024-01-01', client=database)
+    pd.testing.assert_frame_equal(refreshed, expected)
+    assert refreshed.groupby('ticker').size().to_dict() == {'T0000': 120, 'T0001': 120}
+
+def test_watermarks_are_per_ticker():
+    panel = make_ohlcv(n_days=30, n_tickers=3, start_date='2024-01-01')
+    dates = panel.index.unique()
+    panel = panel[~((panel['ticker'] == 'T0002') & (panel.index > dates[9]))]
+    assert data_cache._watermarks(panel) == {'T0000': dates[-1], 'T0001': dates[-1], 'T0002': dates[9]}
+    assert data_cache._watermarks(panel.drop(columns='ticker')) == {None: dates[-1]}
+
+def test_stale_ticker_does_not_pin_the_refresh(database, tmp_path, monkeypatch):
+    panel = make_ohlcv(n_days=200, n_tickers=3, start_date='2024-01-01')
+    dates = panel.index.unique()
+    delisted = (panel['ticker'] == 'T0002') & (panel.index > dates[9]) # Sin datos nuevos desde el día 10
+    database.df = panel[~(delisted | (panel.index > dates[189]))].reset_index()
+    data_cache.load_data_cached('2024-01-01', cache_dir=str(tmp_path))
+
+    requests = []
+    load = data_cache.load_data_from_clickhouse
+    monkeypatch.setattr(data_cache, 'load_data_from_clickhouse',
+                        lambda *args, **kwargs: requests.append(args) or load(*args, **kwargs))
+    database.df = panel[~delisted].reset_index()
+    refreshed = data_cache.load_data_cached('2024-01-01', cache_dir=str(tmp_path))
+
+    pd.testing.assert_frame_equal(refreshed, load_data_from_clickhouse('2024-01-01', client=database))
+    # Las filas nuevas se piden desde la última fecha de la caché, no desde el día 10 de T0002
+    assert requests[0] == (dates[189] + pd.Timedelta(days=1),)
+    assert requests[1] == (dates[9] + pd.Timedelta(days=1), dates[189])
+    assert len(database.df[database.df['event_date'] > dates[189]]) == 20
@@ -0,0 +1,100 @@
+import warnings
+import numpy as np
+import pandas as pd
+import pytest
+from benchmarks.synthetic import make_ohlcv, make_market_index, with_market_index, NEWS_TYPES, InMemoryClickHouse
+from src.data_pipeline import load_data_from_clickhouse, feature_engineering, split_and_scale, get_prepared_data
+
+@pytest.fixture
+def panel():
+    df = make_ohlcv(n_days=200, n_tickers=2, news_rate=0.2)
+    df.loc[df['News_Type'] == 'Corporate', 'News_Type'] = 'Recall' # Tipo que no está en news_types
+    return df
+
+def news_columns(df):
+    return df[[col for col in df.columns if col.startswith('news_type_')]]
+
+@pytest.mark.parametrize('compact', [False, True])
+def test_unknown_news_type_has_no_dummy(panel, compact):
+    known = [t for t in NEWS_TYPES if t != 'Corporate']
+    client = InMemoryClickHouse(panel)
+    df = load_data_from_clickhouse('1900-01-01', client=client, compact=compact)
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        featured = feature_engineering(df, news_types=known, keep_ticker=True, compact=compact)
+
+    recall = panel.set_index('ticker', append=True)['News_Type'].eq('Recall')
+    recall = recall.reindex(pd.MultiIndex.from_arrays([featured.index, featured['ticker']])).to_numpy()
+    dummies = news_columns(featured).to_numpy(dtype=np.int64)
+    assert recall.any()
+    assert (dummies[recall].sum(axis=1) == 0).all()
+    assert (dummies[~recall].sum(axis=1) == 1).all()
+    no_news = featured['news_type_NoNews'].to_numpy(dtype=bool)
+    assert (no_news == (featured['News'].to_numpy() == 0)).all()
+
+def test_compact_matches_default(panel):
+    client = InMemoryClickHouse(panel)
+    results = []
+    for compact in (False, True):
+        df = load_data_from_clickhouse('1900-01-01', client=client, compact=compact)
+        df = feature_engineering(df, news_types=NEWS_TYPES, compact=compact)
+        results.append(split_and_scale(df, panel.index[150], compact=compact))
+    (X_train, X_test, y_train, y_test, _), (cX_train, cX_test, cy_train, cy_test, _) = results
+    assert list(X_train.columns) == list(cX_train.columns)
+    assert np.allclose(X_train.to_numpy(), cX_train.to_numpy(), atol=1e-4)
+    assert np.allclose(X_test.to_numpy(), cX_test.to_numpy(), atol=1e-4)
+    assert (np.asarray(y_train) == np.asarray(cy_train)).all() and (np.asarray(y_test) == np.asarray(cy_test)).all()
+
+@pytest.mark.parametrize('compact', [False, True])
+def test_prepared_data_groups_follow_split_rows(panel, monkeypatch, compact):
+    client = InMemoryClickHouse(panel)
+    monkeypatch.setattr('src.data_cache.load_data_cached',
+                        lambda start_date: load_data_from_clickhouse(start_date, client=client))
+    split_date = panel.index[150]
+    X_train, X_test, y_train, y_test, groups_train, groups_test = get_prepared_data(
+        '1900-01-01', split_date, compact=compact, return_groups=True)
+    assert 'ticker' not in X_train.columns
+    assert len(groups_train) == len(X_train) and len(groups_test) == len(X_test)
+
+    featured = feature_engineering(load_data_from_clickhouse('1900-01-01', client=client), keep_ticker=True)
+    codes = pd.factorize(featured['ticker'])[0]
+    is_train = featured.index < split_date
+    assert (groups_train == codes[is_train]).all() and (groups_test == codes[~is_train]).all()
+    assert (np.diff(groups_train) >= 0).all() # Tickers contiguos
+
+def test_in_memory_client_serves_event_dates_and_market_index(panel):
+    market = make_market_index(n_days=150, start_date=panel.index.min())
+    client = InMemoryClickHouse(panel, {'^GSPC': market})
+    joined = load_data_from_clickhouse('1900-01-01', market_index='^GSPC', client=client)
+    expected = with_market_index(panel, market)
+    assert len(joined) == len(expected) == 2 * 150
+    assert np.allclose(joined['market_close'].to_numpy(), expected['market_close'].to_numpy())
+
+    dates = panel.index.unique()[[3, 50, 120]]
+    subset = load_data_from_clickhouse('1900-01-01', event_dates=dates, client=client)
+    assert sorted(subset.index.unique()) == list(dates) and len(subset) == 6
+
+PRICE_FEATURES = ['target'] + [f'{column}_lag_{i}' for i in range(1, 6) for column in ('close', 'volume')] + [
+    'sma_10', 'sma_30', 'volatility_30', 'rsi']
+
+def test_features_view_matches_pandas(chdb_client):
+    from src.data_pipeline import _add_price_features
+    panel = make_ohlcv(n_days=60, n_tickers=3, news_rate=0.0, start_date='2024-01-01')
+    panel.iloc[10:14, panel.columns.get_loc('close')] = panel['close'].iloc[10] # Variación 0: ni ganancia ni pérdida
+    stock = panel.reset_index()[['ticker', 'event_date', 'open', 'high', 'low', 'close', 'volume']]
+    chdb_client.execute("INSERT INTO stocks_db.stock_daily VALUES",
+                        [stock[column].to_numpy() for column in stock.columns], columnar=True)
+
+    columns = ', '.join(['ticker', 'event_date'] + PRICE_FEATURES)
+    rows = chdb_client.execute(f"SELECT {columns} FROM stocks_db.stock_features ORDER BY ticker, event_date")
+    server = pd.DataFrame(rows, columns=['ticker', 'event_date'] + PRICE_FEATURES).replace({None: np.nan})
+    expected = _add_price_features(panel.copy()).reset_index(drop=True)
+
+    assert len(server) == len(expected) == 180
+    assert (server['ticker'] == expected['ticker']).all()
+    assert (server['target'] == expected['target']).all()
+    assert server['rsi'].notna().sum() == 3 * (60 - 13)
+    for column in PRICE_FEATURES[1:]:
+        # Mismos NaN al principio de cada ticker (sin ventanas que crucen tickers) y mismos valores
+        np.testing.assert_allclose(server[column].astype(float), expected[column].astype(float), rtol=1e-9,
+                                   err_msg=column)
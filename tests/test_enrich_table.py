@@ -0,0 +1,67 @@
+import json
+from datetime import date
+from src.data_bbdd_pipeline import enrich_table
+
+PAGES = {
+    '/news/a': '<html><p class="date">March 5, 2024</p></html>',
+    '/news/b': '<html><time datetime="2023-11-20">20 Nov</time></html>',
+}
+
+def news_site(request):
+    """Web de noticias con ETag: responde 304 si la petición trae el ETag vigente."""
+    etag = f'"{request.path[-1]}-v1"'
+    if request.headers.get('If-None-Match') == etag:
+        return 304, {'ETag': etag}, b''
+    return 200, {'ETag': etag, 'Content-Type': 'text/html'}, PAGES[request.path].encode()
+
+def test_conditional_get_reuses_cached_dates(stub_server, tmp_path):
+    server = stub_server(news_site)
+    news = [(f"{server.url}{path}", 'Corporate') for path in PAGES]
+    cache_path = str(tmp_path / 'news_cache.json')
+
+    first = enrich_table.scrape_news_concurrently(news, max_workers=2, cache_path=cache_path, requests_per_second=0)
+    assert [str(event_date) for _, _, event_date in first] == ['2024-03-05', '2023-11-20']
+    assert all('If-None-Match' not in headers for _, headers in server.requests)
+    cache = json.loads(open(cache_path).read())
+    assert cache[news[0][0]] == {'etag': '"a-v1"', 'last_modified': None, 'date': '2024-03-05'}
+
+    server.requests.clear()
+    second = enrich_table.scrape_news_concurrently(news, max_workers=2, cache_path=cache_path, requests_per_second=0)
+    assert second == first
+    assert sorted(headers['If-None-Match'] for _, headers in server.requests) == ['"a-v1"', '"b-v1"']
+    assert json.loads(open(cache_path).read()) == cache
+
+def test_changed_page_is_downloaded_again(stub_server, tmp_path):
+    server = stub_server(news_site)
+    url = f"{server.url}/news/a"
+    stale = {'etag': '"a-v0"', 'last_modified': None, 'date': '2020-01-01'}
+
+    event_date, entry = enrich_table.fetch_news_date(enrich_table.create_session(1), url, stale)
+    assert str(event_date) == '2024-03-05'
+    assert entry['etag'] == '"a-v1"'
+    assert server.requests[0][1]['If-None-Match'] == '"a-v0"'
+
+def test_network_error_falls_back_to_the_cached_date(stub_server):
+    server = stub_server(lambda request: (503, {}, b'mantenimiento'))
+    cached = {'etag': '"a-v1"', 'last_modified': None, 'date': '2024-03-05'}
+    event_date, entry = enrich_table.fetch_news_date(enrich_table.create_session(1), f"{server.url}/news/a", cached)
+    assert str(event_date) == '2024-03-05' and entry == cached
+    assert enrich_table.fetch_news_date(enrich_table.create_session(1), f"{server.url}/news/a") == (None, None)
+
+def test_only_new_or_changed_dates_are_inserted_and_invalidated(chdb_client, monkeypatch):
+    invalidated = []
+    monkeypatch.setattr(enrich_table, 'invalidate_cache',
+                        lambda event_dates, tickers: invalidated.append((event_dates, tickers)))
+    scraped = [('https://example.com/a', 'Recall', date(2024, 3, 5)),
+               ('https://example.com/b', 'Corporate', date(2023, 11, 20)),
+               ('https://example.com/c', 'Corporate', None)]
+    assert enrich_table.load_news_events(chdb_client, scraped) == 2
+    assert invalidated == [([date(2023, 11, 20), date(2024, 3, 5)], ['TM'])]
+
+    invalidated.clear()
+    assert enrich_table.load_news_events(chdb_client, scraped) == 0 # Segunda ejecución: nada que invalidar
+    assert invalidated == []
+
+    scraped[1] = ('https://example.com/b', 'Corporate', date(2023, 11, 21)) # La web corrige la fecha
+    assert enrich_table.load_news_events(chdb_client, scraped) == 1
+    assert invalidated == [([date(2023, 11, 21)], ['TM'])]
@@ -0,0 +1,75 @@
+import pytest
+import numpy as np
+import pandas as pd
+from benchmarks.synthetic import make_ohlcv, make_market_index, with_market_index
+from src.analysis.event_study import (
+    market_model_by_event, abnormal_return_matrix, car_standard_deviation, caar_tests
+)
+
+WINDOW_SIZE = 3
+ESTIMATION_WINDOW = (-120, -10)
+
+def _returns(n_days=600, n_tickers=3):
+    df = with_market_index(make_ohlcv(n_days, n_tickers, news_rate=0.03), make_market_index(n_days))
+    by_ticker = df.groupby('ticker', sort=False)
+    stock = by_ticker['close'].pct_change().fillna(0).to_numpy()
+    market = by_ticker['market_close'].pct_change().fillna(0).to_numpy()
+    news = df['News'].to_numpy() == 1
+    return stock, market, news, pd.factorize(df['ticker'])[0]
+
+def test_car_std_matches_ols_prediction_error_variance():
+    stock, market, news, codes = _returns()
+    alpha, beta, sigma, positions, moments = market_model_by_event(
+        stock, market, np.flatnonzero(news), codes, ESTIMATION_WINDOW, WINDOW_SIZE,
+        exclude_mask=news, return_moments=True)
+    car_std = car_standard_deviation(market, positions, sigma, moments, WINDOW_SIZE)
+    assert car_std.shape == (len(positions), 2 * WINDOW_SIZE + 1)
+
+    for i in range(0, len(positions), 7):
+        p = positions[i]
+        days = np.arange(p + ESTIMATION_WINDOW[0], p + ESTIMATION_WINDOW[1] + 1)
+        days = days[~news[days]]
+        X = np.column_stack([np.ones(len(days)), market[days]])
+        coef, residuals = np.linalg.lstsq(X, stock[days], rcond=None)[:2]
+        s2 = residuals[0] / (len(days) - 2)
+        assert np.allclose([alpha[i], beta[i], sigma[i]], [coef[0], coef[1], np.sqrt(s2)])
+
+        # Var(CAR_L) = s² (L + 1' X0 (X'X)^-1 X0' 1) con X0 las filas de la ventana de evento
+        event_days = np.arange(p - WINDOW_SIZE, p + WINDOW_SIZE + 1)
+        X0 = np.column_stack([np.ones(len(event_days)), market[event_days]])
+        inverse = np.linalg.inv(X.T @ X)
+        expected = [np.sqrt(s2 * (L + X0[:L].sum(axis=0) @ inverse @ X0[:L].sum(axis=0)))
+                    for L in range(1, len(event_days) + 1)]
+        assert np.allclose(car_std[i], expected)
+
+def test_bmp_uses_each_event_car_std():
+    stock, market, news, codes = _returns()
+    alpha, beta, sigma, positions, moments = market_model_by_event(
+        stock, market, np.flatnonzero(news), codes, ESTIMATION_WINDOW, WINDOW_SIZE,
+        exclude_mask=news, return_moments=True)
+    ar = abnormal_return_matrix(stock, market, positions, alpha, beta, WINDOW_SIZE)
+    car_std = car_standard_deviation(market, positions, sigma, moments, WINDOW_SIZE)
+    results = caar_tests(ar, car_std=car_std, window_size=WINDOW_SIZE, n_resamples=0)
+
+    scar = np.cumsum(ar, axis=1) / car_std
+    expected = scar.mean(axis=0) / (scar.std(axis=0, ddof=1) / np.sqrt(len(scar)))
+    assert np.allclose(results['bmp_stat'], expected)
+    assert not np.allclose(results['bmp_stat'], results['t_stat'])
+
+def test_caar_tests_without_car_std_omits_bmp():
+    ar = np.random.default_rng(0).normal(0, 0.01, size=(50, 2 * WINDOW_SIZE + 1))
+    results = caar_tests(ar, window_size=WINDOW_SIZE, n_resamples=0)
+    assert 'bmp_stat' not in results and 'bmp_pvalue' not in results
+    assert list(results.index) == list(range(-WINDOW_SIZE, WINDOW_SIZE + 1))
+
+@pytest.mark.parametrize('estimation_window', [(-30, -30), (-30, -120), (-120, -3), (-120, 0), (-120, 10)])
+def test_invalid_estimation_window_is_rejected(estimation_window):
+    stock, market, news, codes = _returns(n_days=300, n_tickers=1)
+    with pytest.raises(ValueError):
+        market_model_by_event(stock, market, np.flatnonzero(news), codes, estimation_window, WINDOW_SIZE)
+
+def test_cli_rejects_invalid_estimation_window(capsys):
+    from src.cli import main
+    with pytest.raises(SystemExit):
+        main(['event-study', '--estimation-window', '-10', '-250'])
+    assert 'inicio' in capsys.readouterr().err
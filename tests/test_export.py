@@ -0,0 +1,63 @@
+import json
+import os
+from datetime import datetime, timezone
+import numpy as np
+import pytest
+
+tf = pytest.importorskip('tensorflow')
+from src.serving.export import export_model
+from src.serving.lite import LITE_FILE, LiteModel
+from src.serving.registry import save_model
+
+TIME_STEPS, N_FEATURES = 10, 4
+
+@pytest.fixture
+def feature_set(tmp_path):
+    """Conjunto de características sintético con el formato de materialize_features."""
+    path = tmp_path / 'features' / 'synthetic'
+    path.mkdir(parents=True)
+    rng = np.random.default_rng(0)
+    arrays = {
+        'X_train': rng.normal(size=(200, N_FEATURES)).astype(np.float32),
+        'X_test': rng.normal(size=(150, N_FEATURES)).astype(np.float32),
+        'y_train': (rng.random(200) < 0.5).astype(np.uint8),
+        'y_test': (rng.random(150) < 0.5).astype(np.uint8),
+        'index_train': np.arange(200).astype('datetime64[D]').astype('datetime64[ns]'),
+        'index_test': np.arange(200, 350).astype('datetime64[D]').astype('datetime64[ns]'),
+    }
+    for name, array in arrays.items():
+        np.save(path / f"{name}.npy", array)
+    meta = {'key': 'synthetic', 'columns': [f'f{i}' for i in range(N_FEATURES)],
+            'scaler': {'mean': [0.0] * N_FEATURES, 'scale': [1.0] * N_FEATURES, 'var': [1.0] * N_FEATURES},
+            'watermark': {'max_date': '2024-01-01'}, 'created_at': datetime.now(timezone.utc).isoformat()}
+    (path / 'meta.json').write_text(json.dumps(meta))
+    return str(path)
+
+@pytest.fixture
+def registered_lstm(feature_set, tmp_path):
+    tf.keras.utils.set_random_seed(0) # Pesos fijos: la deriva de int8 depende de ellos
+    model = tf.keras.Sequential([tf.keras.Input((TIME_STEPS, N_FEATURES)),
+                                 tf.keras.layers.LSTM(8, return_sequences=True), tf.keras.layers.LSTM(4),
+                                 tf.keras.layers.Dense(1, activation='sigmoid')])
+    models_dir = tmp_path / 'models'
+    save_model(model, 'lstm', feature_set, time_steps=TIME_STEPS, models_dir=str(models_dir))
+    return model, str(models_dir)
+
+@pytest.mark.parametrize('quantization', ['none', 'int8'])
+def test_export_lstm_end_to_end(registered_lstm, feature_set, quantization):
+    model, models_dir = registered_lstm
+    report = export_model('lstm', quantization, models_dir=models_dir, feature_set_path=feature_set,
+                          n_calibration=20, n_report=50, latency_runs=3)
+
+    assert report['n_windows'] == 50
+    assert report['max_abs_diff'] < (1e-5 if quantization == 'none' else 0.05)
+    assert os.path.exists(os.path.join(models_dir, 'lstm', 'saved_model'))
+    with open(os.path.join(models_dir, 'lstm', 'export.json')) as f:
+        assert json.load(f)['quantization'] == quantization
+
+    lite = LiteModel(os.path.join(models_dir, 'lstm', LITE_FILE), buckets=(1, 8, 64))
+    windows = np.random.default_rng(1).normal(size=(150, TIME_STEPS, N_FEATURES)).astype(np.float32)
+    for n in (1, 3, 8, 20, 150):
+        expected = model.predict(windows[:n], verbose=0).ravel()
+        assert np.allclose(lite.predict_proba(windows[:n]), expected, atol=1e-5 if quantization == 'none' else 0.05)
+    assert sorted(lite._interpreters) == [1, 8, 64] # Un intérprete por tamaño, reutilizado
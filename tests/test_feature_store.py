@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+from benchmarks.synthetic import make_ohlcv, InMemoryClickHouse
+from src import feature_store
+from src.data_pipeline import load_data_from_clickhouse, get_prepared_data
+
+@pytest.fixture
+def client(chdb_client):
+    chdb_client.execute("INSERT INTO stocks_db.stock_daily SELECT 'TM', toDate('2024-01-01') + number, "
+                        "100 + number, 101 + number, 99 + number, 100 + number, 1000 FROM numbers(40)")
+    return chdb_client
+
+def test_watermark_tracks_inserts_and_restatements_but_not_merges(client):
+    before = feature_store.data_watermark('2024-01-01', client=client)
+    assert before['max_date'] == '2024-02-09'
+
+    client.execute("OPTIMIZE TABLE stocks_db.stock_daily FINAL")
+    assert feature_store.data_watermark('2024-01-01', client=client) == before
+
+    client.execute("ALTER TABLE stocks_db.stock_daily UPDATE close = close * 1.01 "
+                   "WHERE event_date = '2024-01-10' SETTINGS mutations_sync = 1")
+    restated = feature_store.data_watermark('2024-01-01', client=client)
+    assert restated['stock_daily'] != before['stock_daily'] and restated['max_date'] == before['max_date']
+
+    client.execute("INSERT INTO stocks_db.news_events VALUES ('TM', '2024-01-05', 'Recall', 'https://example.com/a')")
+    enriched = feature_store.data_watermark('2024-01-01', client=client)
+    assert enriched['news_events'] != restated['news_events'] and enriched['stock_daily'] == restated['stock_daily']
+
+def test_watermark_reads_only_system_parts(client, monkeypatch):
+    queries = []
+    execute = client.execute
+    monkeypatch.setattr(client, 'execute', lambda query, params=None: queries.append(query) or execute(query, params))
+    feature_store.data_watermark('2024-01-01', feature_source='server', client=client)
+    assert len(queries) == 1 and 'FROM system.parts' in queries[0]
+    assert 'stock_features' not in queries[0] and 'stock_daily_news' not in queries[0]
+
+def test_watermark_disconnects_its_own_client(client, monkeypatch):
+    monkeypatch.setattr(feature_store, 'get_clickhouse_client', lambda use_numpy=True: client)
+    feature_store.data_watermark('2024-01-01')
+    assert client.disconnected
+
+def test_watermark_keeps_a_caller_client_open(client):
+    feature_store.data_watermark('2024-01-01', client=client)
+    assert not client.disconnected
+
+def test_materialize_then_load_round_trip(tmp_path, monkeypatch):
+    panel = make_ohlcv(n_days=200, n_tickers=2, news_rate=0.2)
+    source = InMemoryClickHouse(panel)
+    monkeypatch.setattr('src.data_cache.load_data_cached',
+                        lambda start_date: load_data_from_clickhouse(start_date, client=source))
+    watermark = {'max_date': '2024-01-01', 'stock_daily': '1', 'news_events': '2'}
+    monkeypatch.setattr(feature_store, 'data_watermark', lambda *args, **kwargs: watermark)
+    split_date = panel.index[150]
+    store_dir = str(tmp_path / 'features')
+
+    path = feature_store.get_feature_set_path('1900-01-01', split_date, store_dir=store_dir)
+    X_train, X_test, y_train, y_test, groups_train, groups_test = feature_store.load_prepared_data(
+        path=path, return_groups=True)
+    expected = get_prepared_data('1900-01-01', split_date, compact=True, return_groups=True)
+    for loaded, reference in zip((X_train, X_test, y_train, y_test), expected[:4]):
+        assert np.array_equal(loaded.to_numpy(), reference.to_numpy())
+        assert loaded.index.equals(reference.index)
+    assert list(X_train.columns) == list(expected[0].columns)
+    assert np.array_equal(groups_train, expected[4]) and np.array_equal(groups_test, expected[5])
+
+    # Con la misma marca de agua se reutiliza la versión guardada sin recalcularla
+    monkeypatch.setattr(feature_store, 'materialize_features', lambda *args, **kwargs: pytest.fail('recalculado'))
+    assert feature_store.get_feature_set_path('1900-01-01', split_date, store_dir=store_dir) == path
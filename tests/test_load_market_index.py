@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+from benchmarks.synthetic import make_ohlcv, make_market_index, with_market_index
+from src.data_bbdd_pipeline import load_market_index
+
+class FakeMarketIndexTable:
+    """Sustituto de clickhouse_driver.Client para market_index (ReplacingMergeTree: gana la última inserción)."""
+    def __init__(self, closes, symbol='^GSPC'):
+        self.rows = {(symbol, d.date()): close for d, close in closes.items()}
+        self.inserts = []
+
+    def __call__(self, **kwargs):
+        return self
+
+    def execute(self, query, params=None, columnar=False):
+        if query.startswith('SELECT'):
+            latest = {}
+            for symbol, event_date in self.rows:
+                latest[symbol] = max(latest.get(symbol, event_date), event_date)
+            return [list(latest), [np.datetime64(d) for d in latest.values()]] if latest else []
+        symbols, dates, closes = params
+        self.inserts.append(len(closes))
+        for symbol, event_date, close in zip(symbols, dates.astype(object), closes):
+            self.rows[(symbol, event_date)] = close
+
+    def disconnect(self):
+        pass
+
+def test_refresh_refetches_the_last_stored_day(monkeypatch):
+    index = make_market_index(n_days=30, start_date='2024-01-01')
+    partial = index.iloc[:20].copy()
+    partial.iloc[-1] *= 0.99 # Último día cargado con la sesión aún abierta
+    table = FakeMarketIndexTable(partial)
+    invalidated = []
+    monkeypatch.setattr(load_market_index, 'Client', table)
+    monkeypatch.setattr(load_market_index, 'fetch_index_closes', lambda symbol, start: index[index.index.date >= start])
+    monkeypatch.setattr(load_market_index, 'invalidate_cache', lambda event_dates: invalidated.extend(event_dates))
+
+    load_market_index.main(['^GSPC'])
+
+    assert table.inserts == [11] # El último día guardado y los 10 nuevos
+    assert invalidated == [index.index[19].date()]
+    stored = pd.Series({d: close for (_, d), close in table.rows.items()}).sort_index()
+    assert np.allclose(stored.to_numpy(), index.to_numpy())
+
+def test_synthetic_index_joins_the_panel_on_trading_days():
+    panel = make_ohlcv(n_days=50, n_tickers=2, start_date='2024-01-01')
+    index = make_market_index(n_days=40, start_date='2024-01-01')
+    df = with_market_index(panel, index)
+
+    assert len(df) == 2 * 40
+    assert (df.groupby('ticker').size() == 40).all()
+    assert np.allclose(df['market_close'].to_numpy(), index.reindex(df.index).to_numpy())
@@ -0,0 +1,121 @@
+import json
+import os
+import tracemalloc
+from datetime import date, timedelta
+import numpy as np
+import pytest
+from benchmarks.synthetic import make_alpha_vantage_json
+from src.data_bbdd_pipeline import load_to_clickhouse
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(load_to_clickhouse, 'symbol_data_path', lambda symbol: str(tmp_path / f"{symbol}_daily.json"))
+    return tmp_path
+
+def test_resolve_data_files_picks_compact_full_or_local(data_dir, monkeypatch):
+    calls = []
+
+    def fetch_symbols(symbols, outputsize):
+        calls.append((sorted(symbols), outputsize))
+        return {s: None if s == 'FAIL' else str(data_dir / f"{s}_{outputsize}.json") for s in symbols}
+
+    monkeypatch.setattr(load_to_clickhouse, 'fetch_symbols', fetch_symbols)
+    for symbol in ('STALE', 'FAIL'):
+        (data_dir / f"{symbol}_daily.json").write_text('{}')
+    recent = date.today() - timedelta(days=3)
+    stale = date.today() - timedelta(days=load_to_clickhouse.COMPACT_MAX_AGE_DAYS + 1)
+    latest_dates = {'RECENT': recent, 'FAIL': recent, 'STALE': stale}
+
+    files = load_to_clickhouse.resolve_data_files(['RECENT', 'FAIL', 'STALE', 'NEW', 'GONE'], latest_dates)
+    assert calls == [(['FAIL', 'RECENT'], 'compact'), (['GONE', 'NEW'], 'full')]
+    assert files == {
+        'RECENT': str(data_dir / 'RECENT_compact.json'),
+        'FAIL': str(data_dir / 'FAIL_daily.json'),      # La descarga falla: se usa el histórico local
+        'STALE': str(data_dir / 'STALE_daily.json'),    # Demasiado antiguo para 'compact', sin descargar
+        'NEW': str(data_dir / 'NEW_full.json'),
+        'GONE': str(data_dir / 'GONE_full.json'),
+    }
+
+    calls.clear()
+    files = load_to_clickhouse.resolve_data_files(['RECENT', 'STALE'], latest_dates, incremental=False)
+    assert calls == [(['RECENT'], 'full')] # --full: nunca 'compact', y solo se descarga lo que no está en local
+    assert files == {'RECENT': str(data_dir / 'RECENT_full.json'), 'STALE': str(data_dir / 'STALE_daily.json')}
+
+def _write(path, payload):
+    path.write_text(json.dumps(payload))
+    return str(path)
+
+def _stored(client):
+    return client.execute("SELECT event_date, close FROM stocks_db.stock_daily_news ORDER BY event_date")
+
+def test_second_load_is_idempotent_and_corrects_the_last_day(chdb_client, data_dir, monkeypatch):
+    invalidated = []
+    monkeypatch.setattr(load_to_clickhouse, 'invalidate_cache',
+                        lambda event_dates, tickers: invalidated.append((event_dates, tickers)))
+    full = make_alpha_vantage_json(n_days=40, start_date='2024-01-01')
+    days = sorted(full['Time Series (Daily)'])
+    partial = {'Time Series (Daily)': {d: dict(v) for d, v in full['Time Series (Daily)'].items() if d <= days[29]}}
+    partial['Time Series (Daily)'][days[29]]['4. close'] = '1.0000' # Última sesión cargada aún abierta
+
+    rows = load_to_clickhouse.insert_symbol_file(chdb_client, 'TM', _write(data_dir / 'partial.json', partial))
+    assert rows == 30 and invalidated == []
+
+    for _ in range(2):
+        latest = load_to_clickhouse.get_latest_dates(chdb_client)['TM']
+        load_to_clickhouse.insert_symbol_file(chdb_client, 'TM', _write(data_dir / 'full.json', full), latest)
+
+    stored = _stored(chdb_client)
+    assert [d for d, _ in stored] == days # Una fila por día, sin esperar a que se fusionen las partes
+    assert stored[29][1] == pytest.approx(float(full['Time Series (Daily)'][days[29]]['4. close']))
+    assert invalidated[0] == ([date.fromisoformat(days[29])], ['TM'])
+    assert chdb_client.execute("SELECT count() FROM stocks_db.stock_daily")[0][0] > len(days) # Sin FINAL sí hay duplicados
+
+def test_migrate_stock_daily_from_merge_tree(chdb_client):
+    from src.data_bbdd_pipeline.initialize_database import CREATE_TABLE_SQL, migrate_stock_daily
+    assert not migrate_stock_daily(chdb_client)
+    chdb_client.execute("DROP TABLE stocks_db.stock_daily")
+    chdb_client.execute(CREATE_TABLE_SQL.replace('ENGINE = ReplacingMergeTree', 'ENGINE = MergeTree'))
+    chdb_client.execute("INSERT INTO stocks_db.stock_daily VALUES ('TM', '2024-01-02', 1, 2, 0.5, 1.5, 100)")
+
+    assert migrate_stock_daily(chdb_client)
+    engine = chdb_client.execute("SELECT engine FROM system.tables WHERE database = 'stocks_db' AND name = 'stock_daily'")
+    assert engine == [('ReplacingMergeTree',)]
+    assert _stored(chdb_client) == [('2024-01-02', 1.5)]
+    assert not migrate_stock_daily(chdb_client)
+
+def test_blocks_have_fixed_size_typed_columns_and_skip_old_dates(data_dir):
+    payload = make_alpha_vantage_json(n_days=250, start_date='2023-01-02')
+    payload['Time Series (Daily)']['2023-13-01'] = {'1. open': '1'} # Fila corrupta: se salta
+    path = _write(data_dir / 'TM.json', payload)
+    with open(path, 'rb') as f:
+        blocks = list(load_to_clickhouse.iter_alpha_vantage_blocks(f, 'TM', block_size=100))
+    assert [len(block[0]) for block in blocks] == [100, 100, 50]
+    ticker, dates, open_, high, low, close, volume = blocks[0]
+    assert set(ticker) == {'TM'} and ticker.dtype == object
+    assert dates.dtype == np.dtype('datetime64[D]') and volume.dtype == np.uint64
+    assert all(column.dtype == np.float64 for column in (open_, high, low, close))
+    assert all(len(column) == 100 for column in blocks[0])
+
+    all_dates = np.concatenate([block[1] for block in blocks])
+    min_date = date.fromisoformat(sorted(payload['Time Series (Daily)'])[199])
+    with open(path, 'rb') as f:
+        recent = list(load_to_clickhouse.iter_alpha_vantage_blocks(f, 'TM', block_size=100, min_date=min_date))
+    recent_dates = np.concatenate([block[1] for block in recent])
+    assert len(recent_dates) == 50 and (recent_dates > np.datetime64(min_date)).all()
+    assert set(recent_dates) == set(all_dates[all_dates > np.datetime64(min_date)])
+
+def _streaming_peak(path, block_size):
+    tracemalloc.start()
+    with open(path, 'rb') as f:
+        n_rows = sum(len(block[0]) for block in load_to_clickhouse.iter_alpha_vantage_blocks(f, 'TM', block_size))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return n_rows, peak
+
+def test_block_memory_does_not_grow_with_the_file(data_dir):
+    small = _write(data_dir / 'small.json', make_alpha_vantage_json(n_days=2_000))
+    large = _write(data_dir / 'large.json', make_alpha_vantage_json(n_days=20_000))
+    (small_rows, small_peak), (large_rows, large_peak) = (_streaming_peak(p, 1_000) for p in (small, large))
+    assert (small_rows, large_rows) == (2_000, 20_000)
+    assert large_peak < os.path.getsize(large) / 2 # Nunca se tiene el documento entero en memoria
+    assert large_peak < 1.5 * small_peak
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+from benchmarks.synthetic import make_ohlcv, NEWS_TYPES
+from src.data_pipeline import feature_engineering
+from src.online_features import OnlineFeatureEngine, RESYNC_EVERY
+
+def incremental_features(df, columns):
+    """Filas del motor incremental que feature_engineering conserva (sin NaN), con sus fechas."""
+    engine = OnlineFeatureEngine(news_types=NEWS_TYPES)
+    assert engine.feature_names() == columns
+    rows, dates = [], []
+    for event_date, bar in zip(df.index, df.to_dict('records')):
+        row = engine.update(bar)
+        if row is not None and not np.isnan(row['rsi']):
+            rows.append([row[col] for col in columns])
+            dates.append(event_date)
+    return np.array(rows, dtype=np.float64), dates
+
+@pytest.mark.parametrize('seed', [0, 1])
+def test_incremental_matches_batch(seed):
+    df = make_ohlcv(n_days=RESYNC_EVERY + 500, news_rate=0.1, seed=seed) # Cruza una resincronización
+    batch = feature_engineering(df.copy(), news_types=NEWS_TYPES).drop(columns='target')
+
+    online, dates = incremental_features(df, list(batch.columns))
+    assert list(batch.index) == dates
+    assert np.allclose(batch.to_numpy(dtype=np.float64), online, rtol=1e-9, atol=1e-8)
+
+def test_flat_prices_match_batch():
+    df = make_ohlcv(n_days=200, news_rate=0.1)
+    df.iloc[60:120, df.columns.get_indexer(['open', 'high', 'low', 'close'])] = 100.0 # Tramo sin movimiento
+    batch = feature_engineering(df.copy(), news_types=NEWS_TYPES).drop(columns='target')
+
+    online, dates = incremental_features(df, list(batch.columns))
+    assert list(batch.index) == dates
+    assert np.allclose(batch.to_numpy(dtype=np.float64), online, rtol=1e-9, atol=1e-8)
+
+def test_warm_up_then_update_gives_the_last_batch_row():
+    df = make_ohlcv(n_days=300, news_rate=0.1)
+    batch = feature_engineering(df.copy(), news_types=NEWS_TYPES).drop(columns='target')
+
+    engine = OnlineFeatureEngine(news_types=NEWS_TYPES).warm_up(df.iloc[:-1])
+    row = engine.update(df.iloc[-1].to_dict())
+    assert np.allclose([row[col] for col in batch.columns], batch.iloc[-1].to_numpy(dtype=np.float64))
+
+def test_unknown_news_type_is_rejected():
+    df = make_ohlcv(n_days=60)
+    engine = OnlineFeatureEngine(news_types=NEWS_TYPES).warm_up(df.iloc[:-1])
+    bar = dict(df.iloc[-1].to_dict(), News=1, News_Type='Recall')
+    with pytest.raises(ValueError):
+        engine.update(bar)
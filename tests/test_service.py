@@ -0,0 +1,89 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.preprocessing import StandardScaler
+from src.serving.service import PredictionService, make_handler
+
+class StubModel:
+    """Modelo tabular mínimo; release bloquea predict_proba hasta que se active."""
+    columns = ['close']
+    time_steps = None
+    is_sequential = False
+
+    def __init__(self, release=None):
+        self.scaler = StandardScaler().fit(np.array([[0.0], [2.0]]))
+        self.release = release
+
+    def predict_proba(self, X):
+        if self.release is not None:
+            self.release.wait()
+        return np.full(len(X), 0.75)
+
+def _service(model, predict_timeout=1.0):
+    service = PredictionService({'xgboost': model}, tickers=['TM', 'GM'], predict_timeout=predict_timeout)
+    for state in service.states.values():
+        state.rows.append({'close': 1.0})
+        state.last_date = pd.Timestamp('2024-05-01')
+    return service
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def start(service):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(service))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+def test_predict_reads_each_result_once():
+    model = StubModel()
+    predictions = _service(model).predict(['TM', 'GM'])
+    assert predictions['TM'] == {'prob_up': 0.75, 'direction': 'up', 'as_of': '2024-05-01'}
+    assert set(predictions) == {'TM', 'GM'}
+
+def test_slow_model_returns_503(serve):
+    release = threading.Event()
+    url = serve(_service(StubModel(release), predict_timeout=0.2))
+    try:
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(f"{url}/predict?tickers=TM", timeout=10)
+        assert error.value.code == 503
+        assert 'no respondió' in json.loads(error.value.read())['error']
+    finally:
+        release.set()
+
+class StubSequenceModel(StubModel):
+    """Modelo secuencial que guarda las ventanas que recibe."""
+    time_steps = 3
+    is_sequential = True
+
+    def __init__(self):
+        super().__init__()
+        self.windows = []
+
+    def predict_proba(self, X):
+        self.windows.append(X)
+        return np.full(len(X), 0.25)
+
+def test_sequence_window_ends_on_as_of():
+    model = StubSequenceModel()
+    service = PredictionService({'lstm': model}, tickers=['TM'])
+    state = service.states['TM']
+    for day, close in enumerate([1.0, 2.0, 3.0, 4.0, 5.0], start=1):
+        state.rows.append({'close': close})
+        state.last_date = pd.Timestamp(f'2024-05-0{day}')
+    predictions = service.predict(['TM'], 'lstm')
+    # Mismo criterio que window_labels: la ventana termina en la barra de as_of y predice el día siguiente
+    assert predictions['TM'] == {'prob_up': 0.25, 'direction': 'down', 'as_of': '2024-05-05'}
+    assert np.allclose(model.windows[0][0].ravel(), model.scaler.transform([[3.0], [4.0], [5.0]]).ravel())
@@ -0,0 +1,59 @@
+import json
+import time
+import numpy as np
+import pytest
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+from src import telemetry
+from src.telemetry import stage
+
+def _worker_stage(name):
+    with stage(name) as s:
+        s.rows_out = 1
+    return telemetry.summary()[name]['runs']
+
+def test_events_are_written_and_prometheus_is_opt_in(telemetry_dir, monkeypatch):
+    monkeypatch.setattr(telemetry, 'PROMETHEUS_ENABLED', False)
+    with stage('unit', rows_in=3) as s:
+        s.rows_out = 2
+    event = json.loads((telemetry_dir / telemetry.EVENTS_FILE).read_text().splitlines()[-1])
+    assert (event['stage'], event['rows_in'], event['rows_out'], event['status']) == ('unit', 3, 2, 'ok')
+    assert not (telemetry_dir / telemetry.PROMETHEUS_FILE).exists()
+
+    monkeypatch.setattr(telemetry, 'PROMETHEUS_ENABLED', True)
+    with stage('unit'):
+        pass
+    assert 'pipeline_stage_runs_total{stage="unit"}' in (telemetry_dir / telemetry.PROMETHEUS_FILE).read_text()
+
+def test_pool_workers_do_not_overwrite_prometheus_file(telemetry_dir, monkeypatch):
+    monkeypatch.setattr(telemetry, 'PROMETHEUS_ENABLED', True)
+    with stage('parent'):
+        pass
+    prom = telemetry_dir / telemetry.PROMETHEUS_FILE
+    before = prom.read_text()
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('fork')) as executor:
+        assert executor.submit(_worker_stage, 'worker').result() == 1
+    assert prom.read_text() == before
+    assert 'stage="worker"' not in before
+
+def test_stage_does_not_reset_process_peak(telemetry_dir):
+    resource = pytest.importorskip('resource')
+    if telemetry._current_rss() is None:
+        pytest.skip('Sin /proc/self/statm')
+    block = np.ones(300 * 2**20 // 8) # Pico de 300 MB antes de cualquier etapa
+    del block
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    with stage('empty'):
+        pass
+    assert resource.getrusage(resource.RUSAGE_SELF).ru_maxrss == before
+
+    with stage('outer') as outer:
+        with stage('allocate'):
+            block = np.ones(200 * 2**20 // 8) # 200 MB residentes
+            time.sleep(5 * telemetry.RSS_SAMPLE_SECONDS)
+            del block
+    events = [json.loads(line) for line in (telemetry_dir / telemetry.EVENTS_FILE).read_text().splitlines()]
+    allocate = next(e for e in events if e['stage'] == 'allocate')
+    assert allocate['peak_rss_bytes'] - telemetry._current_rss() > 150 * 2**20
+    assert allocate['process_peak_rss_bytes'] >= allocate['peak_rss_bytes']
+    assert outer.peak_rss >= allocate['peak_rss_bytes']
@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+import pytest
+from benchmarks.synthetic import make_ohlcv, NEWS_TYPES
+from src.data_pipeline import feature_engineering
+from src.modeling.sequences import sliding_windows, sequence_batches, validation_split, window_starts, window_labels
+from src.modeling.training import BASE_LEARNING_RATE, BASE_BATCH_SIZE, scaled_learning_rate, warmup_schedule
+
+def test_scaled_learning_rate_is_linear_in_batch_size():
+    assert scaled_learning_rate(BASE_BATCH_SIZE) == BASE_LEARNING_RATE
+    assert scaled_learning_rate(256) == pytest.approx(BASE_LEARNING_RATE * 8)
+    assert scaled_learning_rate(64, base_lr=0.01, base_batch_size=16) == pytest.approx(0.04)
+
+def test_warmup_schedule_ramps_then_holds():
+    schedule = warmup_schedule(8e-3, base_lr=1e-3, warmup_epochs=2)
+    assert [schedule(epoch) for epoch in range(4)] == pytest.approx([1e-3, 4.5e-3, 8e-3, 8e-3])
+    assert warmup_schedule(8e-3, warmup_epochs=0)(0) == 8e-3
+
+@pytest.mark.parametrize('compare', [False, True])
+def test_cli_rejects_fast_only_flags_without_fast(capsys, compare):
+    from src.cli import build_parser, main
+    with pytest.raises(SystemExit):
+        main(['train', 'lstm', '--jit', '--intra-op', '4'])
+    assert '--jit, --intra-op solo se aplica con --fast' in capsys.readouterr().err
+    args = build_parser().parse_args(['train', 'lstm', '--jit', '--compare' if compare else '--fast'])
+    assert args.jit
+
+def _panel(n_rows=97, n_features=3, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.normal(size=(n_rows, n_features)), (rng.random(n_rows) < 0.5).astype(np.uint8)
+
+def test_windowed_dataset_matches_sliding_windows():
+    pytest.importorskip('tensorflow')
+    from src.modeling.training import windowed_dataset
+    X, y = _panel()
+    windows, labels = sliding_windows(X, y, time_steps=7)
+
+    batches = list(windowed_dataset(X, y, time_steps=7, batch_size=16).as_numpy_iterator())
+    assert np.allclose(np.concatenate([b[0] for b in batches]), windows.astype(np.float32))
+    assert (np.concatenate([b[1] for b in batches]) == labels).all()
+
+    part = list(windowed_dataset(X, y, time_steps=7, batch_size=8, start=10, stop=30).as_numpy_iterator())
+    assert np.allclose(np.concatenate([b[0] for b in part]), windows[10:30].astype(np.float32))
+
+    shuffled = list(windowed_dataset(X, y, time_steps=7, batch_size=16, shuffle=True, seed=1).as_numpy_iterator())
+    X_shuffled = np.concatenate([b[0] for b in shuffled])
+    order = [int(np.argmin(np.abs(windows[:, 0, 0] - w[0, 0]))) for w in X_shuffled]
+    assert sorted(order) == list(range(len(windows)))
+    assert np.allclose(X_shuffled, windows[order].astype(np.float32))
+    assert (np.concatenate([b[1] for b in shuffled]) == labels[order]).all()
+
+def test_fit_fast_trains_and_checkpoints(tmp_path):
+    tf = pytest.importorskip('tensorflow')
+    from src.modeling.training import fit_fast
+    X, y = _panel(n_rows=300)
+    model = tf.keras.Sequential([tf.keras.Input((5, X.shape[1])), tf.keras.layers.LSTM(4),
+                                 tf.keras.layers.Dense(1, activation='sigmoid')])
+
+    history, report = fit_fast(model, X, y, time_steps=5, name='tiny', batch_size=64, epochs=3,
+                               warmup_epochs=2, checkpoint_dir=str(tmp_path), target_accuracy=0.0)
+    assert len(history.epoch) == report['epochs'] == 3
+    assert report['samples_per_second'] > 0 and report['epoch_to_accuracy'] == 1
+    assert (tmp_path / 'tiny.weights.h5').exists()
+    assert history.history['learning_rate'] == pytest.approx([1e-3, 1.5e-3, 2e-3]) # Calentamiento hasta 64/32 · 1e-3
+
+def test_sliding_windows_shorter_than_time_steps_is_empty():
+    X, y = _panel(n_rows=7)
+    for n_rows in (5, 6):
+        windows, labels = sliding_windows(X[:n_rows], y[:n_rows], time_steps=7)
+        assert windows.shape == (0, 7, 3) and labels.shape == (0,)
+    windows, labels = sliding_windows(X, y, time_steps=7)
+    assert windows.shape == (1, 7, 3) and labels.tolist() == [y[-1]]
+
+def test_windows_do_not_cross_tickers():
+    X, y = _panel()
+    groups = np.repeat([0, 1, 2], [40, 5, 52]) # El ticker 1 no llega a una ventana completa
+    windows, labels = sliding_windows(X, y, time_steps=7, groups=groups)
+    starts = [i for i in range(len(X) - 6) if groups[i] == groups[i + 6]]
+    assert len(starts) == (40 - 6) + (52 - 6)
+    assert np.allclose(windows, np.stack([X[i:i + 7] for i in starts]))
+    assert (labels == y[np.array(starts) + 6]).all()
+
+    batches = list(sequence_batches(X, y, time_steps=7, batch_size=16, groups=groups))
+    assert np.allclose(np.concatenate([b[0] for b in batches]), windows)
+    assert (np.concatenate([b[1] for b in batches]) == labels).all()
+
+    pytest.importorskip('tensorflow')
+    from src.modeling.training import windowed_dataset
+    part = list(windowed_dataset(X, y, time_steps=7, batch_size=8, start=30, stop=50, groups=groups).as_numpy_iterator())
+    assert np.allclose(np.concatenate([b[0] for b in part]), windows[30:50].astype(np.float32))
+    assert (np.concatenate([b[1] for b in part]) == labels[30:50]).all()
+
+def test_validation_holds_out_the_last_dates_of_every_ticker():
+    groups = np.repeat([0, 1, 2], [40, 5, 52])
+    train, val = validation_split(len(groups), time_steps=7, groups=groups, fraction=0.2)
+    assert sorted(np.r_[train, val]) == window_starts(len(groups), 7, groups).tolist()
+    for ticker, n_windows in ((0, 34), (2, 46)):
+        ticker_val = val[groups[val] == ticker]
+        # Las últimas ventanas de cada ticker, no las del último ticker
+        assert len(ticker_val) == int(n_windows * 0.2)
+        assert ticker_val.min() > train[groups[train] == ticker].max()
+    train, val = validation_split(97, time_steps=7, fraction=0.1)
+    assert val.tolist() == list(range(91 - 9, 91)) and train.tolist() == list(range(82))
+
+def test_window_label_is_the_move_after_its_last_day():
+    panel = make_ohlcv(n_days=120, n_tickers=2, news_rate=0.1)
+    featured = feature_engineering(panel.copy(), news_types=NEWS_TYPES, keep_ticker=True)
+    groups = pd.factorize(featured['ticker'])[0]
+    starts = window_starts(len(featured), 10, groups)
+    labels = window_labels(featured['target'], starts, 10)
+    closes = panel.set_index('ticker', append=True)['close']
+    for start, label in zip(starts[::17], labels[::17]):
+        last_day, ticker = featured.index[start + 9], featured['ticker'].iloc[start + 9]
+        series = closes.xs(ticker, level='ticker')
+        next_day = series.index[series.index.get_loc(last_day) + 1]
+        # El servicio predice con las T últimas filas la dirección del día siguiente al último
+        assert label == int(series[next_day] > series[last_day])
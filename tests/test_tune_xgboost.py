@@ -0,0 +1,51 @@
+import json
+from src.modeling import tune_xgboost
+from src.modeling.tune_xgboost import TrialRunner, param_grid, successive_halving, trial_key
+
+GRID = {'max_depth': [2, 3], 'learning_rate': [0.1, 0.3]}
+
+def test_resume_skips_trials_already_in_the_jsonl(panel_feature_set, tmp_path, monkeypatch):
+    trials_path = str(tmp_path / 'trials.jsonl')
+    calls = []
+    run_trial = tune_xgboost._run_trial_worker
+    monkeypatch.setattr(tune_xgboost, '_run_trial_worker', lambda args: calls.append(args) or run_trial(args))
+
+    configs = param_grid(GRID)
+    first = TrialRunner(panel_feature_set, trials_path=trials_path).run(configs[:3], num_rounds=10)
+    assert len(calls) == 3
+    with open(trials_path) as f:
+        saved = [json.loads(line) for line in f]
+    assert [trial['trial'] for trial in saved] == [trial_key('panel', params, 10) for params in configs[:3]]
+
+    # Un proceso nuevo (búsqueda interrumpida y relanzada) solo ejecuta lo que falta
+    calls.clear()
+    second = TrialRunner(panel_feature_set, trials_path=trials_path).run(configs, num_rounds=10)
+    assert calls == [(configs[3], 10)]
+    assert second[:3] == first
+    calls.clear()
+    TrialRunner(panel_feature_set, trials_path=trials_path).run(configs, num_rounds=30) # Otro presupuesto, otra prueba
+    assert len(calls) == 4
+
+class FakeRunner:
+    """Runner sin XGBoost: el logloss solo depende de la configuración."""
+    def __init__(self):
+        self.rounds = []
+
+    def run(self, configs, num_rounds):
+        self.rounds.append(([params['id'] for params in configs], num_rounds))
+        return [{'params': params, 'valid_logloss': params['id'] / num_rounds} for params in configs]
+
+def test_successive_halving_promotes_the_best_third():
+    runner = FakeRunner()
+    configs = [{'id': i} for i in (7, 3, 8, 1, 5, 0, 6, 2, 4)]
+    ranked = successive_halving(runner, configs, min_rounds=10, max_rounds=100, factor=3)
+    assert runner.rounds == [
+        ([7, 3, 8, 1, 5, 0, 6, 2, 4], 10),
+        ([0, 1, 2], 30),    # Sobrevive la mejor 1/3 con 3x de árboles
+        ([0], 90),
+    ]
+    assert ranked == [{'params': {'id': 0}, 'valid_logloss': 0.0}]
+
+    runner = FakeRunner()
+    successive_halving(runner, configs[:4], min_rounds=10, max_rounds=20, factor=3)
+    assert runner.rounds == [([7, 3, 8, 1], 10), ([1], 20)] # El presupuesto no pasa de max_rounds